@@ -5,8 +5,13 @@ bl_info = {
     "category": "Object",
 }
 
-import bpy
-from . import generator, ui, object_helpers, asset_loader
+try:
+    import bpy
+except ImportError:  # вне Blender доступны только модули без bpy (planner, build_plan, asset_catalog)
+    bpy = None
+
+if bpy is not None:
+    from . import generator, ui, object_helpers, asset_loader, style_rules
 
 def register():
     register_properties()
@@ -25,21 +30,16 @@ def unregister():
 
 
 def update_house_style(self, context):
-    max_floors_per_style = {
-        "Khrushchev": 9,
-        "Brezhnev": 15,
-        "Japanese": 5,
-        "Stalinist": 12,
-        "test": 5
-    }
+    # Предел этажей берётся из правил стиля (styles/*.json); у Brezhnev правил пока нет
+    max_floors = style_rules.get_max_floors(self.house_style, 15)
 
     scene = context.scene
     scene_props = scene.bl_rna.properties
     if 'house_floors' in scene_props:
-        scene_props['house_floors'].hard_max = max_floors_per_style[self.house_style]
+        scene_props['house_floors'].hard_max = max_floors
     
-    if scene.house_floors > max_floors_per_style[self.house_style]:
-        scene.house_floors = max_floors_per_style[self.house_style]
+    if scene.house_floors > max_floors:
+        scene.house_floors = max_floors
 
 
 def register_properties():
@@ -69,9 +69,64 @@ def register_properties():
         ], default = "Low"
     )
     bpy.types.Scene.house_seed = bpy.props.IntProperty(name="Seed", default=101, min=1, max=999999999)
+    bpy.types.Scene.house_instance_floors = bpy.props.BoolProperty(
+        name="Instance Floors",
+        description="Build each distinct floor once and place repeated floors as collection instances",
+        default=False
+    )
+    bpy.types.Scene.house_output = bpy.props.EnumProperty(
+        name="Output",
+        items=[
+            ("OBJECTS", "Objects", "One object per asset placement"),
+            ("GEOMETRY_NODES", "Geometry Nodes", "One point cloud object instancing the assets with Geometry Nodes"),
+        ], default = "OBJECTS"
+    )
+    bpy.types.Scene.house_merge = bpy.props.BoolProperty(
+        name="Merge Meshes",
+        description="Join the building pieces into one mesh per material after generation",
+        default=False
+    )
+    bpy.types.Scene.house_time_budget = bpy.props.FloatProperty(
+        name="Time Budget",
+        description="Seconds of building work per timer tick in background builds; lower keeps the interface smoother",
+        default=0.05, min=0.005, max=1.0, unit='TIME_ABSOLUTE'
+    )
+    bpy.types.Scene.house_weld_distance = bpy.props.FloatProperty(
+        name="Weld Distance",
+        description="Merge seam vertices closer than this when joining meshes (0 - no welding)",
+        default=0.0, min=0.0, max=0.1, unit='LENGTH'
+    )
+    bpy.types.Scene.house_link_assets = bpy.props.BoolProperty(
+        name="Link Assets",
+        description="Keep asset meshes and materials in the asset libraries as linked data; the saved file only references them",
+        default=False
+    )
+    bpy.types.Scene.house_conflicts = bpy.props.EnumProperty(
+        name="Conflicts",
+        description="What to do with pieces that overlap earlier pieces at footprint corners or in neighbouring buildings",
+        items=[
+            ("OFF", "Off", "Do not check placements"),
+            ("REPORT", "Report", "Keep every piece and list the conflicts"),
+            ("SKIP", "Skip", "Drop walls, interfloors and engawas that overlap earlier pieces"),
+            ("TRIM", "Trim", "Shorten overlapping pieces along their length; drop them if that is not enough"),
+        ], default = "REPORT"
+    )
+    bpy.types.Scene.house_profile = bpy.props.BoolProperty(
+        name="Profile Build",
+        description="Collect stage timers and counters during generation and show them in the panel",
+        default=False
+    )
 
 def unregister_properties():
     del bpy.types.Scene.house_floors
     del bpy.types.Scene.house_style
     del bpy.types.Scene.house_details
-    del bpy.types.Scene.house_seed
\ No newline at end of file
+    del bpy.types.Scene.house_seed
+    del bpy.types.Scene.house_instance_floors
+    del bpy.types.Scene.house_output
+    del bpy.types.Scene.house_merge
+    del bpy.types.Scene.house_weld_distance
+    del bpy.types.Scene.house_time_budget
+    del bpy.types.Scene.house_link_assets
+    del bpy.types.Scene.house_conflicts
+    del bpy.types.Scene.house_profile
\ No newline at end of file
@@ -0,0 +1,249 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+from . import profiling
+
+# Каталог ассетов: для каждого (style, details) хранит инвертированный индекс
+# "ключевое слово -> имена объектов" и сохраняет его на диск, чтобы не открывать .blend
+ASSETS_DIR = Path(__file__).parent / "assets"
+CACHE_DIR = Path(__file__).parent / ".cache" / "catalog"
+CATALOG_VERSION = 1
+
+STAMP_CHECK_INTERVAL = 1.0
+
+log = profiling.get_logger(__name__)
+
+_catalogs = {}
+_checked = {}
+_default_lister = None
+_pinned = {}  # каталоги без .blend (кэш мешей на машине без библиотек ассетов)
+# Каталоги строятся и из фонового потока при регистрации аддона
+_lock = threading.RLock()
+
+
+def get_asset_path(style: str, details: str) -> Path:
+    """Путь к .blend с ассетами стиля"""
+    return ASSETS_DIR / style / f"{details}.blend"
+
+
+def get_cache_path(style: str, details: str) -> Path:
+    """Путь к сохранённому индексу каталога"""
+    return CACHE_DIR / f"{style}_{details}.json"
+
+
+def file_stamp(path: Path) -> list[int]:
+    """Отпечаток файла (mtime, размер) для инвалидации кэша"""
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def name_keys(name: str) -> set[str]:
+    """Все непрерывные цепочки токенов имени: wall10_window_01 -> wall10, wall10_window, ..."""
+    parts = name.lower().split("_")
+    return {"_".join(parts[i:j]) for i in range(len(parts)) for j in range(i + 1, len(parts) + 1)}
+
+
+def build_index(names: list[str]) -> dict[str, tuple[str, ...]]:
+    """Строит индекс ключ -> имена с той же семантикой подстроки, что и линейный поиск"""
+    lowered = [(name, name.lower()) for name in names]
+    vocabulary = set()
+    for name in names:
+        vocabulary |= name_keys(name)
+
+    index = {}
+    for key in vocabulary:
+        index[key] = tuple(name for name, low in lowered if key in low)
+    return index
+
+
+class AssetCatalog:
+    """Индекс объектов одного .blend файла"""
+
+    def __init__(self, blend_path: Path, names: list[str], stamp: list[int], index=None):
+        self.blend_path = blend_path
+        self.names = tuple(names)
+        self.stamp = stamp
+        self.index = index if index is not None else build_index(self.names)
+        self.dirty = index is None
+
+    def find(self, keyword: str) -> tuple[str, ...]:
+        """Имена объектов, содержащие ключ (порядок как в .blend)"""
+        key = keyword.lower()
+        matches = self.index.get(key)
+        if matches is None:
+            # Ключа нет в словаре токенов: один раз ищем подстрокой и запоминаем.
+            # Индекс дополняют и фоновый поток, и основной, а flush его обходит - только под _lock
+            with _lock:
+                matches = self.index.get(key)
+                if matches is None:
+                    matches = tuple(name for name in self.names if key in name.lower())
+                    self.index[key] = matches
+                    self.dirty = True
+        return matches
+
+    def has(self, keyword: str) -> bool:
+        return bool(self.find(keyword))
+
+    def available(self, keywords) -> list[str]:
+        """Какие из ключей есть в библиотеке"""
+        return [keyword for keyword in keywords if self.find(keyword)]
+
+    def first_available(self, keywords) -> str | None:
+        """Первый ключ из цепочки фолбэков, для которого есть объекты"""
+        for keyword in keywords:
+            if self.find(keyword):
+                return keyword
+        return None
+
+    def to_dict(self) -> dict:
+        with _lock:
+            index = {key: list(value) for key, value in self.index.items()}
+        return {
+            "version": CATALOG_VERSION,
+            "blend": str(self.blend_path),
+            "stamp": self.stamp,
+            "names": list(self.names),
+            "index": index,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict, blend_path: Path):
+        index = {key: tuple(value) for key, value in data["index"].items()}
+        return cls(blend_path, data["names"], data["stamp"], index)
+
+
+def load_cached(style: str, details: str, blend_path: Path, stamp: list[int]) -> AssetCatalog | None:
+    """Читает индекс с диска, если он соответствует текущему .blend"""
+    cache_path = get_cache_path(style, details)
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if data.get("version") != CATALOG_VERSION or data.get("stamp") != stamp:
+        return None
+    return AssetCatalog.from_dict(data, blend_path)
+
+
+def save_catalog(style: str, details: str, catalog: AssetCatalog):
+    """Сохраняет индекс на диск (атомарно через временный файл)"""
+    cache_path = get_cache_path(style, details)
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        # Снимок и сброс dirty - под одной блокировкой: ключ, добавленный после снимка, оставит каталог dirty
+        with _lock:
+            data = catalog.to_dict()
+            catalog.dirty = False
+        tmp_path = cache_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        catalog.dirty = True
+        log.warning(f"Не удалось сохранить каталог {cache_path}: {e}")
+
+
+def set_default_lister(lister):
+    """Функция lister(path) -> имена объектов, которой строятся каталоги без явного lister"""
+    global _default_lister
+    _default_lister = lister
+
+
+def set_catalog(style: str, details: str, catalog: AssetCatalog | None):
+    """Закрепляет каталог (style, details): get_catalog отдаёт его без проверки .blend; None - снять"""
+    if catalog is None:
+        _pinned.pop((style, details), None)
+    else:
+        _pinned[(style, details)] = catalog
+
+
+def get_catalog(style: str, details: str, lister=None) -> AssetCatalog | None:
+    """Возвращает каталог (style, details); lister(path) -> имена объектов вызывается только при промахе кэша"""
+    key = (style, details)
+    if key in _pinned:
+        return _pinned[key]
+    catalog = _catalogs.get(key)
+    now = time.monotonic()
+    # Отпечаток .blend проверяем не чаще раза в STAMP_CHECK_INTERVAL секунд
+    if catalog and now - _checked.get(key, 0.0) < STAMP_CHECK_INTERVAL:
+        return catalog
+
+    blend_path = get_asset_path(style, details)
+    try:
+        stamp = file_stamp(blend_path)
+    except FileNotFoundError:
+        return None
+
+    with _lock:
+        catalog = _catalogs.get(key)
+        _checked[key] = now
+        if catalog and catalog.stamp == stamp:
+            return catalog
+
+        catalog = load_cached(style, details, blend_path, stamp)
+        if catalog is None:
+            lister = lister or _default_lister
+            if lister is None:
+                raise LookupError(f"Каталог {blend_path} не построен и нечем прочитать .blend")
+            with profiling.timer("catalog_build"):
+                catalog = AssetCatalog(blend_path, lister(blend_path), stamp)
+            profiling.count("catalog_builds")
+            save_catalog(style, details, catalog)
+
+        _catalogs[key] = catalog
+        return catalog
+
+
+@profiling.timed("asset_lookup")
+def pick(style: str, details: str, keywords, rng) -> tuple[str, str] | tuple[None, None]:
+    """Выбирает случайный объект по первому найденному ключу цепочки: (ключ, имя)"""
+    try:
+        catalog = get_catalog(style, details)
+        if catalog is None:
+            log.warning(f"Файл ассетов не найден: {get_asset_path(style, details)}")
+            return None, None
+        keyword = catalog.first_available(keywords)
+        if keyword is None:
+            log.warning(f"Не найдено объектов с ключом {' / '.join(keywords)} в {catalog.blend_path}")
+            return None, None
+        return keyword, rng.choice(catalog.find(keyword))
+    except Exception as e:
+        log.warning(f"Ошибка чтения объекта из {get_asset_path(style, details)}: {e}")
+        return None, None
+
+
+def discover_libraries() -> list[tuple[str, str]]:
+    """Все (style, details), для которых есть assets/<style>/<details>.blend"""
+    return sorted((path.parent.name, path.stem) for path in ASSETS_DIR.glob("*/*.blend"))
+
+
+def warm_catalogs(lister) -> int:
+    """Строит каталоги всех библиотек (для фонового потока: lister не должен трогать bpy)"""
+    built = 0
+    for style, details in discover_libraries():
+        try:
+            if get_catalog(style, details, lister) is not None:
+                built += 1
+        except Exception as e:
+            log.warning(f"Каталог {style}/{details} не построен: {e}")
+    return built
+
+
+def flush():
+    """Сохраняет каталоги, дополненные новыми ключами"""
+    with _lock:
+        catalogs = list(_catalogs.items())
+    for (style, details), catalog in catalogs:
+        if catalog.dirty:
+            save_catalog(style, details, catalog)
+
+
+def clear():
+    """Сбрасывает каталоги в памяти (файлы на диске остаются)"""
+    _catalogs.clear()
+    _checked.clear()
+    _pinned.clear()
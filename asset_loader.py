@@ -1,80 +1,346 @@
-import os, bpy, random
+import os, re, bpy, random, threading
+from bpy.app.handlers import persistent
+from collections import OrderedDict
 from pathlib import Path
 
+from . import asset_catalog
+from . import blend_reader
+from . import mesh_cache
+from . import mesh_merge
+from . import object_helpers as helpers
+from . import profiling
+from . import style_rules
+
 # путь к общим ассетам
 ASSETS_DIR = os.path.join(os.path.dirname(__file__), "assets")
 
+log = profiling.get_logger(__name__)
+
 # 
 def get_asset_path(style: str, details: str) -> Path:
     """Возвращает корректный Path объект к папке с ассетами"""
-    assets_dir = Path(__file__).parent / "assets"
-    return assets_dir / style / f"{details}.blend"
+    return asset_catalog.get_asset_path(style, details)
+
+def open_library(blend_path: Path, link: bool = False):
+    """Открывает .blend через bpy.data.libraries.load и учитывает открытие в статистике.
+    Связанная библиотека записывается относительным путём (если файл сцены сохранён)"""
+    _stats["library_opens"] += 1
+    profiling.count("library_opens")
+    return bpy.data.libraries.load(str(blend_path), link=link, relative=link)
 
 def list_objects_in_blend(blend_path: Path) -> list[str]:
     """Получить список объектов внутри .blend файла"""
-    with bpy.data.libraries.load(str(blend_path), link=False) as (data_from, _):
+    with open_library(blend_path) as (data_from, _):
         return list(data_from.objects)
 
-def get_random_asset(style: str, details: str, keyword: str) -> tuple[str, str] | tuple[None, None]:
+def list_objects_fast(blend_path: Path) -> list[str]:
+    """Имена объектов по заголовкам .blend; если файл не разобрать - через libraries.load"""
+    try:
+        return blend_reader.list_objects(blend_path)
+    except (blend_reader.BlendReadError, OSError) as e:
+        log.warning(f"{blend_path} не прочитан без Blender ({e}), открываю через libraries.load")
+        return list_objects_in_blend(blend_path)
+
+def get_catalog(style: str, details: str) -> asset_catalog.AssetCatalog | None:
+    """Каталог ассетов стиля; .blend разбирается только если индекс на диске устарел"""
+    return asset_catalog.get_catalog(style, details, list_objects_fast)
+
+def get_random_asset(style: str, details: str, keyword: str, rng=None) -> tuple[str, str] | tuple[None, None]:
     """Выбирает случайный объект по ключу из единого .blend"""
+    return get_random_asset_from(style, details, (keyword,), rng)
+
+def get_random_asset_from(style: str, details: str, keywords, rng=None) -> tuple[str, str] | tuple[None, None]:
+    """Выбирает случайный объект по первому найденному ключу из цепочки фолбэков; rng - поток вызывающего"""
+    keyword, obj_name = asset_catalog.pick(style, details, keywords, rng or random)
+    if obj_name is None:
+        return None, None
+    return get_asset_path(style, details).name, obj_name
+
+# Пул прототипов: каждый объект ассета загружается один раз за сессию,
+# а размещения получают лёгкие копии, разделяющие меш прототипа
+POOL_COLLECTION = "HG_Prototypes"
+POOL_MAX_BYTES = 256 * 1024 * 1024
+
+_pool = OrderedDict()  # (style, details, obj_name, linked) -> {"object": имя, "library": файл или None, "bytes": оценка}
+_stats = {"hits": 0, "misses": 0, "evictions": 0, "library_opens": 0}
+
+# Режим связывания: меши и материалы остаются в assets/<style>/<details>.blend как данные библиотеки,
+# в файл сцены пишутся только объекты со ссылками на них
+link_assets = False
+
+def set_link_mode(flag: bool = True):
+    global link_assets
+    link_assets = flag
+
+def get_pool_collection():
+    """Скрытая коллекция прототипов (не привязана к сцене, держится fake user)"""
+    collection = bpy.data.collections.get(POOL_COLLECTION)
+    if collection is None:
+        collection = bpy.data.collections.new(POOL_COLLECTION)
+        collection.use_fake_user = True
+    return collection
+
+def estimate_object_bytes(obj) -> int:
+    """Грубая оценка памяти меша прототипа"""
+    mesh = obj.data
+    if mesh is None or not hasattr(mesh, "vertices"):
+        return 0
+    return len(mesh.vertices) * 32 + len(mesh.edges) * 8 + len(mesh.loops) * 16 + len(mesh.polygons) * 16
+
+def pool_key(style: str, details: str, obj_name: str, linked: bool = False) -> tuple[str, str, str, bool]:
+    return style, details, obj_name, linked
+
+def pool_object(entry):
+    """Прототип записи пула; имя ищется вместе с библиотекой - связанный и локальный объект могут быть тёзками"""
+    return bpy.data.objects.get((entry["object"], entry.get("library")))
+
+def sync_pool():
+    """Восстанавливает пул из коллекции прототипов (после открытия сохранённого файла)"""
+    collection = bpy.data.collections.get(POOL_COLLECTION)
+    if collection is None:
+        return
+    for obj in collection.objects:
+        if obj.library is not None:
+            # Связанный прототип: стиль и детализация - из пути assets/<style>/<details>.blend
+            library_path = Path(bpy.path.abspath(obj.library.filepath))
+            key = pool_key(library_path.parent.name, library_path.stem, obj.name, True)
+        else:
+            asset = obj.get("hg_asset")
+            if not asset:
+                continue
+            key = pool_key(*asset.split("/", 2))
+        if key not in _pool:
+            _pool[key] = {"object": obj.name, "library": obj.library.filepath if obj.library else None,
+                          "bytes": estimate_object_bytes(obj)}
+
+def pool_bytes() -> int:
+    return sum(entry["bytes"] for entry in _pool.values())
+
+def get_stats() -> dict:
+    """Статистика загрузки: попадания/промахи пула, вытеснения, открытия библиотек, объём"""
+    return dict(_stats, size=len(_pool), bytes=pool_bytes())
+
+def reset_stats():
+    for key in _stats:
+        _stats[key] = 0
+
+def evict_prototypes(max_bytes: int = POOL_MAX_BYTES, keep: int = 1):
+    """LRU-вытеснение прототипов, пока пул не уложится в бюджет памяти"""
+    total = pool_bytes()
+    while total > max_bytes and len(_pool) > keep:
+        _, entry = _pool.popitem(last=False)
+        total -= entry["bytes"]
+        _stats["evictions"] += 1
+        profiling.count("pool_evictions")
+
+        proto = pool_object(entry)
+        if proto is None:
+            continue
+        mesh = proto.data
+        bpy.data.objects.remove(proto)
+        # Меш остаётся, пока им пользуются размещённые копии
+        if mesh is not None and mesh.users == 0:
+            bpy.data.meshes.remove(mesh)
+
+def clear_pool():
+    """Выгружает все прототипы"""
+    evict_prototypes(max_bytes=-1, keep=0)
+
+# Индекс "базовое имя -> каноничный датаблок" для материалов и изображений.
+# Ведётся по мере загрузки ассетов, сбрасывается при undo/открытии файла.
+_NAME_SUFFIX = re.compile(r"\.\d{3,}$")
+_material_index = {}
+_image_index = {}
+_index_built = False
+
+def base_datablock_name(name: str) -> str:
+    """Имя без суффикса дубликата: Brick.001 -> Brick"""
+    return _NAME_SUFFIX.sub("", name)
+
+def _index_datablock(index: dict, datablock):
+    """Регистрирует датаблок; каноничным остаётся вариант без суффикса .001"""
+    base = base_datablock_name(datablock.name)
+    current = index.get(base)
+    if current is None or (datablock.name == base and current.name != base):
+        index[base] = datablock
+
+def rebuild_datablock_index():
+    """Полная перестройка индекса по bpy.data"""
+    global _index_built
+    _material_index.clear()
+    _image_index.clear()
+    # Связанные датаблоки не схлопываются с локальными: их нельзя переименовать
+    for mat in bpy.data.materials:
+        if mat.library is None:
+            _index_datablock(_material_index, mat)
+    for img in bpy.data.images:
+        if img.library is None:
+            _index_datablock(_image_index, img)
+    _index_built = True
+
+def verify_datablock_index() -> int:
+    """Проверяет индекс (удалённые и переименованные вручную датаблоки); при расхождениях перестраивает. Возвращает число устаревших записей"""
+    if not _index_built:
+        rebuild_datablock_index()
+        return 0
+
+    stale = 0
+    for index in (_material_index, _image_index):
+        for base, datablock in index.items():
+            try:
+                if base_datablock_name(datablock.name) != base:
+                    stale += 1
+            except ReferenceError:
+                stale += 1
+    if stale:
+        rebuild_datablock_index()
+    return stale
+
+def invalidate_datablock_index():
+    global _index_built
+    _material_index.clear()
+    _image_index.clear()
+    _index_built = False
+
+def canonical_datablock(index: dict, collection, datablock):
+    """Каноничный датаблок с тем же базовым именем; если его нет - datablock становится каноничным"""
+    if not _index_built:
+        rebuild_datablock_index()
+
+    base = base_datablock_name(datablock.name)
+    existing = index.get(base)
+    if existing is not None:
+        try:
+            if base_datablock_name(existing.name) == base:
+                return existing
+        except ReferenceError:
+            pass
+
+    # Промах индекса: датаблок мог появиться без нас (создан вручную)
+    existing = collection.get((base, None))
+    if existing is None:
+        datablock.name = base
+        existing = datablock
+    index[base] = existing
+    return existing
+
+@persistent
+def _on_data_reset(*args):
+    invalidate_datablock_index()
+
+@profiling.timed("material_remap")
+def remap_materials(obj):
+    """Материалы: удаляем .001 и заменяем на существующие"""
+    for i, mat in enumerate(obj.data.materials):
+        if not mat:
+            continue
+        existing = canonical_datablock(_material_index, bpy.data.materials, mat)
+        if existing != mat:
+            obj.data.materials[i] = existing
+
+def preload_prototypes(style: str, details: str, obj_names) -> dict:
+    """Загружает все отсутствующие в пуле объекты одним открытием .blend; возвращает имя -> прототип.
+    В режиме связывания (link_assets) прототипы - связанные объекты библиотеки"""
+    if not _pool:
+        sync_pool()
+
+    link = link_assets
+    prototypes = {}
+    missing = []
+    for obj_name in dict.fromkeys(obj_names):
+        key = pool_key(style, details, obj_name, link)
+        entry = _pool.get(key)
+        proto = pool_object(entry) if entry else None
+        if proto is not None:
+            _pool.move_to_end(key)
+            _stats["hits"] += 1
+            profiling.count("pool_hits")
+            prototypes[obj_name] = proto
+        else:
+            # Прототип удалили вручную (или откатили через undo)
+            _pool.pop(key, None)
+            missing.append(obj_name)
+
+    if not missing:
+        return prototypes
+
     blend_path = get_asset_path(style, details)
     if not blend_path.exists():
-        print(f"Файл ассетов не найден: {blend_path}")
-        return None, None
+        raise FileNotFoundError(f"Файл не найден: {blend_path}")
 
-    try:
-        all_objects = list_objects_in_blend(blend_path)
-        matching = [name for name in all_objects if keyword.lower() in name.lower()]
-        if not matching:
-            print(f"Не найдено объектов с ключом '{keyword}' в {blend_path}")
-            return None, None
-        return blend_path.name, random.choice(matching)
-    except Exception as e:
-        print(f"Ошибка чтения объекта из {blend_path}: {e}")
-        return None, None
+    # Материалы и изображения подтягиваются вместе с объектами, дубликаты схлопывает индекс
+    with profiling.timer("library_load"), open_library(blend_path, link) as (data_from, data_to):
+        to_load = [name for name in missing if name in data_from.objects]
+        if len(to_load) < len(missing):
+            not_found = ", ".join(name for name in missing if name not in to_load)
+            log.error(f"Объекты {not_found} не найдены в {blend_path}")
+        data_to.objects = to_load
 
-def append_object_from_blend(style: str, details: str, blend_file: str, obj_name: str):
-    """Импортирует объект по имени, избегая дублирования материалов и текстур"""
-    try:
-        blend_path = get_asset_path(style, details)
-        if not blend_path.exists():
-            raise FileNotFoundError(f"Файл не найден: {blend_path}")
-
-        # Сначала получаем список материалов/изображений
-        with bpy.data.libraries.load(str(blend_path), link=False) as (data_from, _):
-            materials_to_load = [m for m in data_from.materials if m not in bpy.data.materials]
-            images_to_load = [i for i in data_from.images if i not in bpy.data.images]
-
-        # Загружаем объект и нужные материалы
-        with bpy.data.libraries.load(str(blend_path), link=False) as (data_from, data_to):
-            if obj_name not in data_from.objects:
-                raise ValueError(f"Объект {obj_name} не найден в {blend_path}")
-            data_to.objects = [obj_name]
-            data_to.materials = materials_to_load
-            data_to.images = images_to_load
-
-        obj = data_to.objects[0]
+    collection = get_pool_collection()
+    for obj_name, obj in zip(to_load, data_to.objects):
         if not obj:
-            raise RuntimeError("Импорт завершился без объекта")
+            log.error(f"Импорт '{obj_name}' завершился без объекта")
+            continue
+        if not link:
+            track_loaded_datablocks(obj)
+            remap_materials(obj)
+            reuse_existing_textures(obj)
+            obj["hg_asset"] = "/".join(pool_key(style, details, obj_name)[:3])
+        # Связанные данные только для чтения: без схлопывания материалов и без очистки после сборки
+        collection.objects.link(obj)
 
-        # Материалы: удаляем .001 и заменяем на существующие
-        for i, mat in enumerate(obj.data.materials):
-            if not mat:
-                continue
-            base_name = mat.name.split(".")[0]
-            existing = next((m for m in bpy.data.materials if m.name.startswith(base_name)), None)
-            if existing:
-                obj.data.materials[i] = existing
-            else:
-                mat.name = base_name
+        _stats["misses"] += 1
+        profiling.count("pool_misses")
+        _pool[pool_key(style, details, obj_name, link)] = {
+            "object": obj.name, "library": obj.library.filepath if obj.library else None,
+            "bytes": estimate_object_bytes(obj)}
+        prototypes[obj_name] = obj
+
+    return prototypes
 
-        bpy.context.collection.objects.link(obj)
-        return obj
+def get_prototype(style: str, details: str, obj_name: str):
+    """Возвращает прототип из пула, загружая его при промахе"""
+    proto = preload_prototypes(style, details, [obj_name]).get(obj_name)
+    if proto is None:
+        raise RuntimeError("Импорт завершился без объекта")
+    evict_prototypes()
+    return proto
+
+@profiling.timed("append")
+def instance_prototype(proto, collection=None):
+    """Создаёт лёгкую копию прототипа, разделяющую его меш (для связанного прототипа - локальный объект
+    со ссылкой на меш библиотеки)"""
+    obj = proto.copy()
+    if "hg_asset" in obj:
+        del obj["hg_asset"]
+    (collection or bpy.context.collection).objects.link(obj)
+    profiling.count("objects_created")
+    return obj
+
+def localize_object(obj, materials=False) -> bool:
+    """Локальная копия связанного меша (и при materials - материалов) для правок одного размещения;
+    остальные размещения продолжают ссылаться на библиотеку. False - данные объекта уже локальные"""
+    mesh = obj.data
+    if mesh is None or mesh.library is None:
+        return False
+    obj.data = mesh.copy()
+    if materials:
+        for slot in obj.material_slots:
+            if slot.material is not None and slot.material.library is not None:
+                slot.material = slot.material.copy()
+    return True
+
+def append_object_from_blend(style: str, details: str, blend_file: str, obj_name: str):
+    """Размещает объект ассета по имени через пул прототипов"""
+    try:
+        proto = get_prototype(style, details, obj_name)
+        return instance_prototype(proto)
 
     except Exception as e:
-        print(f"-ХХХ Ошибка при загрузке объекта '{obj_name}' из {blend_file}: {e}")
+        log.error(f"Ошибка при загрузке объекта '{obj_name}' из {blend_file}: {e}")
         return None
 
+@profiling.timed("material_remap")
 def reuse_existing_textures(obj):
     """Заменяет текстуры объекта на уже загруженные (если есть)."""
     if not obj.data.materials:
@@ -86,19 +352,78 @@ def reuse_existing_textures(obj):
 
         for node in mat.node_tree.nodes:
             if node.type == 'TEX_IMAGE' and node.image:
-                base_name = node.image.name.split(".")[0]
-                existing_image = next(
-                    (img for img in bpy.data.images 
-                     if img.name == base_name or img.name.split(".")[0] == base_name),
-                    None
-                )
-                if existing_image:
+                existing_image = canonical_datablock(_image_index, bpy.data.images, node.image)
+                if existing_image != node.image:
                     node.image = existing_image
 
+# Датаблоки, пришедшие из библиотек за текущую сборку: чистим только их
+_build_datablocks = {"meshes": {}, "materials": {}, "images": {}}
+
+def begin_build_tracking():
+    for datablocks in _build_datablocks.values():
+        datablocks.clear()
+
+def _material_images(mat):
+    if not mat.node_tree:
+        return []
+    return [node.image for node in mat.node_tree.nodes if node.type == 'TEX_IMAGE' and node.image]
+
+def track_loaded_datablocks(obj):
+    """Запоминает меш, материалы и изображения загруженного объекта (до схлопывания дубликатов)"""
+    mesh = obj.data
+    if mesh is None:
+        return
+    _build_datablocks["meshes"][mesh.as_pointer()] = mesh
+    for mat in mesh.materials:
+        if not mat:
+            continue
+        _build_datablocks["materials"][mat.as_pointer()] = mat
+        for img in _material_images(mat):
+            _build_datablocks["images"][img.as_pointer()] = img
+
+@profiling.timed("cleanup")
+def clean_build_data() -> int:
+    """Удаляет осиротевшие датаблоки текущей сборки одним bpy.data.batch_remove; возвращает их число"""
+    orphans = []
+    released = {}  # указатель -> сколько пользователей уйдёт вместе с удаляемыми датаблоками
+
+    def is_orphan(datablock):
+        return not datablock.use_fake_user and datablock.users - released.get(datablock.as_pointer(), 0) <= 0
+
+    def release(datablock):
+        released[datablock.as_pointer()] = released.get(datablock.as_pointer(), 0) + 1
+
+    try:
+        for mesh in _build_datablocks["meshes"].values():
+            if is_orphan(mesh):
+                orphans.append(mesh)
+                for mat in mesh.materials:
+                    if mat:
+                        release(mat)
+
+        for mat in _build_datablocks["materials"].values():
+            if is_orphan(mat):
+                orphans.append(mat)
+                for img in _material_images(mat):
+                    release(img)
+
+        for img in _build_datablocks["images"].values():
+            if is_orphan(img):
+                orphans.append(img)
+    except ReferenceError:
+        # Кто-то удалил датаблок в процессе - остальное подчистит ручная очистка
+        pass
+
+    if orphans:
+        bpy.data.batch_remove(orphans)
+        profiling.count("datablocks_removed", len(orphans))
+    begin_build_tracking()
+    return len(orphans)
+
 def clean_unused_data():
-    """Удаляет неиспользуемые материалы и текстуры."""
+    """Полная очистка файла: удаляет все неиспользуемые материалы и текстуры (включая чужие)."""
     for mat in bpy.data.materials:
-        if mat.use_fake_user:
+        if mat.use_fake_user and mat.library is None:
             mat.use_fake_user = False
 
     # Материалы
@@ -112,19 +437,59 @@ def clean_unused_data():
             bpy.data.images.remove(img)
 
 
+def export_mesh_cache(style: str, details: str):
+    """Выгружает меши всех объектов библиотеки в кэш NumPy (mesh_cache) для сборки без Blender.
+    Объекты связываются, вычисляются с модификаторами во временной коллекции и удаляются"""
+    blend_path = get_asset_path(style, details)
+    if not blend_path.exists():
+        raise FileNotFoundError(f"Файл не найден: {blend_path}")
+
+    with open_library(blend_path, link=True) as (data_from, data_to):
+        data_to.objects = list(data_from.objects)
+
+    writer = mesh_cache.MeshCacheWriter(style, details, asset_catalog.file_stamp(blend_path))
+    collection = bpy.data.collections.new("HG_MeshCache")
+    bpy.context.scene.collection.children.link(collection)
+    objects = [obj for obj in data_to.objects if obj is not None]
+    try:
+        for obj in objects:
+            collection.objects.link(obj)
+        depsgraph = bpy.context.evaluated_depsgraph_get()
+        for obj in objects:
+            if obj.type != 'MESH':
+                continue
+            evaluated = obj.evaluated_get(depsgraph)
+            mesh = evaluated.to_mesh()
+            try:
+                positions, uvs, triangles, materials = mesh_merge.read_triangles(mesh)
+            finally:
+                evaluated.to_mesh_clear()
+            # Контур фундамента - ровно тот, что получит планировщик в Blender: порядок и направление рёбер
+            # задают стороны стен и потоки ("segment", i)
+            footprint = helpers.get_foundation_footprint(obj) if "base" in obj.name.lower() else None
+            writer.add(obj.name, positions, uvs, triangles, materials,
+                       [slot.material.name if slot.material else "" for slot in obj.material_slots],
+                       obj.location, obj.rotation_euler, obj.scale, footprint)
+    finally:
+        bpy.data.collections.remove(collection)
+        # Связанные объекты больше никому не нужны; библиотека уйдёт при следующей очистке файла
+        bpy.data.batch_remove([obj for obj in objects if obj.users == 0])
+    return writer.write()
+
+
 # пример функции добавления рандомного фундамента
 def append_random_base(style, details):
     blend_file, obj_name = get_random_asset(style, details, keyword='base')
 
     if not blend_file:
-        print(f"Фундаменты не найдены для {style}, {details}")
+        log.warning(f"Фундаменты не найдены для {style}, {details}")
         return None
     return append_object_from_blend(style, details, blend_file, obj_name)
 
 def append_random_wall15(style, details):
     blend, obj_name = get_random_asset(style, details, keyword='wall15')
     if not blend:
-        print(f"Стены не найдены для {style}, {details}")
+        log.warning(f"Стены не найдены для {style}, {details}")
         return None
     return append_object_from_blend(style, details, blend, obj_name)
 
@@ -132,13 +497,36 @@ def append_random_roof(style, details, base_id):
     blend, obj_name = get_random_asset(style, details, keyword=f'roof_{style}_{details}_{base_id}')
 
     if not blend:
-        print(f"Крыши не найдены для {style}, {details}")
+        log.warning(f"Крыши не найдены для {style}, {details}")
         return None
     return append_object_from_blend(style, details, blend, obj_name)
 
 
+_reset_handlers = ("load_post", "undo_post", "redo_post")
+
+
+def warm_up():
+    """Каталоги всех библиотек, затем таблицы стилей по ним"""
+    asset_catalog.warm_catalogs(blend_reader.list_objects)
+    style_rules.compile_all(blend_reader.list_objects)
+
+
 def register():
-    pass
+    asset_catalog.set_default_lister(list_objects_fast)
+    style_rules.load_styles()
+    # Индекс всех библиотек строится в фоне; поток использует только чтение заголовков (без bpy)
+    threading.Thread(target=warm_up, name="HouseGen catalog", daemon=True).start()
+    for name in _reset_handlers:
+        getattr(bpy.app.handlers, name).append(_on_data_reset)
 
 def unregister():
-    pass
\ No newline at end of file
+    for name in _reset_handlers:
+        handlers = getattr(bpy.app.handlers, name)
+        if _on_data_reset in handlers:
+            handlers.remove(_on_data_reset)
+    invalidate_datablock_index()
+    _pool.clear()
+    asset_catalog.flush()
+    asset_catalog.clear()
+    style_rules.clear()
+    asset_catalog.set_default_lister(None)
\ No newline at end of file
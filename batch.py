@@ -0,0 +1,106 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+from . import planner
+from . import rng_streams
+from . import profiling
+
+# Пакетное планирование кварталов. Модуль без bpy: планы строятся в отдельных процессах,
+# объекты создаёт главный процесс Blender (generator.generate_batch).
+log = profiling.get_logger(__name__)
+
+
+@dataclass
+class BuildingSpec:
+    """Параметры одного здания в пакете"""
+    style: str
+    details: str
+    floors: int
+    seed: int
+    location: tuple = (0.0, 0.0, 0.0)
+
+    def __post_init__(self):
+        # Контуры и прототипы пакета ищутся по (style, details): псевдоним стиля заменяется именем библиотеки
+        self.style = planner.canonical_style(self.style)
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        return cls(data["style"].lower(), data.get("details", "low").lower(), int(data.get("floors", 1)),
+                   int(data.get("seed", 101)), tuple(data.get("location", (0.0, 0.0, 0.0))))
+
+
+def grid_specs(style, details, floors, seed, rows, cols, spacing):
+    """Сетка rows x cols зданий с шагом spacing; у каждого свой сид"""
+    specs = []
+    for row in range(rows):
+        for col in range(cols):
+            specs.append(BuildingSpec(style, details, floors, seed + row * cols + col,
+                                      (col * spacing, row * spacing, 0.0)))
+    return specs
+
+
+def required_libraries(specs) -> set[tuple[str, str]]:
+    """Все .blend (style, details), из которых пакет может брать ассеты"""
+    libraries = set()
+    for spec in specs:
+        for style in planner.get_style_libraries(spec.style):
+            libraries.add((style, spec.details))
+    return libraries
+
+
+# Контуры фундаментов передаются в рабочий процесс один раз через initializer
+_worker_footprints = {}
+
+
+def _init_worker(footprints):
+    _worker_footprints.clear()
+    _worker_footprints.update(footprints)
+
+
+def plan_spec(spec: BuildingSpec, footprints=None):
+    """Планирует одно здание: (план или None, время в секундах). Все случайные решения - из потоков сида здания"""
+    footprints = _worker_footprints if footprints is None else footprints
+    start = time.perf_counter()
+
+    rng = rng_streams.building_stream(spec.seed)
+    foundation = planner.pick_foundation(spec.style, spec.details, rng.child("foundation"))
+    footprint = footprints.get((spec.style, spec.details, foundation)) if foundation else None
+    if footprint is None:
+        log.error(f"Нет контура фундамента для {spec.style}/{spec.details}: {foundation}")
+        return None, time.perf_counter() - start
+
+    segments, origin = footprint
+    plan = planner.plan_building(spec.style, spec.details, spec.floors, spec.seed, foundation, segments, origin, rng)
+    return plan, time.perf_counter() - start
+
+
+# Запуск процесса стоит сотни миллисекунд, а план здания - около миллисекунды:
+# при автоматическом выборе маленькие пакеты планируются в текущем процессе
+POOL_MIN_SPECS = 500
+
+
+def default_workers(count) -> int:
+    if count < POOL_MIN_SPECS:
+        return 1
+    return max(1, (os.cpu_count() or 2) - 1)
+
+
+def plan_specs(specs, footprints, workers=None):
+    """Планирует пакет зданий: список (план, время) в порядке specs. workers <= 1 - в текущем процессе"""
+    workers = default_workers(len(specs)) if workers is None else workers
+    if workers <= 1 or len(specs) < 2:
+        return [plan_spec(spec, footprints) for spec in specs]
+
+    # spawn: рабочие процессы не должны наследовать состояние Blender
+    context = multiprocessing.get_context("spawn")
+    chunksize = max(1, len(specs) // (workers * 4))
+    try:
+        with ProcessPoolExecutor(max_workers=min(workers, len(specs)), mp_context=context,
+                                 initializer=_init_worker, initargs=(footprints,)) as pool:
+            return list(pool.map(plan_spec, specs, chunksize=chunksize))
+    except (OSError, RuntimeError) as e:
+        log.warning(f"Пул процессов недоступен ({e}), планирую в текущем процессе")
+        return [plan_spec(spec, footprints) for spec in specs]
@@ -0,0 +1,88 @@
+"""Микробенчмарк проверки конфликтов размещений: равномерная сетка spatial_index против попарной проверки.
+
+Запуск без Blender: python benchmarks/bench_conflicts.py [--buildings 25 100 400 1600]
+
+Квартал из одинаковых прямоугольных зданий (стены по контуру на каждом этаже) с шагом меньше размера здания,
+чтобы соседи пересекались. Попарная проверка запускается только на небольших кварталах.
+"""
+import argparse
+import importlib.util
+import math
+import sys
+import time
+from pathlib import Path
+
+PACKAGE_DIR = Path(__file__).resolve().parent.parent
+PAIRWISE_MAX_PIECES = 5000
+
+spec = importlib.util.spec_from_file_location("house_generator", PACKAGE_DIR / "__init__.py",
+                                              submodule_search_locations=[str(PACKAGE_DIR)])
+house_generator = importlib.util.module_from_spec(spec)
+sys.modules[spec.name] = house_generator
+spec.loader.exec_module(house_generator)
+from house_generator import spatial_index
+from house_generator.build_plan import BuildPlan
+
+WALL = spatial_index.Shape((0.0, 0.0, 0.0), (0.0, 0.0, 0.0), (1.0, 1.0, 1.0), (0.0, 0.0, 3.0, 0.2))
+
+
+def building_plan(width=12.0, depth=9.0, floors=5) -> BuildPlan:
+    """Стены по 3 м вдоль контура против часовой стрелки; на углах стены заходят друг на друга"""
+    plan = BuildPlan("bench", "low", floors, 0)
+    corners = [(0.0, 0.0), (width, 0.0), (width, depth), (0.0, depth)]
+    for floor in range(floors):
+        for segment, ((x0, y0), (x1, y1)) in enumerate(zip(corners, corners[1:] + corners[:1])):
+            length = math.hypot(x1 - x0, y1 - y0)
+            angle = math.atan2(y1 - y0, x1 - x0)
+            for index in range(int(length // 3.0)):
+                t = index * 3.0 / length
+                plan.add("wall", "wall15", (x0 + (x1 - x0) * t, y0 + (y1 - y0) * t, floor * 3.0), rotation_z=angle,
+                         floor=floor, segment=segment, index=index)
+    return plan
+
+
+def district(buildings, spacing=11.0) -> list:
+    columns = max(1, int(math.sqrt(buildings)))
+    return [(building_plan(), ((number % columns) * spacing, (number // columns) * spacing, 0.0))
+            for number in range(buildings)]
+
+
+def pairwise(entries, shapes) -> int:
+    """Каждая деталь с каждой в том же слое - O(n^2)"""
+    pieces = [((placement.kind, placement.floor), building, placement,
+               spatial_index.placement_box(placement, shapes[("bench", placement.asset)], offset))
+              for building, (plan, offset) in enumerate(entries) for placement in plan.placements]
+    conflicts = 0
+    for i, (layer, building, placement, box) in enumerate(pieces):
+        for other_layer, other_building, other_placement, other in pieces[:i]:
+            if (layer == other_layer and spatial_index.overlap_depth(box, other) > spatial_index.TOLERANCE
+                    and not spatial_index.is_joint(building, placement, box,
+                                                   other_building, other_placement, other)):
+                conflicts += 1
+    return conflicts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарк проверки конфликтов размещений")
+    parser.add_argument("--buildings", nargs="+", type=int, default=[25, 100, 400, 1600])
+    args = parser.parse_args(argv)
+    shapes = {("bench", "wall15"): WALL}
+
+    for buildings in args.buildings:
+        entries = district(buildings)
+        start = time.perf_counter()
+        report = spatial_index.resolve_plans(entries, shapes, "report")
+        grid_seconds = time.perf_counter() - start
+        pieces = report["pieces"]
+        line = (f"зданий {buildings:>5}  деталей {pieces:>7}  конфликтов {len(report['conflicts']):>7}  "
+                f"сетка {grid_seconds:7.3f} с ({grid_seconds / pieces * 1e6:5.1f} мкс/деталь)")
+        if pieces <= PAIRWISE_MAX_PIECES:
+            start = time.perf_counter()
+            found = pairwise(entries, shapes)
+            line += f"  попарно {time.perf_counter() - start:7.3f} с ({found} конфликтов)"
+        print(line, flush=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
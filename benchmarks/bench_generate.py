@@ -0,0 +1,228 @@
+"""Бенчмарк generate_building на синтетических библиотеках: матрица стилей, этажей и числа зданий.
+
+Каждая ячейка матрицы запускается в отдельном blender -b (чистая сессия, своя пиковая память):
+    python benchmarks/bench_generate.py [--blender /path/to/blender] [--styles japanese khrushchev]
+        [--floors 1 5 9] [--buildings 1 10] [--repeat 3] [--assets .cache/bench_assets] [--out results.json]
+
+Библиотеки создаются synthetic_assets.py, если их нет. Результаты сравнивает compare_results.py.
+Одна ячейка (так её запускает раннер):
+    blender -b --factory-startup -P benchmarks/bench_generate.py -- --case japanese low 5 10 --assets ...
+"""
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+PACKAGE_DIR = BENCH_DIR.parent
+RESULT_PREFIX = "HGBENCH "
+SEED = 101
+
+try:
+    import bpy
+except ImportError:
+    bpy = None
+
+spec = importlib.util.spec_from_file_location("synthetic_assets", BENCH_DIR / "synthetic_assets.py")
+synthetic_assets = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(synthetic_assets)
+
+
+def parse_args(argv=None):
+    if argv is None:
+        argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else sys.argv[1:]
+    parser = argparse.ArgumentParser(description="Бенчмарк House Generator на синтетических ассетах")
+    parser.add_argument("--blender", default=None, help="путь к blender (по умолчанию $BLENDER или blender)")
+    parser.add_argument("--assets", default=str(PACKAGE_DIR / ".cache" / "bench_assets"), help="папка синтетических библиотек")
+    parser.add_argument("--styles", nargs="+", default=["japanese", "khrushchev"])
+    parser.add_argument("--details", default="low")
+    parser.add_argument("--floors", nargs="+", type=int, default=[1, 5, 9])
+    parser.add_argument("--buildings", nargs="+", type=int, default=[1, 10])
+    parser.add_argument("--output", default="objects", choices=("objects", "geometry_nodes"), help="вывод generate_building")
+    parser.add_argument("--repeat", type=int, default=1, help="запусков каждой ячейки (в отчёт - медиана)")
+    parser.add_argument("--out", default=None, help="файл результатов (по умолчанию benchmarks/results/<коммит>.json)")
+    parser.add_argument("--case", nargs=4, metavar=("STYLE", "DETAILS", "FLOORS", "BUILDINGS"), help="одна ячейка (внутри Blender)")
+    return parser.parse_args(argv)
+
+
+# ---------------------------------------------------------------------------
+# Ячейка (внутри blender -b)
+
+def import_addon(assets_dir: Path, cache_dir: Path):
+    """Аддон из папки репозитория под именем house_generator, ассеты - из синтетических библиотек"""
+    spec = importlib.util.spec_from_file_location("house_generator", PACKAGE_DIR / "__init__.py",
+                                                  submodule_search_locations=[str(PACKAGE_DIR)])
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    # До register: фоновый прогрев каталогов должен увидеть синтетические библиотеки
+    module.asset_catalog.ASSETS_DIR = assets_dir
+    module.asset_catalog.CACHE_DIR = cache_dir
+    module.register()
+    return module
+
+
+def peak_memory_mb() -> float | None:
+    """Пиковая память процесса (resource есть не везде)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux - КБ, macOS - байты
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def datablock_counts() -> dict:
+    data = bpy.data
+    return {"objects": len(data.objects), "meshes": len(data.meshes), "materials": len(data.materials),
+            "images": len(data.images), "collections": len(data.collections), "libraries": len(data.libraries)}
+
+
+def merge_report(total: dict, report: dict | None):
+    """Складывает отчёт профилирования одной сборки в сумму ячейки"""
+    if not report:
+        return
+    for name, entry in report["timers"].items():
+        timer = total["timers"].setdefault(name, {"seconds": 0.0, "calls": 0})
+        timer["seconds"] += entry["seconds"]
+        timer["calls"] += entry["calls"]
+    for name, value in report["counters"].items():
+        total["counters"][name] = total["counters"].get(name, 0) + value
+
+
+def run_case(args) -> dict:
+    style, details, floors, buildings = args.case[0], args.case[1], int(args.case[2]), int(args.case[3])
+    assets_dir = Path(args.assets)
+    addon = import_addon(assets_dir, assets_dir / ".catalog")
+    addon.profiling.enable(True)
+
+    scene = bpy.context.scene
+    profile = {"timers": {}, "counters": {}}
+    built = 0
+    start = time.perf_counter()
+    for number in range(buildings):
+        collection = bpy.data.collections.new(f"Bench_{style}_{number:03d}")
+        scene.collection.children.link(collection)
+        result = addon.generator.generate_building(style=style, details=details, floors=floors, seed=SEED + number,
+                                                   collection=collection, output=args.output)
+        built += result is not None
+        merge_report(profile, addon.profiling.last_report() if result is not None else None)
+    seconds = time.perf_counter() - start
+
+    return {"style": style, "details": details, "floors": floors, "buildings": buildings, "output": args.output,
+            "built": built, "wall_seconds": seconds, "peak_memory_mb": peak_memory_mb(),
+            "library_opens": profile["counters"].get("library_opens", 0), "datablocks": datablock_counts(),
+            "profile": profile}
+
+
+# ---------------------------------------------------------------------------
+# Раннер матрицы
+
+def find_blender(explicit=None) -> str:
+    if explicit:
+        return explicit
+    if bpy is not None:
+        return bpy.app.binary_path
+    return os.environ.get("BLENDER", "blender")
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PACKAGE_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def ensure_assets(blender, assets_dir: Path, styles, details):
+    """Создаёт синтетические библиотеки стилей, которых нет в папке"""
+    missing = [style for style in styles
+               if not all((assets_dir / library / f"{library_details}.blend").exists()
+                          for library, library_details in synthetic_assets.library_names(style, details))]
+    if not missing:
+        return
+    print(f"---> Синтетические библиотеки: {', '.join(missing)}")
+    subprocess.run([blender, "-b", "--factory-startup", "--python-exit-code", "1",
+                    "-P", str(BENCH_DIR / "synthetic_assets.py"), "--",
+                    "--out", str(assets_dir), "--styles", *missing, "--details", details], check=True,
+                   stdout=subprocess.DEVNULL)
+
+
+def run_cell(blender, args, style, floors, buildings) -> dict:
+    command = [blender, "-b", "--factory-startup", "--python-exit-code", "1", "-P", str(Path(__file__).resolve()), "--",
+               "--case", style, args.details, str(floors), str(buildings), "--assets", str(Path(args.assets).resolve()),
+               "--output", args.output]
+    completed = subprocess.run(command, capture_output=True, text=True, encoding="utf-8", errors="replace")
+    for line in completed.stdout.splitlines():
+        if line.startswith(RESULT_PREFIX):
+            return json.loads(line[len(RESULT_PREFIX):])
+    raise RuntimeError(f"ячейка {style}/{floors}/{buildings} не отчиталась (код {completed.returncode}):\n"
+                       + completed.stdout[-2000:] + completed.stderr[-2000:])
+
+
+def summarize(runs: list[dict]) -> dict:
+    """Ячейка по нескольким запускам: медиана времени, максимум памяти, остальное - из первого запуска"""
+    result = dict(runs[0])
+    times = [run["wall_seconds"] for run in runs]
+    result["wall_seconds"] = statistics.median(times)
+    result["wall_seconds_runs"] = times
+    memory = [run["peak_memory_mb"] for run in runs if run["peak_memory_mb"] is not None]
+    result["peak_memory_mb"] = max(memory) if memory else None
+    return result
+
+
+def run_matrix(args) -> int:
+    blender = find_blender(args.blender)
+    assets_dir = Path(args.assets)
+    ensure_assets(blender, assets_dir, args.styles, args.details)
+
+    cases = []
+    for style in args.styles:
+        for floors in args.floors:
+            for buildings in args.buildings:
+                runs = [run_cell(blender, args, style, floors, buildings) for _ in range(max(1, args.repeat))]
+                case = summarize(runs)
+                cases.append(case)
+                memory = f"{case['peak_memory_mb']:.0f} МБ" if case["peak_memory_mb"] is not None else "-"
+                print(f"{style:<11} этажей {floors:>2} зданий {buildings:>3}: {case['wall_seconds']:7.2f} с  "
+                      f"память {memory:>8}  открытий библиотек {case['library_opens']:>3}  "
+                      f"объектов {case['datablocks']['objects']:>6}", flush=True)
+
+    revision = git_revision()
+    results = {
+        "revision": revision,
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "platform": platform.platform(),
+        "blender": subprocess.run([blender, "--version"], capture_output=True, text=True).stdout.splitlines()[0],
+        "details": args.details,
+        "output": args.output,
+        "repeat": args.repeat,
+        "cases": cases,
+    }
+    out = Path(args.out) if args.out else BENCH_DIR / "results" / f"{revision}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(results, ensure_ascii=False, indent=1), encoding="utf-8")
+    print(f"---> Результаты: {out}")
+    return 0
+
+
+def main():
+    args = parse_args()
+    if args.case:
+        if bpy is None:
+            print("-XXX --case запускается внутри Blender")
+            return 2
+        print(RESULT_PREFIX + json.dumps(run_case(args), ensure_ascii=False), flush=True)
+        return 0
+    return run_matrix(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
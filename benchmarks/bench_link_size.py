@@ -0,0 +1,104 @@
+"""Размер сохранённого файла и время сохранения/открытия: ассеты копируются (append) или связываются (link).
+
+    blender -b --factory-startup -P benchmarks/bench_link_size.py -- [--assets .cache/bench_assets]
+        [--style khrushchev] [--details low] [--floors 5] [--buildings 20] [--out report.json]
+
+Оба режима строят одни и те же здания (сиды 101, 102, ...) в пустой сцене; файлы пишутся без сжатия.
+Синтетические библиотеки создаются synthetic_assets.py, если их нет.
+"""
+import argparse
+import importlib.util
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import bpy
+
+BENCH_DIR = Path(__file__).resolve().parent
+
+spec = importlib.util.spec_from_file_location("bench_generate", BENCH_DIR / "bench_generate.py")
+bench_generate = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(bench_generate)
+synthetic_assets = bench_generate.synthetic_assets
+
+
+def parse_args(argv=None):
+    if argv is None:
+        argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else sys.argv[1:]
+    parser = argparse.ArgumentParser(description="House Generator: размер файла при копировании и связывании ассетов")
+    parser.add_argument("--assets", default=str(bench_generate.PACKAGE_DIR / ".cache" / "bench_assets"))
+    parser.add_argument("--style", default="khrushchev")
+    parser.add_argument("--details", default="low")
+    parser.add_argument("--floors", type=int, default=5)
+    parser.add_argument("--buildings", type=int, default=20)
+    parser.add_argument("--out", default=None, help="JSON-отчёт")
+    return parser.parse_args(argv)
+
+
+def datablock_split(collection) -> dict:
+    """Локальные и связанные датаблоки"""
+    return {"local": sum(1 for item in collection if item.library is None),
+            "linked": sum(1 for item in collection if item.library is not None)}
+
+
+def measure(addon, args, link: bool, path: Path) -> dict:
+    addon.asset_loader.clear_pool()
+    bpy.ops.wm.read_homefile(use_empty=True)
+    addon.asset_loader.set_link_mode(link)
+
+    scene = bpy.context.scene
+    start = time.perf_counter()
+    for number in range(args.buildings):
+        collection = bpy.data.collections.new(f"House_{number:03d}")
+        scene.collection.children.link(collection)
+        addon.generator.generate_building(style=args.style, details=args.details, floors=args.floors,
+                                          seed=bench_generate.SEED + number, collection=collection)
+    build_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    bpy.ops.wm.save_as_mainfile(filepath=str(path), compress=False, relative_remap=True)
+    save_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    bpy.ops.wm.open_mainfile(filepath=str(path), load_ui=False)
+    load_seconds = time.perf_counter() - start
+
+    return {"mode": "link" if link else "append", "bytes": path.stat().st_size, "build_seconds": build_seconds,
+            "save_seconds": save_seconds, "load_seconds": load_seconds, "objects": len(bpy.data.objects),
+            "meshes": datablock_split(bpy.data.meshes), "materials": datablock_split(bpy.data.materials),
+            "images": datablock_split(bpy.data.images)}
+
+
+def main():
+    args = parse_args()
+    assets_dir = Path(args.assets).resolve()
+    if not all((assets_dir / library / f"{details}.blend").exists()
+               for library, details in synthetic_assets.library_names(args.style, args.details)):
+        synthetic_assets.main(["--out", str(assets_dir), "--styles", args.style, "--details", args.details])
+    addon = bench_generate.import_addon(assets_dir, assets_dir / ".catalog")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = [measure(addon, args, link, Path(tmp) / f"{'link' if link else 'append'}.blend")
+                   for link in (False, True)]
+        bpy.ops.wm.read_homefile(use_empty=True)
+
+    append, link = results
+    for result in results:
+        print(f"{result['mode']:<7} {result['bytes'] / 1024:>10.0f} КБ  сохранение {result['save_seconds']:.2f} с  "
+              f"открытие {result['load_seconds']:.2f} с  мешей {result['meshes']['local']} + {result['meshes']['linked']} связ.  "
+              f"материалов {result['materials']['local']} + {result['materials']['linked']} связ.")
+    print(f"---> link / append: размер {link['bytes'] / append['bytes']:.1%}, "
+          f"сохранение {link['save_seconds'] / max(append['save_seconds'], 1e-9):.1%}, "
+          f"открытие {link['load_seconds'] / max(append['load_seconds'], 1e-9):.1%}")
+
+    if args.out:
+        report = {"style": args.style, "details": args.details, "floors": args.floors, "buildings": args.buildings,
+                  "blender": bpy.app.version_string, "results": results}
+        Path(args.out).write_text(json.dumps(report, ensure_ascii=False, indent=1), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+"""Микробенчмарк подбора стен: прежний однородный подбор против ДП-решателя с кэшем.
+
+Запуск без Blender: python benchmarks/bench_wall_packing.py
+"""
+import importlib.util
+import random
+import time
+from pathlib import Path
+
+spec = importlib.util.spec_from_file_location("wall_packing", Path(__file__).resolve().parent.parent / "wall_packing.py")
+wall_packing = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(wall_packing)
+
+ROUNDS = 20000
+
+
+def typical_lengths(count, seed=1):
+    """Длины рёбер типовых фундаментов (город из одинаковых серий) с шумом моделирования"""
+    rng = random.Random(seed)
+    standard = [6.0, 8.0, 10.0, 12.0, 12.4, 14.4, 24.0, 36.0, 48.0, 60.0]
+    return [rng.choice(standard) + rng.choice((0.0, 0.0, 0.0004, -0.0003)) for _ in range(count)]
+
+
+def random_lengths(count, seed=2):
+    rng = random.Random(seed)
+    return [rng.uniform(2.0, 60.0) for _ in range(count)]
+
+
+def run(name, func, lengths):
+    start = time.perf_counter()
+    found = 0
+    for length in lengths:
+        if func(length):
+            found += 1
+    elapsed = time.perf_counter() - start
+    print(f"{name:<34} {len(lengths) / elapsed:>12.0f} сегм/с   найдено {found / len(lengths):6.1%}")
+
+
+def mean_scale_error(func, lengths):
+    errors = [abs(result[1] - 1.0) for result in map(func, lengths) if result]
+    return sum(errors) / max(1, len(errors))
+
+
+def main():
+    typical = typical_lengths(ROUNDS)
+    arbitrary = random_lengths(ROUNDS)
+
+    print("Типовые фундаменты:")
+    run("  прежний (одна длина)", wall_packing.find_uniform_combination, typical)
+    wall_packing.solve_wall_packing.cache_clear()
+    run("  ДП, кэш прогревается", wall_packing.find_wall_combination, typical)
+    run("  ДП, тёплый кэш", wall_packing.find_wall_combination, typical)
+    print(f"  {wall_packing.solve_wall_packing.cache_info()}")
+
+    print("Произвольные длины:")
+    run("  прежний (одна длина)", wall_packing.find_uniform_combination, arbitrary)
+    wall_packing.solve_wall_packing.cache_clear()
+    run("  ДП, холодный кэш", wall_packing.find_wall_combination, arbitrary)
+
+    print("Средняя ошибка масштаба (произвольные длины):")
+    print(f"  прежний: {mean_scale_error(wall_packing.find_uniform_combination, arbitrary):.4f}")
+    print(f"  ДП:      {mean_scale_error(wall_packing.find_wall_combination, arbitrary):.4f}")
+
+
+if __name__ == "__main__":
+    main()
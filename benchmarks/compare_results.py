@@ -0,0 +1,85 @@
+"""Сравнение двух файлов результатов bench_generate.py (например, до и после коммита).
+
+    python benchmarks/compare_results.py base.json new.json [--threshold 10]
+
+Код возврата 1, если время или память какой-либо ячейки выросли больше порога (в процентах)
+или выросло число открытий библиотек.
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+METRICS = (
+    ("wall_seconds", "время, с", "{:.2f}"),
+    ("peak_memory_mb", "память, МБ", "{:.0f}"),
+    ("library_opens", "открытий", "{:d}"),
+)
+
+
+def case_key(case: dict) -> tuple:
+    return case["style"], case["details"], case["floors"], case["buildings"], case.get("output", "objects")
+
+
+def load_results(path) -> tuple[dict, dict]:
+    data = json.loads(Path(path).read_text(encoding="utf-8"))
+    return data, {case_key(case): case for case in data["cases"]}
+
+
+def change(old, new) -> float | None:
+    if old is None or new is None or not old:
+        return None
+    return (new - old) / old * 100.0
+
+
+def compare(old_cases: dict, new_cases: dict, threshold: float) -> list[str]:
+    """Печатает таблицу изменений; возвращает список регрессий"""
+    regressions = []
+    for key in sorted(old_cases.keys() & new_cases.keys()):
+        old, new = old_cases[key], new_cases[key]
+        cells = []
+        for metric, title, fmt in METRICS:
+            before, after = old.get(metric), new.get(metric)
+            if before is None or after is None:
+                cells.append(f"{title} -")
+                continue
+            delta = change(before, after)
+            text = f"{title} {fmt.format(before)} -> {fmt.format(after)}"
+            if delta is not None:
+                text += f" ({delta:+.1f}%)"
+            cells.append(text)
+            if metric == "library_opens":
+                if after > before:
+                    regressions.append(f"{key}: {title} {before} -> {after}")
+            elif delta is not None and delta > threshold:
+                regressions.append(f"{key}: {title} {delta:+.1f}%")
+
+        objects_before, objects_after = old["datablocks"]["objects"], new["datablocks"]["objects"]
+        if objects_before != objects_after:
+            cells.append(f"объектов {objects_before} -> {objects_after}")
+        style, details, floors, buildings, _ = key
+        print(f"{style:<11} {details:<6} этажей {floors:>2} зданий {buildings:>3}:  " + "  ".join(cells))
+
+    for key in sorted(old_cases.keys() ^ new_cases.keys()):
+        print(f"--- Ячейка {key} есть только в одном из файлов")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Сравнение результатов бенчмарка House Generator")
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=10.0, help="допустимый рост времени и памяти, %%")
+    args = parser.parse_args(argv)
+
+    old_data, old_cases = load_results(args.base)
+    new_data, new_cases = load_results(args.new)
+    print(f"---> {old_data['revision']} ({old_data['blender']}) -> {new_data['revision']} ({new_data['blender']})")
+    regressions = compare(old_cases, new_cases, args.threshold)
+    for regression in regressions:
+        print(f"-XXX {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
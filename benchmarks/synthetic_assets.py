@@ -0,0 +1,170 @@
+"""Синтетические библиотеки ассетов для бенчмарков: assets/<style>/<details>.blend с именами как в настоящих.
+
+Запуск в Blender:
+    blender -b --factory-startup -P benchmarks/synthetic_assets.py -- --out .cache/bench_assets
+        [--styles japanese khrushchev] [--details low] [--variants 3] [--bases 3] [--materials 8]
+        [--images 0] [--filler 0] [--cuts 0]
+
+Без Blender доступен только список имён (library_names) - им пользуется раннер бенчмарков.
+"""
+import argparse
+import sys
+from pathlib import Path
+
+try:
+    import bpy
+    import bmesh
+except ImportError:
+    bpy = None
+
+WALL_KEYS = {10: 2.0, 12: 2.4, 15: 3.0}  # wall<n>: n = длина * 5, как в planner
+# Размеры фундаментов (X, Y): стороны раскладываются на стены из WALL_KEYS
+BASE_SIZES = [(12.0, 9.0), (14.4, 7.2), (9.6, 6.0), (18.0, 12.0), (7.2, 7.2), (24.0, 9.6), (10.8, 8.4), (6.0, 6.0), (15.0, 10.8)]
+FLOOR_HEIGHT = 2.7
+WALL_THICKNESS = 0.2
+
+# Крыша хрущёвки лежит в отдельной библиотеке "khr" (roof.library в styles/khrushchev.json)
+ROOF_LIBRARY = {"khrushchev": "khr"}
+BALCONY_STYLES = ("khrushchev", "stalinist")
+
+
+def wall_kinds(style: str) -> list[str]:
+    """Типы стен стиля: стиль (глухая), окно, дверь и балкон для советских серий"""
+    kinds = [style, "window", "door"]
+    if style in BALCONY_STYLES:
+        kinds.append("balcony")
+    return kinds
+
+
+def library_names(style: str, details: str, variants: int = 3, bases: int = 3, filler: int = 0) -> dict:
+    """Объекты библиотек стиля: {(библиотека, details): [(имя, вид, длина или индекс фундамента)]}"""
+    if not 1 <= bases <= len(BASE_SIZES):
+        # Ключ крыши roof_<style>_<details>_<id> ищется подстрокой: id 1 совпал бы с 10
+        raise ValueError(f"фундаментов должно быть от 1 до {len(BASE_SIZES)}")
+
+    objects = []
+    for base_id in range(1, bases + 1):
+        objects.append((f"base_{style}_{base_id}", "base", base_id))
+    for key, length in WALL_KEYS.items():
+        for kind in wall_kinds(style):
+            for variant in range(1, variants + 1):
+                objects.append((f"wall{key}_{kind}_{variant}", "wall", length))
+        if style != "khrushchev":
+            for variant in range(1, variants + 1):
+                objects.append((f"engawa{key}_{variant}", "engawa", length))
+                objects.append((f"interfloor{key}_{variant}", "interfloor", length))
+    for index in range(filler):
+        objects.append((f"prop_{index:04d}", "filler", index))
+
+    roof_style = ROOF_LIBRARY.get(style, style)
+    roofs = [(f"roof_{roof_style}_{details}_{base_id}", "roof", base_id) for base_id in range(1, bases + 1)]
+    if roof_style == style:
+        return {(style, details): objects + roofs}
+    return {(style, details): objects, (roof_style, details): roofs}
+
+
+def object_size(kind: str, value) -> tuple[float, float, float, tuple[float, float, float]]:
+    """Размеры коробки объекта и её минимальный угол (начало координат объекта - в углу или центре)"""
+    if kind in ("base", "roof"):
+        width, depth = BASE_SIZES[value - 1]
+        if kind == "base":
+            return width, depth, 0.2, (0.0, 0.0, 0.0)
+        return width + 0.6, depth + 0.6, 1.5, (-0.3, -0.3, 0.0)
+    if kind == "wall":
+        return value, WALL_THICKNESS, FLOOR_HEIGHT - 0.2, (0.0, 0.0, 0.0)
+    if kind == "engawa":
+        return value, 0.9, 0.2, (0.0, -0.9, 0.0)
+    if kind == "interfloor":
+        return value, WALL_THICKNESS + 0.1, 0.3, (0.0, -0.05, FLOOR_HEIGHT - 0.5)
+    return 0.5, 0.5, 0.5, (-0.25, -0.25, 0.0)
+
+
+def build_box(name, size, corner, cuts):
+    mesh = bpy.data.meshes.new(name)
+    bm = bmesh.new()
+    bmesh.ops.create_cube(bm, size=1.0)
+    if cuts:
+        bmesh.ops.subdivide_edges(bm, edges=bm.edges[:], cuts=cuts, use_grid_fill=True)
+    for vert in bm.verts:
+        vert.co.x = (vert.co.x + 0.5) * size[0] + corner[0]
+        vert.co.y = (vert.co.y + 0.5) * size[1] + corner[1]
+        vert.co.z = (vert.co.z + 0.5) * size[2] + corner[2]
+    bm.to_mesh(mesh)
+    bm.free()
+    return mesh
+
+
+def make_materials(count, images) -> tuple[list, list]:
+    """Общие материалы библиотеки; первые images из них получают упакованную текстуру"""
+    materials, textures = [], []
+    for index in range(count):
+        mat = bpy.data.materials.new(f"HG_Bench_{index:02d}")
+        mat.diffuse_color = ((index * 0.37) % 1.0, (index * 0.61) % 1.0, (index * 0.13) % 1.0, 1.0)
+        if index < images:
+            mat.use_nodes = True
+            image = bpy.data.images.new(f"HG_Bench_{index:02d}", 64, 64)
+            image.generated_type = 'UV_GRID'
+            image.pack()
+            node = mat.node_tree.nodes.new("ShaderNodeTexImage")
+            node.image = image
+            textures.append(image)
+        materials.append(mat)
+    return materials, textures
+
+
+def write_library(path: Path, objects, materials, cuts=0):
+    created = []
+    for number, (name, kind, value) in enumerate(objects):
+        width, depth, height, corner = object_size(kind, value)
+        mesh = build_box(name, (width, depth, height), corner, cuts)
+        # Два слота на объект: детали делят материалы, как в настоящих библиотеках
+        for slot in range(min(2, len(materials))):
+            mesh.materials.append(materials[(number + slot) % len(materials)])
+        if len(mesh.materials) > 1:
+            mesh.polygons.foreach_set("material_index", [index % 2 for index in range(len(mesh.polygons))])
+        created.append(bpy.data.objects.new(name, mesh))
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    bpy.data.libraries.write(str(path), set(created), fake_user=True, compress=False)
+    print(f"---> {path}: объектов {len(created)}, материалов {len(materials)}")
+
+    meshes = [obj.data for obj in created]
+    bpy.data.batch_remove(created)
+    bpy.data.batch_remove(meshes)
+
+
+def parse_args(argv=None):
+    if argv is None:
+        argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else sys.argv[1:]
+    parser = argparse.ArgumentParser(description="Синтетические библиотеки ассетов House Generator")
+    parser.add_argument("--out", required=True, help="папка assets (внутри <style>/<details>.blend)")
+    parser.add_argument("--styles", nargs="+", default=["japanese", "khrushchev"])
+    parser.add_argument("--details", nargs="+", default=["low"])
+    parser.add_argument("--variants", type=int, default=3, help="вариантов на каждый ключ стены")
+    parser.add_argument("--bases", type=int, default=3, help=f"фундаментов (и крыш) на стиль, 1..{len(BASE_SIZES)}")
+    parser.add_argument("--materials", type=int, default=8, help="материалов на библиотеку")
+    parser.add_argument("--images", type=int, default=0, help="сколько материалов получают текстуру")
+    parser.add_argument("--filler", type=int, default=0, help="лишних объектов на библиотеку (размер каталога)")
+    parser.add_argument("--cuts", type=int, default=0, help="разрезов коробки (плотность мешей)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if bpy is None:
+        print("-XXX Запускать в Blender: blender -b --factory-startup -P synthetic_assets.py -- --out ...")
+        return 2
+
+    out_dir = Path(args.out)
+    for style in args.styles:
+        for details in args.details:
+            for (library, library_details), objects in library_names(style, details, args.variants, args.bases,
+                                                                     args.filler).items():
+                materials, textures = make_materials(args.materials, args.images)
+                write_library(out_dir / library / f"{library_details}.blend", objects, materials, args.cuts)
+                bpy.data.batch_remove(materials + textures)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,225 @@
+"""Чтение имён объектов, материалов и изображений из .blend без Blender.
+
+Разбираются только заголовки блоков файла и SDNA (для смещения имени в структуре ID);
+несжатый файл отображается в память, gzip/zstd распаковываются целиком (zstd - через пакет zstandard).
+
+    python blend_reader.py file.blend [...]        имена ID в файлах
+    python blend_reader.py --validate assets/      проверка всех библиотек стилей (код возврата 1 при ошибках)
+"""
+import gzip
+import mmap
+import re
+import struct
+import sys
+from pathlib import Path
+
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+ID_CODES = {b"OB": "objects", b"MA": "materials", b"IM": "images"}
+
+_ARRAY = re.compile(r"\[(\d+)\]")
+
+
+class BlendReadError(ValueError):
+    """Файл не похож на .blend или повреждён"""
+
+
+def open_buffer(path):
+    """Содержимое файла: mmap для несжатого, bytes для gzip/zstd"""
+    with open(path, "rb") as f:
+        magic = f.read(4)
+        f.seek(0)
+        if not magic:
+            raise BlendReadError("пустой файл")
+        if magic[:2] == GZIP_MAGIC:
+            return gzip.decompress(f.read())
+        if magic == ZSTD_MAGIC:
+            try:
+                import zstandard  # необязательная зависимость
+            except ImportError:
+                raise BlendReadError("файл сжат zstd, нужен пакет zstandard") from None
+            with zstandard.ZstdDecompressor().stream_reader(f, read_across_frames=True) as reader:
+                return reader.read()
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def parse_header(data):
+    """Заголовок файла: (размер заголовка, размер указателя, порядок байт, формат BHead)"""
+    if data[:7] != b"BLENDER":
+        raise BlendReadError("нет сигнатуры BLENDER")
+    if data[7:9].isdigit():
+        # Новый заголовок (5.0+): BLENDER17-01v0500 - размер заголовка, версия формата, версия Blender
+        header_size = int(data[7:9])
+        endian = "<" if data[12:13] == b"v" else ">"
+        if int(data[10:12]) != 1:
+            raise BlendReadError(f"неизвестный формат файла {data[10:12]!r}")
+        return header_size, 8, endian, "large"
+
+    pointer_size = {b"_": 4, b"-": 8}.get(data[7:8])
+    if pointer_size is None:
+        raise BlendReadError(f"неизвестный размер указателя {data[7:8]!r}")
+    endian = "<" if data[8:9] == b"v" else ">"
+    return 12, pointer_size, endian, "small"
+
+
+def iter_blocks(data, header_size, pointer_size, endian, bhead):
+    """Заголовки блоков: (код, смещение данных, длина данных)"""
+    if bhead == "large":
+        # code, SDNAnr, old (8), len (8), nr (8)
+        layout = struct.Struct(endian + "4siQqq")
+        length_index = 3
+    else:
+        # code, len, old (4 или 8), SDNAnr, nr
+        layout = struct.Struct(endian + "4si" + ("I" if pointer_size == 4 else "Q") + "ii")
+        length_index = 1
+
+    offset, end = header_size, len(data)
+    while offset + layout.size <= end:
+        fields = layout.unpack_from(data, offset)
+        code, length = fields[0], fields[length_index]
+        offset += layout.size
+        if code == b"ENDB":
+            return
+        if length < 0 or offset + length > end:
+            raise BlendReadError("блок выходит за конец файла")
+        yield code, offset, length
+        offset += length
+
+
+def parse_sdna(data, offset, endian, pointer_size):
+    """Смещение и размер поля name в структуре ID по описанию DNA1"""
+    def align(position):
+        # Выравнивание по 4 байта от начала данных блока
+        return offset + ((position - offset + 3) & ~3)
+
+    def read_strings(position, count):
+        strings = []
+        for _ in range(count):
+            end = data.find(b"\0", position)
+            strings.append(bytes(data[position:end]).decode("latin-1"))
+            position = end + 1
+        return strings, position
+
+    position = offset
+    if data[position:position + 4] != b"SDNA":
+        raise BlendReadError("повреждён блок DNA1")
+    position += 4
+
+    sections = {}
+    for tag in (b"NAME", b"TYPE"):
+        if data[position:position + 4] != tag:
+            raise BlendReadError(f"в DNA1 нет секции {tag.decode()}")
+        count, = struct.unpack_from(endian + "i", data, position + 4)
+        sections[tag], position = read_strings(position + 8, count)
+        position = align(position)
+    names, types = sections[b"NAME"], sections[b"TYPE"]
+
+    if data[position:position + 4] != b"TLEN":
+        raise BlendReadError("в DNA1 нет секции TLEN")
+    lengths = struct.unpack_from(endian + f"{len(types)}h", data, position + 4)
+    position = align(position + 4 + 2 * len(types))
+
+    if data[position:position + 4] != b"STRC":
+        raise BlendReadError("в DNA1 нет секции STRC")
+    count, = struct.unpack_from(endian + "i", data, position + 4)
+    position += 8
+    for _ in range(count):
+        type_index, field_count = struct.unpack_from(endian + "hh", data, position)
+        fields = struct.unpack_from(endian + f"{2 * field_count}h", data, position + 4)
+        position += 4 + 4 * field_count
+        if types[type_index] != "ID":
+            continue
+
+        field_offset = 0
+        for field_type, name_index in zip(fields[::2], fields[1::2]):
+            name = names[name_index]
+            size = pointer_size if name.startswith(("*", "(*")) else lengths[field_type]
+            for dim in _ARRAY.findall(name):
+                size *= int(dim)
+            if name.split("[")[0] == "name":
+                return field_offset, size
+            field_offset += size
+    raise BlendReadError("в DNA нет структуры ID с полем name")
+
+
+def read_id_names(path, codes=ID_CODES) -> dict[str, list[str]]:
+    """Имена ID по видам ({"objects": [...], "materials": [...], "images": [...]}) в порядке файла"""
+    data = open_buffer(path)
+    try:
+        header_size, pointer_size, endian, bhead = parse_header(data)
+        blocks = []
+        name_layout = None
+        for code, offset, length in iter_blocks(data, header_size, pointer_size, endian, bhead):
+            if code[:2] in codes and code[2:] == b"\0\0":
+                blocks.append((code[:2], offset, length))
+            elif code == b"DNA1":
+                name_layout = parse_sdna(data, offset, endian, pointer_size)
+        if name_layout is None:
+            raise BlendReadError("нет блока DNA1")
+
+        name_offset, name_size = name_layout
+        result = {kind: [] for kind in codes.values()}
+        for code, offset, length in blocks:
+            if name_offset + name_size > length:
+                continue
+            raw = bytes(data[offset + name_offset:offset + name_offset + name_size])
+            # Первые два символа имени ID - код типа (OBCube)
+            result[codes[code]].append(raw.split(b"\0", 1)[0][2:].decode("utf-8", "replace"))
+        return result
+    except struct.error as e:
+        raise BlendReadError(str(e)) from None
+    finally:
+        if isinstance(data, mmap.mmap):
+            data.close()
+
+
+def list_objects(path) -> list[str]:
+    """Имена объектов файла - lister для каталога ассетов"""
+    return read_id_names(path, {b"OB": "objects"})["objects"]
+
+
+def validate_assets(assets_dir) -> list[str]:
+    """Проверяет все assets/<style>/<details>.blend: файл читается и в нём есть объекты"""
+    problems = []
+    for blend_path in sorted(Path(assets_dir).glob("*/*.blend")):
+        try:
+            names = read_id_names(blend_path)
+        except (OSError, BlendReadError) as e:
+            problems.append(f"{blend_path}: {e}")
+            continue
+        objects = names["objects"]
+        print(f"{blend_path}: объектов {len(objects)}, материалов {len(names['materials'])}, "
+              f"изображений {len(names['images'])}")
+        if not objects:
+            problems.append(f"{blend_path}: нет объектов")
+    return problems
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        print(__doc__)
+        return 2
+
+    if argv[0] == "--validate":
+        problems = validate_assets(argv[1] if len(argv) > 1 else Path(__file__).parent / "assets")
+        for problem in problems:
+            print(f"-XXX {problem}")
+        return 1 if problems else 0
+
+    status = 0
+    for path in argv:
+        try:
+            names = read_id_names(path)
+        except (OSError, BlendReadError) as e:
+            print(f"-XXX {path}: {e}")
+            status = 1
+            continue
+        print(f"---> {path}")
+        for kind, items in names.items():
+            print(f"{kind} ({len(items)}): {', '.join(items)}")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
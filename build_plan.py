@@ -0,0 +1,134 @@
+import json
+from dataclasses import dataclass, field
+
+# План здания: компактный список размещений без bpy.
+# Генераторы только заполняют план, объекты Blender создаёт realizer.
+PLAN_VERSION = 1
+
+
+@dataclass
+class Placement:
+    """Одно размещение ассета"""
+    kind: str                   # base / wall / engawa / interfloor / roof
+    asset: str                  # имя объекта в .blend
+    location: tuple             # (x, y, z); None по оси - оставить как в ассете
+    rotation_z: float | None = None
+    scale: tuple = (1.0, 1.0, 1.0)  # множители к масштабу ассета
+    floor: int = 0
+    segment: int = -1
+    index: int = 0
+    keyword: str = ""
+    library: str | None = None  # стиль другой библиотеки (крыша хрущёвки лежит в "khr")
+
+    def to_list(self) -> list:
+        return [self.kind, self.asset, list(self.location), self.rotation_z, list(self.scale),
+                self.floor, self.segment, self.index, self.keyword, self.library]
+
+    @classmethod
+    def from_list(cls, data: list):
+        kind, asset, location, rotation_z, scale, floor, segment, index, keyword, library = data
+        return cls(kind, asset, tuple(location), rotation_z, tuple(scale), floor, segment, index, keyword, library)
+
+    def transform(self, proto_location, proto_rotation, proto_scale, offset=None) -> tuple[list, list, list]:
+        """Итоговые положение, поворот (Euler XYZ) и масштаб копии прототипа - как у realizer.realize_placement"""
+        location = list(proto_location)
+        for axis, value in enumerate(self.location):
+            if value is not None:
+                location[axis] = value
+        if offset:
+            for axis, value in enumerate(offset):
+                location[axis] += value
+
+        rotation = list(proto_rotation)
+        if self.rotation_z is not None:
+            rotation[2] = self.rotation_z
+        scale = [proto_scale[axis] * self.scale[axis] for axis in range(3)]
+        return location, rotation, scale
+
+
+@dataclass
+class BuildPlan:
+    """Все решения генератора по одному зданию"""
+    style: str
+    details: str
+    floors: int
+    seed: int
+    foundation: str = ""
+    placements: list[Placement] = field(default_factory=list)
+
+    def add(self, kind: str, asset: str, location, **kwargs) -> Placement:
+        placement = Placement(kind, asset, tuple(location), **kwargs)
+        self.placements.append(placement)
+        return placement
+
+    def assets_by_library(self) -> dict[tuple[str, str], list[str]]:
+        """Имена объектов, сгруппированные по .blend (style, details) - для пакетной загрузки.
+        Размещения без ассета (плита по контуру из файла) не загружаются"""
+        libraries = {}
+        for placement in self.placements:
+            if not placement.asset:
+                continue
+            key = (placement.library or self.style, self.details)
+            libraries.setdefault(key, {})[placement.asset] = None
+        return {key: list(names) for key, names in libraries.items()}
+
+    def floor_placements(self, floor: int) -> list[Placement]:
+        return [p for p in self.placements if p.floor == floor]
+
+    def floor_base_z(self, floor: int) -> float:
+        """Высота этажа по его плите (0, если плиты нет)"""
+        for p in self.placements:
+            if p.floor == floor and p.kind == "base" and p.location[2] is not None:
+                return p.location[2]
+        return 0.0
+
+    def floor_signature(self, floor: int) -> tuple:
+        """Содержимое этажа относительно его высоты: у одинаковых этажей подписи равны"""
+        base_z = self.floor_base_z(floor)
+        signature = []
+        for p in self.floor_placements(floor):
+            x, y, z = p.location
+            z = None if z is None else round(z - base_z, 6)
+            signature.append((p.kind, p.library, p.asset, x, y, z, p.rotation_z, p.scale, p.segment, p.index))
+        return tuple(signature)
+
+    def repeated_floors(self) -> list[list[int]]:
+        """Группы одинаковых этажей (от двух этажей в группе), по возрастанию номера"""
+        groups = {}
+        for floor in range(self.floors):
+            groups.setdefault(self.floor_signature(floor), []).append(floor)
+        return [floors for floors in groups.values() if len(floors) > 1]
+
+    def to_dict(self) -> dict:
+        return {
+            "version": PLAN_VERSION,
+            "style": self.style,
+            "details": self.details,
+            "floors": self.floors,
+            "seed": self.seed,
+            "foundation": self.foundation,
+            "placements": [p.to_list() for p in self.placements],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        if data.get("version") != PLAN_VERSION:
+            raise ValueError(f"Неподдерживаемая версия плана: {data.get('version')}")
+        placements = [Placement.from_list(item) for item in data["placements"]]
+        return cls(data["style"], data["details"], data["floors"], data["seed"], data["foundation"], placements)
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), ensure_ascii=False, separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, text: str):
+        return cls.from_dict(json.loads(text))
+
+    def to_msgpack(self) -> bytes:
+        import msgpack  # необязательная зависимость
+        return msgpack.packb(self.to_dict(), use_bin_type=True)
+
+    @classmethod
+    def from_msgpack(cls, payload: bytes):
+        import msgpack
+        return cls.from_dict(msgpack.unpackb(payload, raw=False))
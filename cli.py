@@ -0,0 +1,381 @@
+"""Пакетная генерация без интерфейса.
+
+Один процесс Blender (исполнитель):
+    blender -b --factory-startup -P cli.py -- --jobs jobs.json --out out/ [--format blend|glb] [--shard 0/4] [--profile]
+
+Координатор: делит задания между N фоновыми процессами Blender и сводит их статусы:
+    python cli.py --jobs jobs.json --out out/ --processes 4 [--blender /path/to/blender]
+
+Файл заданий - JSON-список (или {"jobs": [...]}) либо JSON Lines; задание:
+    {"name": "khr_01", "style": "khrushchev", "details": "low", "floors": 5, "seed": 7, "format": "blend"}
+необязательный "output": "geometry_nodes" - здание одним объектом с экземплярами,
+"link": true - меши и материалы ссылаются на библиотеки ассетов, а не копируются (по умолчанию --link)
+
+Кэш мешей ассетов для сборки без Blender (все библиотеки assets/<style>/<details>.blend):
+    blender -b --factory-startup -P cli.py -- --mesh-cache
+
+Сборка glTF из кэша мешей без Blender (обычный python; "plan": "plan.json" в задании - готовый план здания):
+    python cli.py --from-cache --jobs jobs.json --out out/ [--format glb|gltf]
+
+Здания по контурам из файла (GeoJSON / GeoJSON Lines / CSV с WKT), частями по --chunk в отдельные .blend:
+    blender -b --factory-startup -P cli.py -- --footprints city.geojson --out out/ [--style khrushchev]
+        [--floors 5] [--seed 101] [--chunk 500] [--crs auto|lonlat|metric]
+"""
+import argparse
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+PACKAGE_DIR = Path(__file__).resolve().parent
+STATUS_PREFIX = "HGJOB "
+
+try:
+    import bpy
+except ImportError:
+    bpy = None
+
+
+def parse_args(argv=None):
+    if argv is None:
+        argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else sys.argv[1:]
+
+    parser = argparse.ArgumentParser(description="House Generator: пакетная генерация зданий")
+    parser.add_argument("--jobs", help="файл заданий (.json / .jsonl)")
+    parser.add_argument("--footprints", help="файл контуров зданий (.geojson / .geojsonl / .csv)")
+    parser.add_argument("--out", help="папка для результатов")
+    parser.add_argument("--format", choices=("blend", "glb", "gltf"), default="blend", help="формат по умолчанию")
+    parser.add_argument("--shard", default="0/1", help="i/N: этот процесс берёт задания с номером i по модулю N")
+    parser.add_argument("--processes", type=int, default=1, help="число фоновых процессов Blender (координатор)")
+    parser.add_argument("--blender", default=None, help="путь к blender для координатора")
+    parser.add_argument("--profile", action="store_true", help="таймеры и счётчики сборки в статусе задания")
+    parser.add_argument("--link", action="store_true", help="связывать ассеты с библиотеками вместо копирования")
+    parser.add_argument("--conflicts", choices=("off", "report", "skip", "trim"), default="report",
+                        help="пересекающиеся детали: только отчёт, убрать или укоротить")
+    parser.add_argument("--style", default="khrushchev", help="стиль контуров без свойства style")
+    parser.add_argument("--details", default="low", help="детализация контуров без свойства details")
+    parser.add_argument("--floors", type=int, default=5, help="этажей у контуров без свойства floors / building:levels")
+    parser.add_argument("--seed", type=int, default=101, help="базовый сид контуров")
+    parser.add_argument("--chunk", type=int, default=500, help="зданий в одном .blend")
+    parser.add_argument("--crs", choices=("auto", "lonlat", "metric"), default="auto",
+                        help="координаты контуров: auto - градусы для GeoJSON, метры для CSV")
+    parser.add_argument("--mesh-cache", action="store_true", help="выгрузить меши ассетов в кэш NumPy (внутри Blender)")
+    parser.add_argument("--from-cache", action="store_true", help="собрать glTF из кэша мешей без Blender")
+    args = parser.parse_args(argv)
+    if args.mesh_cache:
+        return args
+    if not args.jobs and not args.footprints:
+        parser.error("нужен --jobs, --footprints или --mesh-cache")
+    if not args.out:
+        parser.error("нужен --out")
+    return args
+
+
+def load_jobs(path) -> list[dict]:
+    text = Path(path).read_text(encoding="utf-8")
+    if str(path).endswith(".jsonl"):
+        jobs = [json.loads(line) for line in text.splitlines() if line.strip()]
+    else:
+        data = json.loads(text)
+        jobs = data["jobs"] if isinstance(data, dict) else data
+
+    for index, job in enumerate(jobs):
+        job.setdefault("name", f"{index:05d}_{job.get('style', 'house')}_{job.get('seed', 101)}")
+    return jobs
+
+
+def parse_shard(shard: str) -> tuple[int, int]:
+    index, count = (int(part) for part in shard.split("/"))
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Некорректный шард: {shard}")
+    return index, count
+
+
+# ---------------------------------------------------------------------------
+# Исполнитель (внутри blender -b)
+
+def import_package():
+    """Импортирует пакет из папки скрипта под именем house_generator (без регистрации; работает и без bpy)"""
+    spec = importlib.util.spec_from_file_location("house_generator", PACKAGE_DIR / "__init__.py",
+                                                  submodule_search_locations=[str(PACKAGE_DIR)])
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def import_addon():
+    """Импортирует аддон из папки скрипта под именем house_generator (без установки в Blender)"""
+    module = import_package()
+    module.register()
+    return module
+
+
+def job_collection(scene, name):
+    """Новая коллекция задания, активная для generate_building"""
+    collection = bpy.data.collections.new(name)
+    scene.collection.children.link(collection)
+    view_layer = bpy.context.view_layer
+    view_layer.active_layer_collection = view_layer.layer_collection.children[collection.name]
+    return collection
+
+
+def export_collection(collection, path: Path, file_format: str, linked=False):
+    if file_format == "blend":
+        # Коллекция без сцены держится fake user, чтобы пережить открытие файла;
+        # пути связанных библиотек пересчитываются относительно нового файла
+        collection.use_fake_user = True
+        bpy.data.libraries.write(str(path), {collection}, path_remap="RELATIVE" if linked else "NONE", compress=True)
+        collection.use_fake_user = False
+        return
+
+    for obj in bpy.context.view_layer.objects:
+        obj.select_set(obj.name in collection.objects)
+    bpy.ops.export_scene.gltf(filepath=str(path), use_selection=True,
+                              export_format="GLB" if file_format == "glb" else "GLTF_SEPARATE")
+
+
+def remove_collection(addon, collection):
+    """Убирает здание из сессии вместе с облаком точек GN, его прототипами, экземплярами этажей
+    и слитыми мешами: прототипы в пуле остаются для следующих заданий"""
+    addon.generator.remove_building(collection, addon.manifest.read_manifest(collection))
+
+
+def run_job(addon, job, out_dir: Path, default_format: str, default_link=False) -> dict:
+    file_format = job.get("format", default_format)
+    linked = bool(job.get("link", default_link))
+    output = out_dir / f"{job['name']}.{file_format}"
+    status = {"name": job["name"], "status": "ok", "output": str(output)}
+    start = time.perf_counter()
+
+    scene = bpy.context.scene
+    collection = job_collection(scene, job["name"])
+    addon.asset_loader.set_link_mode(linked)
+    try:
+        addon.generator.generate_building(style=job.get("style", "japanese").lower(),
+                                          details=job.get("details", "low").lower(),
+                                          floors=int(job.get("floors", 1)), seed=int(job.get("seed", 101)),
+                                          collection=collection, output=job.get("output", "objects"))
+        status["objects"] = len(collection.objects)
+        conflicts = addon.spatial_index.last_report()
+        if conflicts and conflicts["conflicts"]:
+            status["conflicts"] = conflicts["conflicts"]
+        report = addon.profiling.last_report()
+        if addon.profiling.enabled and report:
+            status["profile"] = {"timers": report["timers"], "counters": report["counters"]}
+        if not collection.objects:
+            status["status"] = "empty"
+        else:
+            export_collection(collection, output, file_format, linked)
+    except Exception as e:
+        status.update(status="error", error=str(e))
+    finally:
+        remove_collection(addon, collection)
+
+    status["seconds"] = time.perf_counter() - start
+    return status
+
+
+def run_footprints(args):
+    addon = import_addon()
+    addon.profiling.enable(args.profile)
+    addon.asset_loader.set_link_mode(args.link)
+    addon.spatial_index.set_policy(args.conflicts)
+    lonlat = None if args.crs == "auto" else args.crs == "lonlat"
+    start = time.perf_counter()
+    chunks = addon.generator.generate_from_footprints(args.footprints, args.out, style=args.style.lower(),
+                                                      details=args.details.lower(), floors=args.floors, seed=args.seed,
+                                                      chunk_size=args.chunk, lonlat=lonlat)
+    summary = {"footprints": args.footprints, "buildings": sum(chunk["buildings"] for chunk in chunks),
+               "wall_seconds": time.perf_counter() - start, "chunks": chunks}
+    if addon.profiling.enabled and addon.profiling.last_report():
+        summary["profile"] = addon.profiling.last_report()
+    out_dir = Path(args.out)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    (out_dir / "footprints_status.json").write_text(json.dumps(summary, ensure_ascii=False, indent=1), encoding="utf-8")
+    print(f"---> {summary['buildings']} зданий в {len(chunks)} файлах за {summary['wall_seconds']:.1f} с")
+    return 0
+
+
+def run_mesh_cache(args):
+    addon = import_addon()
+    libraries = addon.asset_catalog.discover_libraries()
+    failed = 0
+    for style, details in libraries:
+        try:
+            directory = addon.asset_loader.export_mesh_cache(style, details)
+            print(f"---> {style}/{details}: {directory}")
+        except Exception as e:
+            failed += 1
+            print(f"-XXX {style}/{details}: {e}")
+    return 1 if failed or not libraries else 0
+
+
+def run_from_cache(args):
+    """Задания собираются по кэшу мешей: план считает planner, glTF пишет gltf_export - без Blender"""
+    import_package()
+    from house_generator import build_plan, gltf_export, mesh_cache, profiling, spatial_index
+
+    profiling.enable(args.profile)
+    spatial_index.set_policy(args.conflicts)
+    out_dir = Path(args.out)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    results = []
+    for job in load_jobs(args.jobs):
+        file_format = job.get("format", args.format)
+        file_format = file_format if file_format in ("glb", "gltf") else "glb"
+        output = out_dir / f"{job['name']}.{file_format}"
+        status = {"name": job["name"], "status": "ok", "output": str(output)}
+        start = time.perf_counter()
+        profiling.reset()
+        try:
+            if job.get("plan"):
+                plan = build_plan.BuildPlan.from_json(Path(job["plan"]).read_text(encoding="utf-8"))
+            else:
+                plan = mesh_cache.plan_building(style=job.get("style", "japanese").lower(),
+                                                details=job.get("details", "low").lower(),
+                                                floors=int(job.get("floors", 1)), seed=int(job.get("seed", 101)))
+            if plan is None or not plan.placements:
+                status["status"] = "empty"
+            else:
+                gltf_export.export_plans([(plan, job["name"], None)], output)
+                status["placements"] = len(plan.placements)
+                conflicts = spatial_index.last_report()
+                if not job.get("plan") and conflicts and conflicts["conflicts"]:
+                    status["conflicts"] = conflicts["conflicts"]
+        except Exception as e:
+            status.update(status="error", error=str(e))
+        report = profiling.finish(job["name"])
+        if profiling.enabled and report:
+            status["profile"] = {"timers": report["timers"], "counters": report["counters"]}
+        status["seconds"] = time.perf_counter() - start
+        results.append(status)
+        print(STATUS_PREFIX + json.dumps(status, ensure_ascii=False), flush=True)
+
+    (out_dir / "status.json").write_text(json.dumps(results, ensure_ascii=False, indent=1), encoding="utf-8")
+    print(f"---> {sum(r['status'] == 'ok' for r in results)}/{len(results)} зданий из кэша мешей "
+          f"за {sum(r['seconds'] for r in results):.1f} с")
+    return 0 if all(r["status"] != "error" for r in results) else 1
+
+
+def run_worker(args):
+    shard_index, shard_count = parse_shard(args.shard)
+    out_dir = Path(args.out)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    addon = import_addon()
+    addon.profiling.enable(args.profile)
+    addon.spatial_index.set_policy(args.conflicts)
+    jobs = [job for index, job in enumerate(load_jobs(args.jobs)) if index % shard_count == shard_index]
+
+    results = []
+    for job in jobs:
+        status = run_job(addon, job, out_dir, args.format, args.link)
+        status["shard"] = shard_index
+        results.append(status)
+        print(STATUS_PREFIX + json.dumps(status, ensure_ascii=False), flush=True)
+
+    (out_dir / f"status_shard{shard_index}.json").write_text(json.dumps(results, ensure_ascii=False, indent=1), encoding="utf-8")
+    return 0 if all(r["status"] != "error" for r in results) else 1
+
+
+# ---------------------------------------------------------------------------
+# Координатор
+
+def find_blender(explicit=None) -> str:
+    if explicit:
+        return explicit
+    if bpy is not None:
+        return bpy.app.binary_path
+    return os.environ.get("BLENDER", "blender")
+
+
+def run_coordinator(args):
+    out_dir = Path(args.out)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    blender = find_blender(args.blender)
+    count = max(1, args.processes)
+
+    start = time.perf_counter()
+    processes = []
+    for shard in range(count):
+        command = [blender, "-b", "--factory-startup", "--python-exit-code", "1", "-P", str(Path(__file__).resolve()), "--",
+                   "--jobs", str(Path(args.jobs).resolve()), "--out", str(out_dir.resolve()),
+                   "--format", args.format, "--shard", f"{shard}/{count}", "--conflicts", args.conflicts] \
+                  + (["--profile"] if args.profile else []) \
+                  + (["--link"] if args.link else [])
+        processes.append(subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                          text=True, encoding="utf-8", errors="replace"))
+
+    # Выводы читаем параллельно, чтобы ни один процесс не встал на переполненном канале
+    results = []
+    lock = threading.Lock()
+
+    def collect(shard, process):
+        for line in process.stdout:
+            if not line.startswith(STATUS_PREFIX):
+                continue
+            status = json.loads(line[len(STATUS_PREFIX):])
+            with lock:
+                results.append(status)
+                print(f"[{shard}] {status['name']}: {status['status']} за {status['seconds']:.2f} с", flush=True)
+
+    readers = [threading.Thread(target=collect, args=(shard, process), daemon=True) for shard, process in enumerate(processes)]
+    for reader in readers:
+        reader.start()
+    return_codes = [process.wait() for process in processes]
+    for reader in readers:
+        reader.join()
+
+    # Задания упавших процессов не отчитались - помечаем их явно
+    reported = {r["name"] for r in results}
+    for index, job in enumerate(load_jobs(args.jobs)):
+        if job["name"] not in reported:
+            results.append({"name": job["name"], "status": "lost", "shard": index % count, "seconds": 0.0})
+
+    elapsed = time.perf_counter() - start
+    summary = {
+        "processes": count,
+        "jobs": len(results),
+        "ok": sum(1 for r in results if r["status"] == "ok"),
+        "failed": sum(1 for r in results if r["status"] != "ok"),
+        "wall_seconds": elapsed,
+        "job_seconds": sum(r["seconds"] for r in results),
+        "return_codes": return_codes,
+        "results": sorted(results, key=lambda r: r["name"]),
+    }
+    (out_dir / "status.json").write_text(json.dumps(summary, ensure_ascii=False, indent=1), encoding="utf-8")
+    print(f"---> {summary['ok']}/{summary['jobs']} заданий за {elapsed:.1f} с на {count} процессах "
+          f"(сумма по заданиям {summary['job_seconds']:.1f} с)")
+    return 0 if summary["failed"] == 0 and not any(return_codes) else 1
+
+
+def main():
+    args = parse_args()
+    if args.from_cache:
+        return run_from_cache(args)
+    if args.mesh_cache:
+        if bpy is None:
+            command = [find_blender(args.blender), "-b", "--factory-startup", "--python-exit-code", "1",
+                       "-P", str(Path(__file__).resolve()), "--"] + sys.argv[1:]
+            return subprocess.call(command)
+        return run_mesh_cache(args)
+    if args.footprints:
+        if bpy is None:
+            # Поток контуров читается последовательно - один процесс Blender
+            command = [find_blender(args.blender), "-b", "--factory-startup", "--python-exit-code", "1",
+                       "-P", str(Path(__file__).resolve()), "--"] + sys.argv[1:]
+            return subprocess.call(command)
+        return run_footprints(args)
+    # Внутри Blender с --processes 1 (или с явным шардом) работаем сами, иначе раздаём задания
+    if bpy is not None and (args.processes <= 1 or "--shard" in sys.argv):
+        return run_worker(args)
+    return run_coordinator(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
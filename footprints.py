@@ -0,0 +1,292 @@
+import csv
+import json
+import math
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from . import planner
+from . import profiling
+from . import rng_streams
+
+# Потоковый импорт контуров зданий: GeoJSON (FeatureCollection или по объекту на строку) и CSV с WKT.
+# Всё - генераторы: файл читается по частям, контур сразу превращается в план, в памяти - только текущий.
+# Модуль без bpy; объекты и запись по частям - generator.iter_generate_footprints.
+log = profiling.get_logger(__name__)
+
+LINE_SUFFIXES = (".geojsonl", ".geojsons", ".geojsonseq", ".jsonl", ".ndjson")
+CSV_SUFFIXES = (".csv", ".tsv")
+WKT_COLUMNS = ("wkt", "geometry", "geom", "the_geom", "footprint")
+LEVEL_KEYS = ("floors", "building:levels", "levels")
+READ_SIZE = 1 << 20
+MAX_ITEM_SIZE = 64 << 20       # длиннее - объект испорчен, а не просто не уместился в буфер
+EARTH_RADIUS = 6378137.0
+MIN_EDGE = 0.05               # короче - дубликат вершины
+COLLINEAR_SIN = math.sin(math.radians(1.0))  # излом меньше градуса - одна стена
+
+_WKT_RING = re.compile(r"\(\s*([-+\d.eE]+\s+[-+\d.eE]+(?:\s+[-+\d.eE]+)?(?:\s*,\s*[-+\d.eE]+\s+[-+\d.eE]+(?:\s+[-+\d.eE]+)?)*)\s*\)")
+
+
+@dataclass
+class Footprint:
+    """Контур здания из файла: внешнее кольцо (в исходной системе координат) и свойства"""
+    id: str
+    ring: list
+    properties: dict = field(default_factory=dict)
+
+
+# ---------------------------------------------------------------------------
+# Чтение
+
+def iter_json_array(f, key="features"):
+    """Элементы массива key верхнего объекта JSON по одному, без чтения файла целиком.
+    Элемент, не разобранный за MAX_ITEM_SIZE символов, - ValueError со смещением в байтах"""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    consumed = 0  # байт до начала буфера
+    # Ключ ищется по тексту: файлы GeoJSON пишут "features" на верхнем уровне
+    pattern = re.compile(r'"' + re.escape(key) + r'"\s*:\s*\[')
+    while True:
+        found = pattern.search(buffer)
+        if found:
+            break
+        chunk = f.read(READ_SIZE)
+        if not chunk:
+            return
+        kept = buffer[-len(key) - 16:]
+        consumed += len(buffer[:len(buffer) - len(kept)].encode("utf-8"))
+        buffer = kept + chunk
+
+    position = found.end()
+    while True:
+        while position < len(buffer) and buffer[position] in " \t\r\n,":
+            position += 1
+        if position < len(buffer) and buffer[position] == "]":
+            return
+        try:
+            if position >= len(buffer):
+                raise json.JSONDecodeError("конец буфера", buffer, position)
+            item, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            # Объект не уместился в буфер - дочитываем (буфер сдвигается только здесь)
+            chunk = f.read(READ_SIZE)
+            if not chunk:
+                if position >= len(buffer):
+                    raise ValueError(f"массив {key} не закрыт") from None
+                raise
+            consumed += len(buffer[:position].encode("utf-8"))
+            buffer, position = buffer[position:] + chunk, 0
+            if len(buffer) > MAX_ITEM_SIZE:
+                raise ValueError(f"элемент массива {key} со смещения {consumed} байт "
+                                 f"не разобран за {MAX_ITEM_SIZE} символов") from None
+            continue
+        yield item
+
+
+def geometry_ring(geometry) -> list | None:
+    """Внешнее кольцо Polygon или наибольшего полигона MultiPolygon; дворы (внутренние кольца) не строятся"""
+    if not geometry:
+        return None
+    kind, coordinates = geometry.get("type"), geometry.get("coordinates")
+    if kind == "Polygon" and coordinates:
+        return coordinates[0]
+    if kind == "MultiPolygon" and coordinates:
+        return max((polygon[0] for polygon in coordinates if polygon), key=lambda ring: abs(ring_area(ring)), default=None)
+    return None
+
+
+def iter_geojson(path, line_mode=None):
+    """Объекты GeoJSON: FeatureCollection читается потоково, GeoJSON Lines - по строке"""
+    path = Path(path)
+    if line_mode is None:
+        line_mode = path.suffix.lower() in LINE_SUFFIXES
+    with open(path, "r", encoding="utf-8") as f:
+        if line_mode:
+            for line in f:
+                line = line.strip().lstrip("\x1e")  # RFC 8142: записи начинаются с RS
+                if line:
+                    yield json.loads(line)
+        else:
+            yield from iter_json_array(f)
+
+
+def parse_wkt(text: str) -> list | None:
+    """Внешнее кольцо POLYGON / наибольшего полигона MULTIPOLYGON из WKT"""
+    text = text.strip()
+    upper = text[:16].upper()
+    if not upper.startswith(("POLYGON", "MULTIPOLYGON")):
+        return None
+    rings = []
+    # Внешнее кольцо полигона открывается сразу после "(", внутренние (дворы) - после ","
+    for match in _WKT_RING.finditer(text):
+        before = match.start() - 1
+        while before >= 0 and text[before].isspace():
+            before -= 1
+        if before >= 0 and text[before] == "(":
+            rings.append([[float(value) for value in point.split()[:2]] for point in match.group(1).split(",")])
+    return max(rings, key=lambda ring: abs(ring_area(ring)), default=None)
+
+
+def iter_csv(path):
+    """Строки CSV с геометрией WKT в колонке wkt / geometry / geom / the_geom / footprint"""
+    path = Path(path)
+    csv.field_size_limit(2 ** 31 - 1)  # WKT крупных контуров длиннее лимита по умолчанию
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        reader = csv.DictReader(f, delimiter="\t" if path.suffix.lower() == ".tsv" else ",")
+        columns = {name.lower(): name for name in reader.fieldnames or ()}
+        column = next((columns[name] for name in WKT_COLUMNS if name in columns), None)
+        if column is None:
+            raise ValueError(f"в {path} нет колонки с WKT ({', '.join(WKT_COLUMNS)})")
+        for row in reader:
+            yield {"type": "Feature", "id": row.get("id"), "geometry": row.pop(column), "properties": row}
+
+
+def iter_footprints(path):
+    """Контуры зданий файла по одному; объекты без полигона пропускаются"""
+    path = Path(path)
+    is_csv = path.suffix.lower() in CSV_SUFFIXES
+    records = iter_csv(path) if is_csv else iter_geojson(path)
+    for number, feature in enumerate(records):
+        if feature.get("type") == "Feature":
+            geometry, properties = feature.get("geometry"), feature.get("properties") or {}
+        else:
+            geometry, properties = feature, {}
+        ring = parse_wkt(geometry or "") if is_csv else geometry_ring(geometry)
+        footprint_id = str(feature.get("id") or properties.get("id") or number)
+        if not ring or len(ring) < 3:
+            log.warning(f"Контур {footprint_id}: нет полигона, пропущен")
+            continue
+        yield Footprint(footprint_id, ring, properties)
+
+
+# ---------------------------------------------------------------------------
+# Геометрия
+
+def ring_area(ring) -> float:
+    """Знаковая площадь кольца (положительная - против часовой стрелки)"""
+    return 0.5 * sum(x1 * y2 - x2 * y1 for (x1, y1, *_), (x2, y2, *_) in zip(ring, ring[1:] + ring[:1]))
+
+
+class Projection:
+    """Долгота/широта -> метры (равнопромежуточная проекция вокруг первой точки) или сдвиг для метрических данных.
+    Начало отсчёта - первая вершина первого контура, чтобы координаты сцены оставались небольшими"""
+
+    def __init__(self, lonlat: bool):
+        self.lonlat = lonlat
+        self.reference = None
+        self.scale_x = 1.0
+
+    def __call__(self, ring) -> list[tuple[float, float]]:
+        if self.reference is None:
+            self.reference = (float(ring[0][0]), float(ring[0][1]))
+            if self.lonlat:
+                self.scale_x = math.cos(math.radians(self.reference[1]))
+        x0, y0 = self.reference
+        if not self.lonlat:
+            return [(float(x) - x0, float(y) - y0) for x, y, *_ in ring]
+        k = math.pi / 180.0 * EARTH_RADIUS
+        return [((float(x) - x0) * k * self.scale_x, (float(y) - y0) * k) for x, y, *_ in ring]
+
+
+def clean_ring(points) -> list[tuple[float, float]]:
+    """Кольцо против часовой стрелки без замыкающей точки, дубликатов и почти прямых изломов"""
+    points = list(points)
+    if len(points) > 1 and math.dist(points[0], points[-1]) < MIN_EDGE:
+        points.pop()
+    cleaned = []
+    for point in points:
+        if not cleaned or math.dist(cleaned[-1], point) >= MIN_EDGE:
+            cleaned.append(point)
+
+    # Вершина на прямой делит стену на два сегмента со своими раскладками - убираем
+    changed = True
+    while changed and len(cleaned) > 3:
+        changed = False
+        for index in range(len(cleaned)):
+            (ax, ay), (bx, by), (cx, cy) = cleaned[index - 1], cleaned[index], cleaned[(index + 1) % len(cleaned)]
+            first, second = math.hypot(bx - ax, by - ay), math.hypot(cx - bx, cy - by)
+            cross = (bx - ax) * (cy - by) - (by - ay) * (cx - bx)
+            if first and second and abs(cross) / (first * second) < COLLINEAR_SIN and \
+                    (bx - ax) * (cx - bx) + (by - ay) * (cy - by) > 0:
+                del cleaned[index]
+                changed = True
+                break
+
+    if ring_area(cleaned) < 0:
+        cleaned.reverse()
+    return cleaned
+
+
+def ring_segments(ring) -> list[tuple[tuple[float, float], tuple[float, float]]]:
+    """Рёбра кольца в формате контура фундамента для планировщика"""
+    return [(start, end) for start, end in zip(ring, ring[1:] + ring[:1])]
+
+
+def ring_centroid(ring) -> tuple[float, float]:
+    """Центр масс кольца - начало координат здания (около него японский стиль сужает этажи)"""
+    area = ring_area(ring)
+    if abs(area) < 1e-9:
+        return sum(x for x, _ in ring) / len(ring), sum(y for _, y in ring) / len(ring)
+    cx = cy = 0.0
+    for (x1, y1), (x2, y2) in zip(ring, ring[1:] + ring[:1]):
+        cross = x1 * y2 - x2 * y1
+        cx += (x1 + x2) * cross
+        cy += (y1 + y2) * cross
+    return cx / (6 * area), cy / (6 * area)
+
+
+# ---------------------------------------------------------------------------
+# Планирование
+
+def is_lonlat(path) -> bool:
+    """Система координат по умолчанию: GeoJSON - долгота/широта (RFC 7946), CSV - метры"""
+    return Path(path).suffix.lower() not in CSV_SUFFIXES
+
+
+def footprint_floors(properties, default: int) -> int:
+    for key in LEVEL_KEYS:
+        value = properties.get(key)
+        if value not in (None, ""):
+            try:
+                return max(1, int(float(value)))
+            except (TypeError, ValueError):
+                break
+    return default
+
+
+def iter_footprint_plans(footprints, style="khrushchev", details="low", floors=5, seed=101, lonlat=True):
+    """(контур, кольцо в метрах, план) для каждого контура. Свойства style / details / floors
+    (или building:levels) / seed контура переопределяют значения по умолчанию; сид без свойства
+    выводится из seed и id контура. Фундамент-ассет не нужен: плита строится по контуру, крыша пропускается"""
+    project = Projection(lonlat)
+    for footprint in footprints:
+        properties = footprint.properties
+        building_style = str(properties.get("style") or style).lower()
+        if not planner.has_planner(building_style):
+            log.warning(f"Контур {footprint.id}: нет генератора для стиля {building_style}")
+            continue
+        building_details = str(properties.get("details") or details).lower()
+        building_floors = footprint_floors(properties, floors)
+        building_seed = int(properties["seed"]) if properties.get("seed") not in (None, "") \
+            else rng_streams.derive_seed(seed, "footprint", footprint.id)
+
+        ring = clean_ring(project(footprint.ring))
+        if len(ring) < 3:
+            log.warning(f"Контур {footprint.id}: вырожденный полигон, пропущен")
+            continue
+        with profiling.timer("plan"):
+            plan = planner.plan_building(building_style, building_details, building_floors, building_seed, "",
+                                         ring_segments(ring), ring_centroid(ring), rng_streams.building_stream(building_seed))
+        yield footprint, ring, plan
+
+
+def iter_chunks(items, size):
+    """Группы по size элементов; последняя может быть короче"""
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
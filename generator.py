@@ -1,341 +1,502 @@
 import bpy
-import math
-import random
+import time
+from bpy.app.handlers import persistent
+from pathlib import Path
 
 from . import object_helpers as helpers
 from . import asset_loader
-
-floor_heights = {
-    ("test", "low"): 2.7, ("test", "medium"): 2.7, ("test", "high"): 2.7,
-    ("japanese", "low"): 2.7, ("japanese", "medium"): 2.7, ("japanese", "high"): 2.7,
-    ("stal", "low"): 3.2, ("stal", "medium"): 3.2, ("stal", "high"): 3.2,
-    ("khr", "low"): 3, ("khr", "medium"): 3, ("khr", "high"): 3,
-}
-
-def generate_japanese_building(style, details, floors, seed):
-    foundation = asset_loader.append_random_base(style, details)
-
-    if not foundation:
-        print("Фундамент не загружен")
-        return
-
-    floor_height = floor_heights.get((style, details), 2.7)
-    scale_factor = 1.0
-
-    for floor in range(floors):
-        new_base = foundation.copy()
-        new_base.data = foundation.data.copy()
-        bpy.context.collection.objects.link(new_base)
-        new_base.location.z = floor * floor_height
-        new_base.scale *= scale_factor
-
-        base_name_parts = foundation.name.split('_')
-        if len(base_name_parts) >= 3:
-            base_id = base_name_parts[-1]
-
-        # применить трансформации
-        bpy.context.view_layer.objects.active = new_base
-        bpy.ops.object.transform_apply(scale=True)
-
-        # получить сегменты
-        segments = helpers.get_top_edges(new_base)
-
-        for start, end in segments:
-            direction = (end - start).normalized()
-            length = (end - start).length
-            walls, scale_factor = helpers.find_wall_combination(length)
-            if walls:
-                place_wall_segment(start, direction, walls, z=floor*floor_height+0.2, style=style, details=details, seed=seed, floors=floors, scale_factor=scale_factor)
-        
-        scale_factor *= 0.9
-
-    # добавить крышу
-    roof = asset_loader.append_random_roof(style, details, base_id)
-    if roof:
-        roof.location.z = floors * floor_height + 0.2
-
-def generate_khrushchev_building(style, details, floors, seed):
-    foundation = asset_loader.append_random_base(style, details)
-
+from . import asset_catalog
+from . import planner
+from . import realizer
+from . import batch
+from . import rng_streams
+from . import manifest
+from . import gn_backend
+from . import mesh_merge
+from . import footprints
+from . import spatial_index
+from . import profiling
+
+log = profiling.get_logger(__name__)
+
+def building_collection(style, seed, parent=None):
+    """Новая коллекция здания; внутри другого здания не создаётся"""
+    parent = parent or bpy.context.collection
+    if manifest.MANIFEST_PROP in parent:
+        parent = bpy.context.scene.collection
+    collection = bpy.data.collections.new(f"House_{style}_{seed}")
+    parent.children.link(collection)
+    return collection
+
+def find_building_collection(context):
+    """Коллекция здания с манифестом: активная коллекция или коллекция активного объекта"""
+    candidates = [context.collection]
+    if context.active_object:
+        candidates += list(context.active_object.users_collection)
+    for collection in candidates:
+        if collection is not None and manifest.MANIFEST_PROP in collection:
+            return collection
+    return None
+
+def find_layer_collection(layer_collection, collection):
+    if layer_collection.collection == collection:
+        return layer_collection
+    for child in layer_collection.children:
+        found = find_layer_collection(child, collection)
+        if found:
+            return found
+    return None
+
+def load_footprint(style, details, foundation_name, previous=None):
+    """Контур фундамента; из манифеста, если фундамент не изменился"""
+    if previous and previous.footprint and (previous.plan.style, previous.plan.details, previous.plan.foundation) == (style, details, foundation_name):
+        return previous.footprint, previous.origin
+
+    foundation = None
+    try:
+        foundation = asset_loader.get_prototype(style, details, foundation_name)
+    except Exception as e:
+        log.error(f"Ошибка при загрузке объекта '{foundation_name}': {e}")
     if not foundation:
-        print("Фундамент не загружен")
-        return
-
-    floor_height = floor_heights.get((style, details), 2.7)
-
-    # Словарь для хранения типов стен для каждого сегмента
-    segment_wall_types = {}
-    second_floor_patterns = {}
-
-    for floor in range(floors):
-        new_base = foundation.copy()
-        new_base.data = foundation.data.copy()
-        bpy.context.collection.objects.link(new_base)
-        new_base.location.z = floor * floor_height
-
-        base_name_parts = foundation.name.split('_')
-        if len(base_name_parts) >= 3:
-            base_id = base_name_parts[-1]
-
-        bpy.context.view_layer.objects.active = new_base
-        bpy.ops.object.transform_apply(scale=True)
-
-        segments = helpers.get_top_edges(new_base)
-
-        for i, (start, end) in enumerate(segments):
-            direction = (end - start).normalized()
-            length = (end - start).length
-            walls, _ = helpers.find_wall_combination(length)
-            
-            if walls:
-                # Для первого этажа определяем типы стен
-                if floor == 0:
-                    wall_types = []
-                    for wall_len in walls:
-                        keyword = f"wall{int(wall_len * 5)}"
-                        rnd = random.random()
-                        
-                        if rnd > 0.80:  # Дверь на первом этаже
-                            wall_types.append((keyword, "door"))
-                        elif rnd > 0.40:  # Окно на первом этаже
-                            wall_types.append((keyword, "window"))
-                        else:  # Просто стена
-                            wall_types.append((keyword, "plain"))
-                    
-                    segment_wall_types[i] = wall_types
-                
-                # Для второго этажа формируем паттерны
-                elif floor == 1:
-                    wall_patterns = []
-                    for idx, (keyword, wall_type) in enumerate(segment_wall_types.get(i, [])):
-                        if wall_type == "door":
-                            # Дверь → окно
-                            wall_patterns.append((keyword, "window"))
-                        else:
-                            # Окно/стена → либо повтор, либо балкон (25%)
-                            if random.random() < 0.25:
-                                wall_patterns.append((keyword, "balcony"))
-                            else:
-                                wall_patterns.append((keyword, wall_type))
-                    
-                    second_floor_patterns[i] = wall_patterns
-                
-                # Используем сохраненные типы стен
-                if floor == 0:
-                    wall_types = segment_wall_types.get(i, [])
-                else:
-                    wall_types = second_floor_patterns.get(i, [])
-                
-                place_soviet_wall_segment(
-                    start, 
-                    direction, 
-                    walls, 
-                    z=floor*floor_height+0.2, 
-                    style=style, 
-                    details=details, 
-                    seed=seed, 
-                    floors=floors, 
-                    scale_factor=1,
-                    wall_types=wall_types,
-                    floor_num=floor
-                )
-
-    # Добавить крышу
-    roof = asset_loader.append_random_roof(style[:3], details, base_id)
-    if roof:
-        roof.location.z = floors * floor_height + 0.2
-
-def generate_stalin_building(style, details, floors, seed):
-    print("generate_stalin_building")
-
-style_generators = {
-    "test": generate_japanese_building,
-    "japanese": generate_japanese_building,
-    "khrushchev": generate_khrushchev_building,
-    "stal": generate_stalin_building,
-}
-
-def generate_building(style="japanese", details="low", floors=1, seed=101):
-    print(f"\n---> Генерация здания. Стиль: {style}, Детализация: {details}, Этажей: {floors}, Сид: {seed}\n")
-    random.seed(seed)
-    asset_loader.clean_unused_data()
-
-    generator_func = style_generators.get(style.lower())
-    if not generator_func:
-        print(f"-XXX Нет генератора для стиля: {style}")
-        return
-
-    generator_func(style, details, floors, seed)
-    asset_loader.clean_unused_data()
-
-def place_soviet_wall_segment(start, direction, walls, z=0.2, style="khrushchev", details="low", 
-                                 seed=101, floors=1, scale_factor=1, wall_types=None, floor_num=0):
-    cursor = start.copy()
-    floor_height = floor_heights.get((style, details), 2.7)
-    
-    for idx, wall_len in enumerate(walls):
-        scaled_len = wall_len * scale_factor
-        wall_type = wall_types[idx] if (wall_types and idx < len(wall_types)) else (f"wall{int(wall_len * 5)}", "plain")
-        
-        keyword, type = wall_type
-        blend_file = None
-        obj_name = None
-        
-        # Логика выбора стены
-        if floor_num == 0:
-            # Первый этаж - используем сохраненный тип
-            if type == "door":
-                blend_file, obj_name = asset_loader.get_random_asset(style, details, f"{keyword}_door")
-            elif type == "window":
-                blend_file, obj_name = asset_loader.get_random_asset(style, details, f"{keyword}_window")
-            else:
-                blend_file, obj_name = asset_loader.get_random_asset(style, details, f"{keyword}_{style}")
+        return None
+    return helpers.get_foundation_footprint(foundation)
+
+def merge_building(collection, build_manifest, weld_distance=0.0) -> list:
+    """Сливает детали здания в один меш на материал и удаляет их; манифест запоминает слитые объекты"""
+    if build_manifest.instances:
+        realizer.make_real(collection, build_manifest)
+    objects = [obj for obj in collection.objects
+               if obj.type == 'MESH' and not obj.get(gn_backend.GN_OBJECT_PROP) and not obj.get(mesh_merge.MERGED_PROP)]
+    if not objects:
+        return []
+
+    merged = mesh_merge.merge_objects(objects, collection.name, collection, weld_distance)
+    bpy.data.batch_remove(objects)
+    build_manifest.objects = [None] * len(build_manifest.plan.placements)
+    build_manifest.merged += [obj.name for obj in merged]
+    log.info(f"Слито объектов: {len(objects)} -> {len(merged)} (по материалам)")
+    return merged
+
+def remove_building(collection, build_manifest=None):
+    """Удаляет коллекцию здания (или квартала) со всеми объектами"""
+    for child in list(collection.children):
+        remove_building(child, manifest.read_manifest(child))
+    gn_backend.remove_gn_objects(collection)
+    realizer.clear_building(collection, build_manifest)
+    bpy.data.collections.remove(collection)
+
+def remove_replaced(collection, names, build_manifest=None):
+    """Удаляет прежние объекты здания по именам, снятым до сборки: облака точек GN с прототипами,
+    затем остальные вместе с коллекциями экземпляров этажей и слитыми мешами из build_manifest"""
+    gn_backend.remove_gn_objects(collection, [collection.objects[name] for name in names if name in collection.objects])
+    realizer.clear_building(collection, build_manifest,
+                            [collection.objects[name] for name in names if name in collection.objects])
+
+def iter_generate_building(style="japanese", details="low", floors=1, seed=101, collection=None, instance_floors=False,
+                           output="objects", merge=False, weld_distance=0.0):
+    """Пошаговая сборка здания (параметры как у generate_building): после каждого этажа отдаёт долю
+    готовности 0..1, в конце возвращает коллекцию здания. Если сборку прервать (close) или она упадёт,
+    созданные объекты удаляются, а здание остаётся в прежнем состоянии"""
+    # Псевдоним стиля ("stal") - только в определениях; библиотеки и манифест знают каноническое имя
+    style = planner.canonical_style(style)
+    log.info("Генерация здания", extra={"fields": {"style": style, "details": details, "floors": floors, "seed": seed,
+                                                  "output": output}})
+    profiling.reset()
+    rng = rng_streams.building_stream(seed)
+
+    if not planner.has_planner(style):
+        log.error(f"Нет генератора для стиля: {style}")
+        return None
+
+    asset_loader.reset_stats()
+    asset_loader.verify_datablock_index()
+    asset_loader.begin_build_tracking()
+    previous = manifest.read_manifest(collection) if collection is not None else None
+
+    # Фундамент нужен до планирования: по его контуру раскладываются стены
+    foundation_name = planner.pick_foundation(style, details, rng.child("foundation"))
+    footprint = load_footprint(style, details, foundation_name, previous) if foundation_name else None
+    if footprint is None:
+        log.warning("Фундамент не загружен")
+        # Прототип фундамента мог загрузиться: учёт датаблоков сборки закрывается, как и после неё
+        asset_loader.evict_prototypes()
+        asset_loader.clean_build_data()
+        return None
+
+    segments, origin = footprint
+    with profiling.timer("plan"):
+        plan = planner.plan_building(style, details, floors, seed, foundation_name, segments, origin, rng)
+    new_collection = collection is None
+    if new_collection:
+        collection = building_collection(style, seed)
+    offset = previous.offset if previous else (0.0, 0.0, 0.0)
+
+    try:
+        yield 0.05
+        # Конфликты деталей (углы контура, энгавы) разбираются до создания объектов: план уже окончательный
+        prototypes = realizer.load_plan_prototypes(plan)
+        spatial_index.resolve_plans([(plan, offset)], realizer.prototype_shapes(prototypes))
+        # Слитое здание и экземпляры этажей не сравнить по деталям, облако точек дешевле пересоздать целиком:
+        # такие здания собираются заново, а прежние объекты удаляются только после сборки - отмена их не трогает
+        rebuild = output == "geometry_nodes" or bool(previous and (previous.merged or previous.instances))
+        replaced = previous if rebuild else None
+        if rebuild:
+            previous = None
+        old_names = [obj.name for obj in collection.objects if rebuild or obj.get(gn_backend.GN_OBJECT_PROP)]
+        if output == "geometry_nodes":
+            with profiling.timer("geometry_nodes"):
+                gn_backend.realize_plans_gn([(plan, offset)], collection.name, collection, prototypes)
+            remove_replaced(collection, old_names, replaced)
+            build_manifest = manifest.BuildManifest(plan, [None] * len(plan.placements), segments, origin, offset)
+            yield 0.9
         else:
-            # Для верхних этажей используем паттерн второго этажа
-            if type == "balcony":
-                # Пробуем загрузить балкон
-                blend_file, obj_name = asset_loader.get_random_asset(style, details, f"{keyword}_balcony")
-                if not blend_file:
-                    # Если балкона нет - ставим окно
-                    blend_file, obj_name = asset_loader.get_random_asset(style, details, f"{keyword}_window")
-            elif type == "window":
-                blend_file, obj_name = asset_loader.get_random_asset(style, details, f"{keyword}_window")
-            else:
-                blend_file, obj_name = asset_loader.get_random_asset(style, details, f"{keyword}_{style}")
-
-        # Фолбэк если не нашли специфичный тип
-        if not blend_file:
-            blend_file, obj_name = asset_loader.get_random_asset(style, details, keyword)
-
-        if not blend_file:
-            print(f"XXX- Не найдена стена с длиной {wall_len}")
-            continue
-
-        wall_obj = asset_loader.append_object_from_blend(style, details, blend_file, obj_name)
-        if not wall_obj:
-            print("XXX- Не удалось импортировать стену")
+            steps = realizer.iter_realize_delta(plan, previous, collection, offset=offset, prototypes=prototypes)
+            names, delta = yield from realizer.scale_progress(steps, 0.05, 0.9)
+            remove_replaced(collection, old_names, replaced)
+            build_manifest = manifest.BuildManifest(plan, names, segments, origin, offset)
+            if instance_floors:
+                with profiling.timer("instancing"):
+                    instanced = realizer.instance_floors(collection, build_manifest)
+                log.info(f"Экземпляры этажей: {len(build_manifest.instances)}, убрано объектов {instanced}")
+            if merge:
+                yield 0.9
+                with profiling.timer("merge"):
+                    merge_building(collection, build_manifest, weld_distance)
+        manifest.write_manifest(collection, build_manifest)
+    except BaseException:
+        if new_collection:
+            remove_building(collection)
+        asset_loader.evict_prototypes()
+        asset_loader.clean_build_data()
+        log.warning("Сборка здания прервана, частично созданные объекты удалены")
+        raise
+
+    asset_loader.evict_prototypes()
+    removed = asset_loader.clean_build_data()
+    asset_catalog.flush()
+
+    if previous:
+        floors_changed = delta.affected_floors(previous.plan, plan)
+        log.info(f"Пересборка: затронуто этажей {len(floors_changed)} {floors_changed}, создано объектов {len(delta.add)}, "
+              f"удалено {len(delta.remove)}, без изменений {len(delta.keep)}")
+    stats = asset_loader.get_stats()
+    log.info(f"Открытий библиотек: {stats['library_opens']}, удалено датаблоков: {removed}")
+    log.info(f"Пул прототипов: попаданий {stats['hits']}, промахов {stats['misses']}, "
+          f"вытеснено {stats['evictions']}, в пуле {stats['size']} ({stats['bytes'] // 1024} КБ)")
+    profiling.finish(collection.name, style=style, details=details, floors=floors, seed=seed, output=output)
+    return collection
+
+def generate_building(style="japanese", details="low", floors=1, seed=101, collection=None, instance_floors=False,
+                      output="objects", merge=False, weld_distance=0.0):
+    """Строит здание в collection (новая коллекция, если не задана). Если в коллекции уже есть здание
+    с манифестом, пересоздаются только изменившиеся этажи и крыша. instance_floors - одинаковые этажи
+    ставятся экземплярами коллекций; output="geometry_nodes" - один объект с экземплярами через Geometry Nodes;
+    merge - после сборки детали сливаются в меши по материалам. Возвращает коллекцию здания"""
+    return realizer.run_steps(iter_generate_building(style, details, floors, seed, collection, instance_floors,
+                                                     output, merge, weld_distance))
+
+def load_batch_footprints(specs) -> dict:
+    """Контуры всех фундаментов-кандидатов пакета: (style, details, имя) -> (сегменты, начало координат)"""
+    footprints = {}
+    for style, details in sorted({(spec.style, spec.details) for spec in specs}):
+        catalog = asset_loader.get_catalog(style, details)
+        if catalog is None:
+            log.warning(f"Фундаменты не найдены для {style}, {details}")
             continue
-
-        # Позиционирование стены
-        angle = math.atan2(direction.y, direction.x)
-        wall_obj.location = (cursor.x, cursor.y, z)
-        wall_obj.rotation_euler[2] = angle
-
-        wall_obj.scale.x *= scale_factor  
-        wall_obj.scale.y *= 1.0          
-        wall_obj.scale.z *= 1.0
-
-        cursor += direction.normalized() * scaled_len
-
-def place_wall_segment(start, direction, walls, z=0.2, style="japanese", details="low", seed=101, floors=1, scale_factor=1):
-    """Размещает серию стен вдоль заданного направления"""
-    cursor = start.copy()
-    floor_height = floor_heights.get((style, details), 2.7)
-    flag_engawa = False
-    for wall_len in walls:
-        scaled_len = wall_len * scale_factor
-        keyword = f"wall{int(wall_len * 5)}"
-        blend_file = None
-        engawa_obj = None
+        bases = asset_loader.preload_prototypes(style, details, catalog.find("base"))
+        # Контуры всех фундаментов библиотеки - одним проходом маски по их мешам
+        for name, footprint in zip(bases, helpers.get_foundation_footprints(list(bases.values()))):
+            footprints[(style, details, name)] = footprint
+    return footprints
+
+def iter_generate_batch(specs, workers=None, scene=None, collection_name="HouseGen Block", instance_floors=False,
+                        output="objects"):
+    """Пошаговая сборка пакета (параметры как у generate_batch): после каждого здания отдаёт долю готовности,
+    в конце возвращает отчёт. Прерванная сборка удаляет коллекцию квартала"""
+    scene = scene or bpy.context.scene
+    total_start = time.perf_counter()
+    log.info("Генерация квартала", extra={"fields": {"buildings": len(specs), "output": output}})
+    profiling.reset()
+
+    asset_loader.reset_stats()
+    asset_loader.verify_datablock_index()
+    asset_loader.begin_build_tracking()
+
+    # Рабочие процессы читают каталоги с диска - они должны быть построены заранее
+    for style, details in batch.required_libraries(specs):
+        asset_loader.get_catalog(style, details)
+    asset_catalog.flush()
+
+    footprints = load_batch_footprints(specs)
+    plan_start = time.perf_counter()
+    with profiling.timer("plan"):
+        planned = batch.plan_specs(specs, footprints, workers)
+    plan_seconds = time.perf_counter() - plan_start
+    yield 0.1
+
+    realize_start = time.perf_counter()
+    prototypes = realizer.load_plans_prototypes([plan for plan, _ in planned if plan])
+    # Соседние здания проверяются вместе: детали, поставленные позже, уступают
+    conflicts = spatial_index.resolve_plans([(plan, spec.location) for spec, (plan, _) in zip(specs, planned)],
+                                            realizer.prototype_shapes(prototypes))
+    building_conflicts = {}
+    for conflict in conflicts["conflicts"] if conflicts else ():
+        building_conflicts[conflict["building"]] = building_conflicts.get(conflict["building"], 0) + 1
+    root = bpy.data.collections.new(collection_name)
+    scene.collection.children.link(root)
+
+    report = []
+    try:
+        yield 0.2
+        if output == "geometry_nodes":
+            with profiling.timer("geometry_nodes"):
+                gn_backend.realize_plans_gn([(plan, spec.location) for spec, (plan, _) in zip(specs, planned) if plan],
+                                            root.name, root, prototypes)
+
+        for number, (spec, (plan, plan_time)) in enumerate(zip(specs, planned), 1):
+            entry = {"style": spec.style, "details": spec.details, "floors": spec.floors, "seed": spec.seed,
+                     "location": list(spec.location), "plan_seconds": plan_time, "realize_seconds": 0.0,
+                     "placements": len(plan.placements) if plan else 0, "objects": 0,
+                     "conflicts": building_conflicts.get(number - 1, 0)}
+            if plan is not None and output != "geometry_nodes":
+                start = time.perf_counter()
+                collection = bpy.data.collections.new(f"House_{spec.style}_{spec.seed}")
+                root.children.link(collection)
+                names, _ = realizer.realize_delta(plan, None, collection, offset=spec.location, prototypes=prototypes)
+                segments, origin = footprints[(spec.style, spec.details, plan.foundation)]
+                build_manifest = manifest.BuildManifest(plan, names, segments, origin, tuple(spec.location))
+                if instance_floors:
+                    with profiling.timer("instancing"):
+                        realizer.instance_floors(collection, build_manifest)
+                manifest.write_manifest(collection, build_manifest)
+                entry["realize_seconds"] = time.perf_counter() - start
+                entry["objects"] = len(collection.objects)
+            report.append(entry)
+            log.info(f"{spec.style}/{spec.details} сид {spec.seed}: план {plan_time * 1000:.1f} мс, "
+                  f"объекты {entry['realize_seconds'] * 1000:.1f} мс, объектов {entry['objects']}")
+            yield 0.2 + 0.8 * number / len(specs)
+    except BaseException:
+        remove_building(root)
+        asset_loader.evict_prototypes()
+        asset_loader.clean_build_data()
+        log.warning("Сборка квартала прервана, коллекция квартала удалена")
+        raise
+
+    realize_seconds = time.perf_counter() - realize_start
+    asset_loader.evict_prototypes()
+    removed = asset_loader.clean_build_data()
+
+    stats = asset_loader.get_stats()
+    log.info(f"Квартал: {len(specs)} зданий за {time.perf_counter() - total_start:.2f} с "
+          f"(планирование {plan_seconds:.2f} с, объекты {realize_seconds:.2f} с), "
+          f"открытий библиотек: {stats['library_opens']}, удалено датаблоков: {removed}")
+    profiling.finish(root.name, buildings=len(specs), output=output)
+    return report
+
+def generate_batch(specs, workers=None, scene=None, collection_name="HouseGen Block", instance_floors=False,
+                   output="objects"):
+    """Строит пакет зданий: планирование в пуле процессов, создание объектов - одним проходом.
+    Каждое здание попадает в свою коллекцию внутри новой коллекции квартала; при output="geometry_nodes"
+    весь квартал - один объект с экземплярами. Возвращает отчёт по зданиям."""
+    return realizer.run_steps(iter_generate_batch(specs, workers, scene, collection_name, instance_floors, output))
+
+def write_chunk(collection, path):
+    """Сохраняет коллекцию части со зданиями в отдельный .blend (пути связанных библиотек - относительно него)"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    bpy.data.libraries.write(str(path), {collection}, path_remap="RELATIVE" if asset_loader.link_assets else "NONE",
+                             fake_user=True, compress=True)
+
+def remove_chunk(collection, meshes):
+    """Убирает записанную часть из сессии одним batch_remove; прототипы остаются в пуле"""
+    children = list(collection.children)
+    objects = [obj for child in children for obj in child.objects]
+    bpy.data.batch_remove(objects + children + [collection])
+    bpy.data.batch_remove([mesh for mesh in meshes if mesh.users == 0])
+    profiling.count("datablocks_removed", len(objects) + len(children) + 1)
+
+def iter_generate_footprints(path, out_dir, style="khrushchev", details="low", floors=5, seed=101, chunk_size=500,
+                             lonlat=None):
+    """Потоковая сборка зданий по контурам из файла (GeoJSON, GeoJSON Lines, CSV с WKT): контуры читаются
+    и планируются генератором, каждые chunk_size зданий записываются в свой .blend в out_dir и удаляются из сессии,
+    поэтому память не растёт с размером файла. После каждой части отдаёт число готовых зданий,
+    в конце возвращает отчёт по частям. lonlat - координаты в градусах (по умолчанию для GeoJSON)"""
+    path, out_dir = Path(path), Path(out_dir)
+    lonlat = footprints.is_lonlat(path) if lonlat is None else lonlat
+    log.info("Импорт контуров", extra={"fields": {"file": path.name, "style": style, "details": details,
+                                                   "floors": floors, "chunk": chunk_size}})
+    profiling.reset()
+    asset_loader.reset_stats()
+    asset_loader.verify_datablock_index()
+    asset_loader.begin_build_tracking()
+
+    plans = footprints.iter_footprint_plans(footprints.iter_footprints(path), style, details, floors, seed, lonlat)
+    report = []
+    built = 0
+    total_start = time.perf_counter()
+    for number, chunk in enumerate(footprints.iter_chunks(plans, max(1, chunk_size))):
+        start = time.perf_counter()
+        collection = bpy.data.collections.new(f"{path.stem}_{number:04d}")
+        slabs = []
         try:
-            # Логика генерации дверей, окон, стен в целом
-            # TODO: настенные декорации
-            if z <=0.21:
-                rnd = random.random()
-                if rnd > 0.80:
-                    try:
-                        blend_file, obj_name = asset_loader.get_random_asset(style, details, f"engawa{int(round(wall_len * 5))}")
-                        engawa_obj = asset_loader.append_object_from_blend(style, details, blend_file, obj_name)
-                        flag_engawa = True
-                    except:
-                        print(f"--- Пропущен engawa для {keyword}")
-                    blend_file, obj_name = asset_loader.get_random_asset(style, details, f"{keyword}_door")
-
-                elif rnd > 0.40:
-                    blend_file, obj_name = asset_loader.get_random_asset(style, details, f"{keyword}_window")
-                    if not blend_file:
-                        blend_file, obj_name = asset_loader.get_random_asset(style, details, f"{keyword}_{style}")
-                    engawa_obj, flag_engawa = plase_engawa(style, details, wall_len, flag_engawa)
-                else:
-                    blend_file, obj_name = asset_loader.get_random_asset(style, details, f"{keyword}_{style}")    
-                    engawa_obj, flag_engawa = plase_engawa(style, details, wall_len, flag_engawa)
-
-            # TODO: параметр частоты генерации окон?
-            else:
-                flag_engawa = False
-                rnd1 = random.random()
-                if rnd1 > 0.5:
-                    blend_file, obj_name = asset_loader.get_random_asset(style, details, f"{keyword}_window")
-                    if not blend_file:
-                        blend_file, obj_name = asset_loader.get_random_asset(style, details, f"{keyword}_{style}")
-                else:
-                    blend_file, obj_name = asset_loader.get_random_asset(style, details, f"{keyword}_{style}")
-        except Exception:
-            print(f"Произошла ошибка при поиске стен")
-
-
-        if not blend_file:
-            blend_file, obj_name = asset_loader.get_random_asset(style, details, keyword)
-
-        if not blend_file:
-            print(f"XXX- Не найдена стена с длиной {wall_len}")
-            continue
-
-        wall_obj = asset_loader.append_object_from_blend(style, details, blend_file, obj_name)
-        if not wall_obj:
-            print("XXX- Не удалось импортировать стену")
-            continue
-
-        # Межэтажный элемент
-        inter_obj = None 
-        if floors >=2:
-            try:
-                blend_file, obj_name = asset_loader.get_random_asset(style, details, f"interfloor{int(round(wall_len * 5))}")
-                inter_obj = asset_loader.append_object_from_blend(style, details, blend_file, obj_name)
-            except:
-                print(f"--- Пропущен interfloor для {keyword}")
-
-        # Позиция и поворот
-        angle = math.atan2(direction.y, direction.x)
-        wall_obj.location = (cursor.x, cursor.y, z)
-        wall_obj.rotation_euler[2] = angle
-
-        wall_obj.scale.x *= scale_factor  
-        wall_obj.scale.y *= 1.0          
-        wall_obj.scale.z *= 1.0
-
-        if inter_obj:
-            inter_obj.location = (cursor.x, cursor.y, z)
-            inter_obj.rotation_euler[2] = angle
-
-            inter_obj.scale.x *= scale_factor  
-            inter_obj.scale.y *= 1.0          
-            inter_obj.scale.z *= 1.0
-
-        if engawa_obj:
-            engawa_obj.location = (cursor.x, cursor.y, z-0.2)
-            engawa_obj.rotation_euler[2] = angle
-
-            engawa_obj.scale.x *= scale_factor  
-            engawa_obj.scale.y *= 1.0          
-            engawa_obj.scale.z *= 1.0
-
-        cursor += direction.normalized() * scaled_len
-
-def plase_engawa(style, details, wall_len, flag_engawa):
-    eng_rand = random.random()
-    if flag_engawa == True:
-        if eng_rand < 0.8:
-            blend_file, obj_name = asset_loader.get_random_asset(style, details, f"engawa{int(round(wall_len * 5))}")
-            engawa_obj = asset_loader.append_object_from_blend(style, details, blend_file, obj_name)
-            if eng_rand < 0.2:
-                flag_engawa = False
-            return engawa_obj, flag_engawa
-    elif not flag_engawa and eng_rand < 0.2:
-        flag_engawa = True
-        blend_file, obj_name = asset_loader.get_random_asset(style, details, f"engawa{int(round(wall_len * 5))}")
-        engawa_obj = asset_loader.append_object_from_blend(style, details, blend_file, obj_name)
-        return engawa_obj, flag_engawa
+            prototypes = realizer.load_plans_prototypes([plan for _, _, plan in chunk])
+            # Соседи проверяются в пределах части: индекс не растёт с размером файла
+            spatial_index.resolve_plans([(plan, None) for _, _, plan in chunk], realizer.prototype_shapes(prototypes))
+            for footprint, ring, plan in chunk:
+                building = bpy.data.collections.new(f"House_{footprint.id}")
+                collection.children.link(building)
+                # Плита по контуру играет роль фундамента-ассета: этажи ставят её копии
+                slab = helpers.footprint_slab(f"Slab_{footprint.id}", ring, footprints.ring_centroid(ring))
+                prototypes[(plan.style, "")] = slab
+                realizer.realize_plan(plan, building, prototypes=prototypes)
+                slabs.append(slab.data)
+                bpy.data.objects.remove(slab)
+
+            chunk_path = out_dir / f"{collection.name}.blend"
+            with profiling.timer("write"):
+                write_chunk(collection, chunk_path)
+            entry = {"file": str(chunk_path), "buildings": len(chunk),
+                     "placements": sum(len(plan.placements) for _, _, plan in chunk)}
+        finally:
+            remove_chunk(collection, slabs)
+            asset_loader.evict_prototypes()
+            asset_loader.clean_build_data()
+
+        entry["seconds"] = time.perf_counter() - start
+        report.append(entry)
+        built += len(chunk)
+        log.info(f"Часть {number}: зданий {len(chunk)} за {entry['seconds']:.2f} с -> {chunk_path.name}")
+        yield built
+
+    asset_catalog.flush()
+    stats = asset_loader.get_stats()
+    log.info(f"Контуры: {built} зданий в {len(report)} файлах за {time.perf_counter() - total_start:.2f} с, "
+             f"открытий библиотек: {stats['library_opens']}")
+    profiling.finish(path.stem, buildings=built, chunks=len(report))
+    return report
+
+def generate_from_footprints(path, out_dir, style="khrushchev", details="low", floors=5, seed=101, chunk_size=500,
+                             lonlat=None):
+    """Строит здания по контурам из файла частями по chunk_size в отдельные .blend; возвращает отчёт по частям"""
+    return realizer.run_steps(iter_generate_footprints(path, out_dir, style, details, floors, seed, chunk_size, lonlat))
+
+# Прогресс текущей модальной сборки для панели: доля 0..1 или None
+build_progress = {"fraction": None, "label": ""}
+
+def set_progress(context, fraction, label=""):
+    build_progress["fraction"] = fraction
+    build_progress["label"] = label
+    if fraction is None:
+        context.workspace.status_text_set(None)
+    else:
+        context.window_manager.progress_update(int(fraction * 100))
+        context.workspace.status_text_set(f"{label}: {int(fraction * 100)}% (Esc - cancel)")
+    for area in context.screen.areas:
+        if area.type == 'VIEW_3D':
+            area.tag_redraw()
+
+def activate_collection(context, collection):
+    """Новое здание становится активным: следующая сборка обновит его"""
+    layer_collection = find_layer_collection(context.view_layer.layer_collection, collection)
+    if layer_collection:
+        context.view_layer.active_layer_collection = layer_collection
+
+def building_steps(context, new_building=False):
+    """Пошаговая сборка по параметрам сцены: (шаги, коллекция-цель или None)"""
+    scene = context.scene
+    profiling.enable(scene.house_profile)
+    asset_loader.set_link_mode(scene.house_link_assets)
+    spatial_index.set_policy(scene.house_conflicts)
+    target = None if new_building else find_building_collection(context)
+    steps = iter_generate_building(style=scene.house_style.lower(), details=scene.house_details.lower(),
+                                   floors=scene.house_floors, seed=scene.house_seed, collection=target,
+                                   instance_floors=scene.house_instance_floors, output=scene.house_output.lower(),
+                                   merge=scene.house_merge, weld_distance=scene.house_weld_distance)
+    return steps, target
+
+# Идущие модальные сборки: их шаги держат ссылки на объекты, которые undo освободил бы
+_running_builds = []
+
+@persistent
+def _on_undo_pre(*args):
+    """Переход по истории undo во время сборки: сборка откатывается до того, как undo подменит данные"""
+    for build in list(_running_builds):
+        build.abort()
+
+class ModalBuild:
+    """Модальная сборка по таймеру: за тик выполняются шаги в пределах бюджета времени сцены,
+    Esc отменяет сборку с откатом. Шаг отмены не попадает в историю, успешная сборка - один шаг undo.
+    Ctrl+Z во время сборки не пропускается, переход по истории другим путём отменяет сборку"""
+    _steps = None
+    _timer = None
+
+    def start(self, context, steps):
+        self._steps = steps
+        _running_builds.append(self)
+        window_manager = context.window_manager
+        self._timer = window_manager.event_timer_add(0.01, window=context.window)
+        window_manager.progress_begin(0, 100)
+        window_manager.modal_handler_add(self)
+        set_progress(context, 0.0, self.bl_label)
+        return {'RUNNING_MODAL'}
+
+    def stop(self, context):
+        window_manager = context.window_manager
+        if self._timer is not None:
+            window_manager.event_timer_remove(self._timer)
+            self._timer = None
+        window_manager.progress_end()
+        set_progress(context, None)
+        if self in _running_builds:
+            _running_builds.remove(self)
+
+    def abort(self):
+        """Откат без контекста интерфейса (из обработчика undo); интерфейс убирает следующий вызов modal"""
+        if self._steps is not None:
+            self._steps.close()
+            self._steps = None
+
+    def modal(self, context, event):
+        if self._steps is None:
+            self.stop(context)
+            self.report({'WARNING'}, "Build cancelled by undo")
+            return {'CANCELLED'}
+        if event.type == 'ESC' and event.value == 'PRESS':
+            self.cancel(context)
+            self.report({'WARNING'}, "Build cancelled")
+            return {'CANCELLED'}
+        if event.type in {'Z', 'Y'} and (event.ctrl or event.oskey) and event.value == 'PRESS':
+            self.report({'WARNING'}, "Undo is unavailable while building (Esc cancels)")
+            return {'RUNNING_MODAL'}
+        if event.type != 'TIMER':
+            # Остальные события достаются интерфейсу: можно работать во время сборки
+            return {'PASS_THROUGH'}
+
+        deadline = time.perf_counter() + context.scene.house_time_budget
+        try:
+            fraction = next(self._steps)
+            while time.perf_counter() < deadline:
+                fraction = next(self._steps)
+        except StopIteration as stop:
+            self.stop(context)
+            self.finish(context, stop.value)
+            return {'FINISHED'}
+        except Exception as e:
+            self.stop(context)
+            self.report({'ERROR'}, f"Build failed: {e}")
+            return {'CANCELLED'}
+
+        set_progress(context, fraction, self.bl_label)
+        return {'PASS_THROUGH'}
+
+    def cancel(self, context):
+        # Закрытие шагов откатывает частично созданные объекты
+        if self._steps is not None:
+            self._steps.close()
+            self._steps = None
+        self.stop(context)
+
+    def finish(self, context, result):
+        pass
 
 class OBJECT_OT_BuildHouse(bpy.types.Operator):
     bl_idname = "object.build_house"
@@ -343,20 +504,177 @@ class OBJECT_OT_BuildHouse(bpy.types.Operator):
     bl_description = "Generate a building using a seed"
     bl_options = {'REGISTER', 'UNDO'}
 
+    new_building: bpy.props.BoolProperty(name="New Building", description="Build a new building instead of updating the selected one", default=False)
+
+    def execute(self, context):
+        steps, target = building_steps(context, self.new_building)
+        collection = realizer.run_steps(steps)
+        if collection is not None and target is None:
+            activate_collection(context, collection)
+        return {'FINISHED'}
+
+class OBJECT_OT_BuildHouseModal(ModalBuild, bpy.types.Operator):
+    bl_idname = "object.build_house_modal"
+    bl_label = "Building House"
+    bl_description = "Generate a building floor by floor without blocking the interface (Esc cancels)"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    new_building: bpy.props.BoolProperty(name="New Building", description="Build a new building instead of updating the selected one", default=False)
+
+    def invoke(self, context, event):
+        steps, self._target = building_steps(context, self.new_building)
+        return self.start(context, steps)
+
+    def execute(self, context):
+        steps, self._target = building_steps(context, self.new_building)
+        self.finish(context, realizer.run_steps(steps))
+        return {'FINISHED'}
+
+    def finish(self, context, collection):
+        if collection is not None and self._target is None:
+            activate_collection(context, collection)
+
+class OBJECT_OT_CleanUnusedData(bpy.types.Operator):
+    bl_idname = "object.house_clean_unused"
+    bl_label = "Clean Unused Data"
+    bl_description = "Remove every unused material and image in the file, not only those loaded by House Generator"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    def execute(self, context):
+        asset_loader.clean_unused_data()
+        asset_loader.invalidate_datablock_index()
+        return {'FINISHED'}
+
+class OBJECT_OT_BuildHouseBlock(ModalBuild, bpy.types.Operator):
+    bl_idname = "object.build_house_block"
+    bl_label = "Build Block"
+    bl_description = "Generate a grid of buildings with the current style; layouts are planned in parallel processes"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    rows: bpy.props.IntProperty(name="Rows", default=3, min=1, max=100)
+    cols: bpy.props.IntProperty(name="Columns", default=3, min=1, max=100)
+    spacing: bpy.props.FloatProperty(name="Spacing", default=40.0, min=1.0, unit='LENGTH')
+    workers: bpy.props.IntProperty(name="Workers", description="Planner processes (0 - auto, 1 - no pool)", default=0, min=0, max=64)
+    background: bpy.props.BoolProperty(name="Background", description="Build building by building without blocking the interface (Esc cancels)", default=True)
+
+    def invoke(self, context, event):
+        return context.window_manager.invoke_props_dialog(self)
+
+    def execute(self, context):
+        scene = context.scene
+        specs = batch.grid_specs(scene.house_style.lower(), scene.house_details.lower(), scene.house_floors,
+                                 scene.house_seed, self.rows, self.cols, self.spacing)
+        profiling.enable(scene.house_profile)
+        asset_loader.set_link_mode(scene.house_link_assets)
+        spatial_index.set_policy(scene.house_conflicts)
+        steps = iter_generate_batch(specs, workers=self.workers or None, scene=scene,
+                                    instance_floors=scene.house_instance_floors, output=scene.house_output.lower())
+        if self.background and context.window is not None:
+            return self.start(context, steps)
+
+        self.finish(context, realizer.run_steps(steps))
+        return {'FINISHED'}
+
+    def finish(self, context, report):
+        built = sum(1 for entry in report if entry["placements"])
+        self.report({'INFO'}, f"Built {built}/{len(report)} buildings")
+
+class OBJECT_OT_MakeHouseReal(bpy.types.Operator):
+    bl_idname = "object.house_make_real"
+    bl_label = "Make Floors Real"
+    bl_description = "Replace floor instances of the selected building with regular objects"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    @classmethod
+    def poll(cls, context):
+        return find_building_collection(context) is not None
+
     def execute(self, context):
-        style = context.scene.house_style.lower()
-        details = context.scene.house_details.lower()
-        seed = context.scene.house_seed
-        floors = context.scene.house_floors
+        collection = find_building_collection(context)
+        build_manifest = manifest.read_manifest(collection)
+        if not build_manifest or not build_manifest.instances:
+            self.report({'INFO'}, "Building has no floor instances")
+            return {'CANCELLED'}
+
+        created = realizer.make_real(collection, build_manifest)
+        manifest.write_manifest(collection, build_manifest)
+        self.report({'INFO'}, f"Created {created} objects")
+        return {'FINISHED'}
+
+class OBJECT_OT_MergeHouse(bpy.types.Operator):
+    bl_idname = "object.house_merge"
+    bl_label = "Merge Meshes"
+    bl_description = "Join the pieces of the selected building into one mesh per material"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    weld_distance: bpy.props.FloatProperty(name="Weld Distance", description="Merge seam vertices closer than this (0 - no welding)",
+                                           default=0.0, min=0.0, max=0.1, unit='LENGTH')
 
-        generate_building(style=style, details=details, seed=seed, floors=floors)
+    @classmethod
+    def poll(cls, context):
+        return find_building_collection(context) is not None
+
+    def execute(self, context):
+        collection = find_building_collection(context)
+        build_manifest = manifest.read_manifest(collection)
+        if build_manifest is None:
+            self.report({'WARNING'}, "Building manifest is unreadable")
+            return {'CANCELLED'}
+        merged = merge_building(collection, build_manifest, self.weld_distance)
+        manifest.write_manifest(collection, build_manifest)
+        self.report({'INFO'}, f"Merged into {len(merged)} objects")
+        return {'FINISHED'}
+
+class OBJECT_OT_LocalizeHouseObjects(bpy.types.Operator):
+    bl_idname = "object.house_localize"
+    bl_label = "Make Local Copies"
+    bl_description = "Give the selected objects their own copy of linked library meshes so they can be edited individually"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    materials: bpy.props.BoolProperty(name="Materials", description="Copy linked materials as well", default=False)
+
+    @classmethod
+    def poll(cls, context):
+        return any(obj.data is not None and obj.data.library is not None for obj in context.selected_objects)
+
+    def execute(self, context):
+        localized = sum(asset_loader.localize_object(obj, self.materials) for obj in context.selected_objects)
+        self.report({'INFO'}, f"Localized {localized} objects")
+        return {'FINISHED'}
+
+class OBJECT_OT_ExportHouseProfile(bpy.types.Operator):
+    bl_idname = "object.house_export_profile"
+    bl_label = "Export Profile"
+    bl_description = "Save timers and counters of the last profiled build to a JSON file"
+
+    filepath: bpy.props.StringProperty(subtype='FILE_PATH', default="house_profile.json")
+    filter_glob: bpy.props.StringProperty(default="*.json", options={'HIDDEN'})
+
+    @classmethod
+    def poll(cls, context):
+        return profiling.last_report() is not None
+
+    def invoke(self, context, event):
+        context.window_manager.fileselect_add(self)
+        return {'RUNNING_MODAL'}
+
+    def execute(self, context):
+        try:
+            profiling.export_json(bpy.path.ensure_ext(self.filepath, ".json"))
+        except (OSError, LookupError) as e:
+            self.report({'ERROR'}, str(e))
+            return {'CANCELLED'}
         return {'FINISHED'}
 
-classes = (OBJECT_OT_BuildHouse,)
+classes = (OBJECT_OT_BuildHouse, OBJECT_OT_BuildHouseModal, OBJECT_OT_BuildHouseBlock, OBJECT_OT_MakeHouseReal, OBJECT_OT_MergeHouse,
+           OBJECT_OT_LocalizeHouseObjects, OBJECT_OT_CleanUnusedData, OBJECT_OT_ExportHouseProfile)
 def register():
     for cls in classes:
         bpy.utils.register_class(cls)
+    bpy.app.handlers.undo_pre.append(_on_undo_pre)
 
 def unregister():
+    if _on_undo_pre in bpy.app.handlers.undo_pre:
+        bpy.app.handlers.undo_pre.remove(_on_undo_pre)
     for cls in reversed(classes):
         bpy.utils.unregister_class(cls)
\ No newline at end of file
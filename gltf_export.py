@@ -0,0 +1,155 @@
+import json
+import math
+import struct
+from pathlib import Path
+
+import numpy as np
+
+from . import mesh_cache
+from . import profiling
+
+# Сборка glTF 2.0 из планов зданий и кэша мешей без Blender: один меш на прототип (примитив на материал),
+# размещения - узлы с TRS, ссылающиеся на меш. Модуль без bpy.
+log = profiling.get_logger(__name__)
+
+GLB_MAGIC = 0x46546C67
+GLB_JSON = 0x4E4F534A
+GLB_BIN = 0x004E4942
+FLOAT, UNSIGNED_INT = 5126, 5125
+ARRAY_BUFFER, ELEMENT_ARRAY_BUFFER = 34962, 34963
+# Blender - Z вверх, glTF - Y вверх: корневой узел поворачивается на -90 градусов вокруг X
+Z_UP_ROTATION = [-math.sqrt(0.5), 0.0, 0.0, math.sqrt(0.5)]
+
+
+class GltfBuilder:
+    """Накопитель документа glTF: общий двоичный буфер, меши прототипов и узлы размещений"""
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.document = {"asset": {"version": "2.0", "generator": "House Generator"},
+                         "scene": 0, "scenes": [{"nodes": [0]}],
+                         "nodes": [{"name": "HouseGenerator", "rotation": Z_UP_ROTATION, "children": []}],
+                         "meshes": [], "materials": [], "accessors": [], "bufferViews": []}
+        self.meshes = {}      # (библиотека, ассет) -> номер меша или None (ассета нет в кэше)
+        self.materials = {}   # имя -> номер материала
+
+    def add_view(self, array: np.ndarray, target: int) -> int:
+        while len(self.buffer) % 4:
+            self.buffer.append(0)
+        data = np.ascontiguousarray(array).tobytes()
+        self.document["bufferViews"].append({"buffer": 0, "byteOffset": len(self.buffer), "byteLength": len(data),
+                                             "target": target})
+        self.buffer += data
+        return len(self.document["bufferViews"]) - 1
+
+    def add_accessor(self, array: np.ndarray, component_type: int, kind: str, target: int, bounds=False) -> int:
+        accessor = {"bufferView": self.add_view(array, target), "componentType": component_type,
+                    "count": len(array), "type": kind}
+        if bounds:
+            accessor["min"] = array.min(axis=0).tolist()
+            accessor["max"] = array.max(axis=0).tolist()
+        self.document["accessors"].append(accessor)
+        return len(self.document["accessors"]) - 1
+
+    def material(self, name: str) -> int | None:
+        if not name:
+            return None
+        if name not in self.materials:
+            self.document["materials"].append({"name": name, "pbrMetallicRoughness": {"metallicFactor": 0.0}})
+            self.materials[name] = len(self.document["materials"]) - 1
+        return self.materials[name]
+
+    def mesh(self, library: str, details: str, asset: str) -> int | None:
+        """Меш прототипа из кэша: записывается один раз на ассет, дальше на него ссылаются узлы"""
+        key = (library, asset)
+        if key in self.meshes:
+            return self.meshes[key]
+
+        cache = mesh_cache.get_cache(library, details)
+        cached = cache.get(asset) if cache is not None else None
+        if cached is None or not len(cached.triangles):
+            log.error(f"Ассета {asset} нет в кэше мешей {library}/{details}")
+            self.meshes[key] = None
+            return None
+
+        positions = np.asarray(cached.positions, dtype=np.float32)
+        uvs = np.array(cached.uvs, dtype=np.float32)
+        uvs[:, 1] = 1.0 - uvs[:, 1]  # начало UV в glTF - левый верхний угол
+        attributes = {"POSITION": self.add_accessor(positions, FLOAT, "VEC3", ARRAY_BUFFER, bounds=True),
+                      "TEXCOORD_0": self.add_accessor(uvs, FLOAT, "VEC2", ARRAY_BUFFER)}
+
+        slots = np.clip(np.asarray(cached.materials, dtype=np.int64), 0, max(len(cached.material_names) - 1, 0))
+        primitives = []
+        for slot in np.unique(slots):
+            indices = np.asarray(cached.triangles[slots == slot], dtype=np.uint32).reshape(-1)
+            primitive = {"attributes": attributes,
+                         "indices": self.add_accessor(indices, UNSIGNED_INT, "SCALAR", ELEMENT_ARRAY_BUFFER)}
+            material = self.material(cached.material_names[slot]) if cached.material_names else None
+            if material is not None:
+                primitive["material"] = material
+            primitives.append(primitive)
+
+        self.document["meshes"].append({"name": asset, "primitives": primitives})
+        self.meshes[key] = len(self.document["meshes"]) - 1
+        return self.meshes[key]
+
+    def add_plan(self, plan, name=None, offset=None) -> int:
+        """Узел здания с дочерними узлами размещений; возвращает его номер"""
+        nodes = self.document["nodes"]
+        children = []
+        for placement in plan.placements:
+            if not placement.asset:
+                continue
+            library = placement.library or plan.style
+            mesh = self.mesh(library, plan.details, placement.asset)
+            if mesh is None:
+                continue
+            cached = mesh_cache.get_cache(library, plan.details).get(placement.asset)
+            location, rotation, scale = placement.transform(cached.location, cached.rotation_euler, cached.scale, offset)
+            nodes.append({"mesh": mesh, "translation": location,
+                          "rotation": list(mesh_cache.euler_quaternion(rotation)), "scale": scale})
+            children.append(len(nodes) - 1)
+
+        nodes.append({"name": name or f"House_{plan.style}_{plan.seed}", "children": children})
+        nodes[0]["children"].append(len(nodes) - 1)
+        return len(nodes) - 1
+
+    def finish(self) -> dict:
+        document = {key: value for key, value in self.document.items() if value != []}
+        if self.buffer:
+            document["buffers"] = [{"byteLength": len(self.buffer)}]
+        return document
+
+    def write(self, path) -> Path:
+        """Записывает .glb (один файл) или .gltf с буфером рядом в .bin"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        document = self.finish()
+        if path.suffix.lower() != ".glb":
+            if self.buffer:
+                bin_path = path.with_suffix(".bin")
+                bin_path.write_bytes(self.buffer)
+                document["buffers"][0]["uri"] = bin_path.name
+            path.write_text(json.dumps(document, ensure_ascii=False), encoding="utf-8")
+            return path
+
+        payload = json.dumps(document, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        payload += b" " * (-len(payload) % 4)
+        binary = bytes(self.buffer) + b"\0" * (-len(self.buffer) % 4)
+        chunks = struct.pack("<II", len(payload), GLB_JSON) + payload
+        if binary:
+            chunks += struct.pack("<II", len(binary), GLB_BIN) + binary
+        with open(path, "wb") as f:
+            f.write(struct.pack("<III", GLB_MAGIC, 2, 12 + len(chunks)))
+            f.write(chunks)
+        return path
+
+
+def export_plans(entries, path) -> Path:
+    """entries - (план, имя, смещение) или просто планы; все здания пишутся в один файл"""
+    builder = GltfBuilder()
+    with profiling.timer("export"):
+        for entry in entries:
+            plan, name, offset = entry if isinstance(entry, tuple) else (entry, None, None)
+            builder.add_plan(plan, name, offset)
+        return builder.write(path)
@@ -0,0 +1,165 @@
+import bpy
+import numpy as np
+
+from . import asset_loader
+from . import realizer
+from . import profiling
+
+# Вывод через Geometry Nodes: размещения записываются облаком точек с атрибутами,
+# а дерево нод ставит на точки экземпляры прототипов. Один объект на здание или квартал вместо тысяч
+GN_TREE = "HG_Instancer"
+GN_OBJECT_PROP = "hg_gn"
+ATTR_PROTO = "hg_proto"
+ATTR_ROTATION = "hg_rotation"
+ATTR_SCALE = "hg_scale"
+
+log = profiling.get_logger(__name__)
+
+
+def new_tree_socket(tree, name, in_out, socket_type):
+    """Сокет интерфейса группы: API 4.x (tree.interface) и старый (tree.inputs / tree.outputs)"""
+    if hasattr(tree, "interface"):
+        return tree.interface.new_socket(name=name, in_out=in_out, socket_type=socket_type)
+    sockets = tree.inputs if in_out == 'INPUT' else tree.outputs
+    return sockets.new(socket_type, name)
+
+
+def input_identifier(tree, name):
+    """Идентификатор входа группы для значения в модификаторе"""
+    if hasattr(tree, "interface"):
+        for item in tree.interface.items_tree:
+            if item.item_type == 'SOCKET' and item.in_out == 'INPUT' and item.name == name:
+                return item.identifier
+        raise KeyError(name)
+    return tree.inputs[name].identifier
+
+
+def attribute_output(node):
+    """Выход Named Attribute: в 3.x у ноды по выходу на тип, включён только выход текущего типа"""
+    for socket in node.outputs:
+        if socket.name == "Attribute" and getattr(socket, "enabled", True):
+            return socket
+    return node.outputs[0]
+
+
+def named_attribute(tree, name, data_type, location):
+    node = tree.nodes.new("GeometryNodeInputNamedAttribute")
+    node.data_type = data_type
+    node.inputs["Name"].default_value = name
+    node.location = location
+    return attribute_output(node)
+
+
+def get_instancer_tree():
+    """Общее дерево: точки + коллекция прототипов -> экземпляры по атрибутам точек"""
+    tree = bpy.data.node_groups.get(GN_TREE)
+    if tree is not None:
+        return tree
+
+    tree = bpy.data.node_groups.new(GN_TREE, 'GeometryNodeTree')
+    new_tree_socket(tree, "Geometry", 'INPUT', 'NodeSocketGeometry')
+    new_tree_socket(tree, "Prototypes", 'INPUT', 'NodeSocketCollection')
+    new_tree_socket(tree, "Geometry", 'OUTPUT', 'NodeSocketGeometry')
+
+    nodes, links = tree.nodes, tree.links
+    group_input = nodes.new("NodeGroupInput")
+    group_input.location = (-700, 0)
+    group_output = nodes.new("NodeGroupOutput")
+    group_output.location = (300, 0)
+
+    # Дети коллекции идут по алфавиту имён - номер прототипа зашит в имя объекта
+    info = nodes.new("GeometryNodeCollectionInfo")
+    info.location = (-400, -150)
+    info.transform_space = 'ORIGINAL'
+    info.inputs["Separate Children"].default_value = True
+    info.inputs["Reset Children"].default_value = True
+    links.new(group_input.outputs["Prototypes"], info.inputs["Collection"])
+
+    instancer = nodes.new("GeometryNodeInstanceOnPoints")
+    instancer.location = (0, 0)
+    instancer.inputs["Pick Instance"].default_value = True
+    links.new(group_input.outputs["Geometry"], instancer.inputs["Points"])
+    links.new(info.outputs[0], instancer.inputs["Instance"])
+    links.new(named_attribute(tree, ATTR_PROTO, 'INT', (-400, -350)), instancer.inputs["Instance Index"])
+    links.new(named_attribute(tree, ATTR_ROTATION, 'FLOAT_VECTOR', (-400, -500)), instancer.inputs["Rotation"])
+    links.new(named_attribute(tree, ATTR_SCALE, 'FLOAT_VECTOR', (-400, -650)), instancer.inputs["Scale"])
+    links.new(instancer.outputs["Instances"], group_output.inputs[0])
+    return tree
+
+
+def placement_transform(placement, proto, offset=None):
+    """Итоговые положение, поворот (Euler XYZ) и масштаб - те же, что даёт realizer.realize_placement"""
+    return placement.transform(proto.location, proto.rotation_euler, proto.scale, offset)
+
+
+def realize_plans_gn(entries, name, collection, prototypes=None):
+    """Создаёт один объект-облако точек для списка (план, смещение) с модификатором экземпляров"""
+    plans = [plan for plan, _ in entries]
+    if prototypes is None:
+        prototypes = realizer.load_plans_prototypes(plans)
+
+    proto_index = {}
+    indices, locations, rotations, scales = [], [], [], []
+    for plan, offset in entries:
+        for placement in plan.placements:
+            key = (placement.library or plan.style, placement.asset)
+            proto = prototypes.get(key)
+            if proto is None:
+                log.error(f"Не удалось импортировать {placement.asset}")
+                continue
+            location, rotation, scale = placement_transform(placement, proto, offset)
+            indices.append(proto_index.setdefault(key, len(proto_index)))
+            locations.append(location)
+            rotations.append(rotation)
+            scales.append(scale)
+
+    # Прототипы - копии с общими мешами в коллекции вне сцены
+    proto_collection = bpy.data.collections.new(f"{name}_prototypes")
+    for key, index in proto_index.items():
+        obj = asset_loader.instance_prototype(prototypes[key], proto_collection)
+        obj.name = f"{proto_collection.name}_{index:05d}"
+
+    mesh = bpy.data.meshes.new(name)
+    mesh.vertices.add(len(indices))
+    mesh.vertices.foreach_set("co", np.asarray(locations, dtype=np.float32).ravel())
+    mesh.attributes.new(ATTR_PROTO, 'INT', 'POINT').data.foreach_set("value", np.asarray(indices, dtype=np.int32))
+    mesh.attributes.new(ATTR_ROTATION, 'FLOAT_VECTOR', 'POINT').data.foreach_set(
+        "vector", np.asarray(rotations, dtype=np.float32).ravel())
+    mesh.attributes.new(ATTR_SCALE, 'FLOAT_VECTOR', 'POINT').data.foreach_set(
+        "vector", np.asarray(scales, dtype=np.float32).ravel())
+    mesh.update()
+
+    obj = bpy.data.objects.new(name, mesh)
+    obj[GN_OBJECT_PROP] = True
+    collection.objects.link(obj)
+
+    tree = get_instancer_tree()
+    modifier = obj.modifiers.new("HouseGen Instances", 'NODES')
+    modifier.node_group = tree
+    modifier[input_identifier(tree, "Prototypes")] = proto_collection
+    log.info(f"Geometry Nodes: {len(indices)} размещений, {len(proto_index)} прототипов в объекте {obj.name}")
+    return obj
+
+
+def remove_gn_objects(collection, objects=None) -> int:
+    """Удаляет объекты-облака точек коллекции (или только среди objects) вместе с их прототипами"""
+    objects = [obj for obj in (collection.objects if objects is None else objects) if obj.get(GN_OBJECT_PROP)]
+    removed = []
+    for obj in objects:
+        for modifier in obj.modifiers:
+            if modifier.type != 'NODES' or modifier.node_group is None:
+                continue
+            try:
+                proto_collection = modifier[input_identifier(modifier.node_group, "Prototypes")]
+            except KeyError:
+                continue
+            if proto_collection is not None:
+                removed += list(proto_collection.objects)
+                bpy.data.collections.remove(proto_collection)
+        mesh = obj.data
+        bpy.data.objects.remove(obj)
+        if mesh.users == 0:
+            bpy.data.meshes.remove(mesh)
+    if removed:
+        bpy.data.batch_remove(removed)
+    return len(objects)
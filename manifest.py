@@ -0,0 +1,122 @@
+import json
+from dataclasses import dataclass, field
+
+from . import profiling
+from .build_plan import BuildPlan
+
+# Манифест сборки: план здания и созданные по нему объекты.
+# Хранится JSON-строкой в свойстве коллекции здания; по нему пересборка меняет только затронутые части.
+MANIFEST_VERSION = 1
+MANIFEST_PROP = "hg_manifest"
+
+log = profiling.get_logger(__name__)
+
+
+@dataclass
+class BuildManifest:
+    """Состояние собранного здания"""
+    plan: BuildPlan
+    objects: list = field(default_factory=list)     # имя объекта для каждого размещения плана (None - не создан)
+    footprint: list = field(default_factory=list)   # контур фундамента: при том же фундаменте .blend не открывается
+    origin: tuple = (0.0, 0.0)
+    offset: tuple = (0.0, 0.0, 0.0)                 # положение здания в квартале
+    instances: list = field(default_factory=list)   # [этаж, пустышка-экземпляр, коллекция этажа, имена объектов этажа]
+    merged: list = field(default_factory=list)      # объекты, слитые по материалам (детали здания удалены)
+
+    def params(self) -> dict:
+        plan = self.plan
+        return {"style": plan.style, "details": plan.details, "floors": plan.floors, "seed": plan.seed}
+
+    def floor_objects(self) -> dict[int, list[str]]:
+        """Имена объектов по этажам (крыша - этаж plan.floors)"""
+        floors = {}
+        for placement, name in zip(self.plan.placements, self.objects):
+            if name:
+                floors.setdefault(placement.floor, []).append(name)
+        return floors
+
+    def to_dict(self) -> dict:
+        return {
+            "version": MANIFEST_VERSION,
+            "plan": self.plan.to_dict(),
+            "objects": self.objects,
+            "footprint": [[list(start), list(end)] for start, end in self.footprint],
+            "origin": list(self.origin),
+            "offset": list(self.offset),
+            "instances": self.instances,
+            "merged": self.merged,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        if data.get("version") != MANIFEST_VERSION:
+            raise ValueError(f"Неподдерживаемая версия манифеста: {data.get('version')}")
+        footprint = [(tuple(start), tuple(end)) for start, end in data["footprint"]]
+        return cls(BuildPlan.from_dict(data["plan"]), data["objects"], footprint,
+                   tuple(data["origin"]), tuple(data["offset"]), data.get("instances", []),
+                   data.get("merged", []))
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), ensure_ascii=False, separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, text: str):
+        return cls.from_dict(json.loads(text))
+
+
+def read_manifest(collection) -> BuildManifest | None:
+    """Манифест коллекции здания или None"""
+    text = collection.get(MANIFEST_PROP)
+    if not text:
+        return None
+    try:
+        return BuildManifest.from_json(text)
+    except (ValueError, KeyError, TypeError) as e:
+        log.warning(f"Манифест коллекции {collection.name} не прочитан: {e}")
+        return None
+
+
+def write_manifest(collection, manifest: BuildManifest):
+    collection[MANIFEST_PROP] = manifest.to_json()
+
+
+def placement_key(placement) -> tuple:
+    return placement.kind, placement.floor, placement.segment, placement.index
+
+
+@dataclass
+class PlanDelta:
+    """Разница двух планов одного здания"""
+    keep: list = field(default_factory=list)    # (индекс в новом плане, индекс в старом) - размещение не изменилось
+    add: list = field(default_factory=list)     # индексы нового плана, для которых нужен объект
+    remove: list = field(default_factory=list)  # индексы старого плана, чьи объекты удаляются
+
+    def affected_floors(self, old_plan, new_plan) -> list[int]:
+        floors = {new_plan.placements[i].floor for i in self.add}
+        if old_plan is not None:
+            floors |= {old_plan.placements[i].floor for i in self.remove}
+        return sorted(floors)
+
+
+def diff_plans(old_plan, new_plan) -> PlanDelta:
+    """Сопоставляет размещения по (вид, этаж, сегмент, номер): совпавшие целиком объекты остаются на месте"""
+    delta = PlanDelta()
+    old_by_key = {}
+    # Одинаковые имена в разных библиотеках - разные объекты: при смене стиля или детализации не совпадает ничего
+    if old_plan is not None and (old_plan.style, old_plan.details) == (new_plan.style, new_plan.details):
+        for old_index, placement in enumerate(old_plan.placements):
+            old_by_key.setdefault(placement_key(placement), []).append(old_index)
+
+    matched = set()
+    for index, placement in enumerate(new_plan.placements):
+        candidates = old_by_key.get(placement_key(placement), ())
+        old_index = next((i for i in candidates if i not in matched and old_plan.placements[i] == placement), None)
+        if old_index is None:
+            delta.add.append(index)
+        else:
+            matched.add(old_index)
+            delta.keep.append((index, old_index))
+
+    if old_plan is not None:
+        delta.remove = [i for i in range(len(old_plan.placements)) if i not in matched]
+    return delta
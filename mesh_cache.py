@@ -0,0 +1,262 @@
+import json
+import math
+import os
+from pathlib import Path
+
+import numpy as np
+
+from . import asset_catalog
+from . import planner
+from . import profiling
+from . import rng_streams
+from . import spatial_index
+
+# Кэш геометрии ассетов для работы без Blender (движок, превью, glTF): на библиотеку - папка
+# с массивами .npy, которые открываются через mmap, и index.json со срезами объектов.
+# .npz не подходит: архив не отображается в память, numpy распаковывает массивы целиком.
+# Модуль без bpy; кэш пишет asset_loader.export_mesh_cache в Blender.
+log = profiling.get_logger(__name__)
+
+CACHE_DIR = Path(__file__).parent / ".cache" / "meshes"
+CACHE_VERSION = 2
+INDEX_FILE = "index.json"
+ARRAYS = {
+    "positions": np.float32,    # (n, 3) вершины в локальных координатах объекта
+    "uvs": np.float32,          # (n, 2) UV вершины (вершины разделены по швам UV)
+    "triangles": np.uint32,     # (m, 3) индексы вершин внутри объекта
+    "materials": np.uint16,     # (m,) слот материала треугольника
+}
+
+def get_cache_dir(style: str, details: str) -> Path:
+    return CACHE_DIR / style / details
+
+
+def euler_matrix(rotation) -> np.ndarray:
+    """Матрица поворота Euler XYZ (как rotation_euler в Blender: сначала X, затем Y, затем Z)"""
+    x, y, z = rotation
+    cx, sx, cy, sy, cz, sz = math.cos(x), math.sin(x), math.cos(y), math.sin(y), math.cos(z), math.sin(z)
+    rx = np.array([[1, 0, 0], [0, cx, -sx], [0, sx, cx]])
+    ry = np.array([[cy, 0, sy], [0, 1, 0], [-sy, 0, cy]])
+    rz = np.array([[cz, -sz, 0], [sz, cz, 0], [0, 0, 1]])
+    return rz @ ry @ rx
+
+
+def euler_quaternion(rotation) -> tuple[float, float, float, float]:
+    """Кватернион (x, y, z, w) того же поворота Euler XYZ"""
+    hx, hy, hz = (angle / 2 for angle in rotation)
+    cx, sx, cy, sy, cz, sz = math.cos(hx), math.sin(hx), math.cos(hy), math.sin(hy), math.cos(hz), math.sin(hz)
+    return (sx * cy * cz - cx * sy * sz,
+            cx * sy * cz + sx * cy * sz,
+            cx * cy * sz - sx * sy * cz,
+            cx * cy * cz + sx * sy * sz)
+
+
+class CachedMesh:
+    """Объект ассета из кэша: срезы массивов (без копирования) и трансформация прототипа"""
+    __slots__ = ("name", "positions", "uvs", "triangles", "materials", "material_names",
+                 "location", "rotation_euler", "scale", "footprint_data")
+
+    def __init__(self, name, positions, uvs, triangles, materials, material_names, location, rotation_euler, scale,
+                 footprint_data=None):
+        self.name = name
+        self.positions = positions
+        self.uvs = uvs
+        self.triangles = triangles
+        self.materials = materials
+        self.material_names = material_names
+        self.location = location
+        self.rotation_euler = rotation_euler
+        self.scale = scale
+        self.footprint_data = footprint_data
+
+    def world_positions(self) -> np.ndarray:
+        """Вершины с трансформацией прототипа (как matrix_world объекта в библиотеке)"""
+        matrix = euler_matrix(self.rotation_euler) * np.asarray(self.scale, dtype=np.float64)
+        return np.asarray(self.positions, dtype=np.float64) @ matrix.T + np.asarray(self.location, dtype=np.float64)
+
+    def shape(self) -> spatial_index.Shape:
+        """Трансформация и XY-габарит для проверки конфликтов размещений"""
+        if len(self.positions):
+            low, high = np.min(self.positions[:, :2], axis=0), np.max(self.positions[:, :2], axis=0)
+        else:
+            low = high = np.zeros(2)
+        return spatial_index.Shape(self.location, self.rotation_euler, self.scale,
+                                   (float(low[0]), float(low[1]), float(high[0]), float(high[1])))
+
+    def footprint(self):
+        """Контур фундамента, записанный при выгрузке из object_helpers.get_foundation_footprint:
+        рёбра в том же порядке и направлении и начало координат объекта; у не-фундаментов контура нет"""
+        if self.footprint_data is None:
+            return [], (float(self.location[0]), float(self.location[1]))
+        segments = [(tuple(start), tuple(end)) for start, end in self.footprint_data["segments"]]
+        return segments, tuple(self.footprint_data["origin"])
+
+
+class MeshCache:
+    """Кэш одной библиотеки: массивы отображены в память, объекты - срезы по индексу"""
+
+    def __init__(self, directory: Path, index: dict, arrays: dict):
+        self.directory = directory
+        self.index = index
+        self.arrays = arrays
+
+    @classmethod
+    def open(cls, style: str, details: str, directory=None):
+        """Открывает кэш; None, если его нет или .blend библиотеки изменился после выгрузки"""
+        directory = Path(directory) if directory else get_cache_dir(style, details)
+        try:
+            with open(directory / INDEX_FILE, "r", encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if index.get("version") != CACHE_VERSION:
+            return None
+
+        blend_path = asset_catalog.get_asset_path(style, details)
+        if blend_path.exists() and asset_catalog.file_stamp(blend_path) != index.get("stamp"):
+            log.warning(f"Кэш мешей {style}/{details} устарел: библиотека изменилась")
+            return None
+
+        arrays = {name: np.load(directory / f"{name}.npy", mmap_mode="r") for name in ARRAYS}
+        return cls(directory, index, arrays)
+
+    @property
+    def names(self) -> list[str]:
+        return list(self.index["objects"])
+
+    def get(self, name: str) -> CachedMesh | None:
+        entry = self.index["objects"].get(name)
+        if entry is None:
+            return None
+        vertex_start, vertex_count = entry["vertices"]
+        triangle_start, triangle_count = entry["triangles"]
+        vertices = slice(vertex_start, vertex_start + vertex_count)
+        triangles = slice(triangle_start, triangle_start + triangle_count)
+        return CachedMesh(name, self.arrays["positions"][vertices], self.arrays["uvs"][vertices],
+                          self.arrays["triangles"][triangles], self.arrays["materials"][triangles],
+                          entry["materials"], tuple(entry["location"]), tuple(entry["rotation"]), tuple(entry["scale"]),
+                          entry.get("footprint"))
+
+
+class MeshCacheWriter:
+    """Собирает объекты библиотеки и записывает кэш (массивы - во временные файлы, затем замена)"""
+
+    def __init__(self, style: str, details: str, stamp, directory=None):
+        self.directory = Path(directory) if directory else get_cache_dir(style, details)
+        self.stamp = stamp
+        self.objects = {}
+        self.parts = {name: [] for name in ARRAYS}
+        self.vertex_count = 0
+        self.triangle_count = 0
+
+    def add(self, name, positions, uvs, triangles, materials, material_names, location, rotation, scale,
+            footprint=None):
+        """footprint - (сегменты, начало координат) фундамента, как их возвращает get_foundation_footprint"""
+        positions = np.asarray(positions, dtype=ARRAYS["positions"]).reshape(-1, 3)
+        triangles = np.asarray(triangles, dtype=ARRAYS["triangles"]).reshape(-1, 3)
+        self.objects[name] = {
+            "vertices": [self.vertex_count, len(positions)],
+            "triangles": [self.triangle_count, len(triangles)],
+            "materials": list(material_names),
+            "location": [float(value) for value in location],
+            "rotation": [float(value) for value in rotation],
+            "scale": [float(value) for value in scale],
+        }
+        if footprint is not None:
+            segments, origin = footprint
+            self.objects[name]["footprint"] = {
+                "segments": [[[float(x), float(y)] for x, y in segment] for segment in segments],
+                "origin": [float(value) for value in origin],
+            }
+        self.parts["positions"].append(positions)
+        self.parts["uvs"].append(np.asarray(uvs, dtype=ARRAYS["uvs"]).reshape(-1, 2))
+        self.parts["triangles"].append(triangles)
+        self.parts["materials"].append(np.asarray(materials, dtype=ARRAYS["materials"]).reshape(-1))
+        self.vertex_count += len(positions)
+        self.triangle_count += len(triangles)
+
+    def write(self) -> Path:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        shapes = {"positions": (0, 3), "uvs": (0, 2), "triangles": (0, 3), "materials": (0,)}
+        for name, dtype in ARRAYS.items():
+            parts = self.parts[name]
+            array = np.concatenate(parts) if parts else np.empty(shapes[name], dtype=dtype)
+            tmp_path = self.directory / f"{name}.tmp.npy"
+            np.save(tmp_path, array)
+            os.replace(tmp_path, self.directory / f"{name}.npy")
+
+        index = {"version": CACHE_VERSION, "stamp": self.stamp, "objects": self.objects}
+        tmp_path = self.directory / f"{INDEX_FILE}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f, ensure_ascii=False)
+        os.replace(tmp_path, self.directory / INDEX_FILE)
+        log.info(f"Кэш мешей: {len(self.objects)} объектов, вершин {self.vertex_count}, "
+                 f"треугольников {self.triangle_count} -> {self.directory}")
+        return self.directory
+
+
+_open_caches = {}
+
+
+def get_cache(style: str, details: str) -> MeshCache | None:
+    """Открытый кэш библиотеки (один на процесс)"""
+    key = (style, details)
+    if key not in _open_caches:
+        _open_caches[key] = MeshCache.open(style, details)
+    return _open_caches[key]
+
+
+def use_as_catalog(style: str, details: str) -> bool:
+    """Каталог библиотеки из имён кэша: планировщик выбирает только ассеты, у которых есть геометрия"""
+    cache = get_cache(style, details)
+    if cache is None:
+        return False
+    asset_catalog.set_catalog(style, details, asset_catalog.AssetCatalog(
+        asset_catalog.get_asset_path(style, details), cache.names, cache.index["stamp"]))
+    return True
+
+
+def plan_building(style="khrushchev", details="low", floors=5, seed=101):
+    """План здания по кэшу мешей - те же решения, что у generator.iter_generate_building, но без Blender"""
+    style = planner.canonical_style(style)
+    if not planner.has_planner(style):
+        log.error(f"Нет генератора для стиля: {style}")
+        return None
+    for library in planner.get_style_libraries(style):
+        if not use_as_catalog(library, details):
+            log.error(f"Нет кэша мешей {library}/{details}: выгрузите его через cli.py --mesh-cache")
+            return None
+
+    rng = rng_streams.building_stream(seed)
+    foundation_name = planner.pick_foundation(style, details, rng.child("foundation"))
+    foundation = get_cache(style, details).get(foundation_name) if foundation_name else None
+    if foundation is None:
+        log.warning("Фундамент не найден в кэше")
+        return None
+
+    segments, origin = foundation.footprint()
+    if not segments:
+        log.warning(f"В кэше нет контура фундамента {foundation_name}: выгрузите кэш заново")
+        return None
+    with profiling.timer("plan"):
+        plan = planner.plan_building(style, details, floors, seed, foundation_name, segments, origin, rng)
+    spatial_index.resolve_plans([(plan, None)], plan_shapes(plan))
+    return plan
+
+
+def plan_shapes(plan) -> dict:
+    """Габариты всех ассетов плана из кэша: (библиотека, ассет) -> spatial_index.Shape"""
+    shapes = {}
+    for (library, details), names in plan.assets_by_library().items():
+        cache = get_cache(library, details)
+        for name in names:
+            cached = cache.get(name) if cache is not None else None
+            if cached is not None:
+                shapes[(library, name)] = cached.shape()
+    return shapes
+
+
+def clear():
+    for style, details in _open_caches:
+        asset_catalog.set_catalog(style, details, None)
+    _open_caches.clear()
@@ -0,0 +1,167 @@
+import bpy
+import bmesh
+import numpy as np
+
+# Слияние деталей здания в один меш на материал: массивы вершин/петель/полигонов читаются
+# через foreach_get, трансформации запекаются в NumPy, результат записывается через foreach_set (без bpy.ops)
+MERGED_PROP = "hg_merged"
+
+
+def read_mesh(mesh) -> dict:
+    """Массивы меша: вершины, петли, полигоны и UV активного слоя"""
+    co = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", co)
+    loop_verts = np.empty(len(mesh.loops), dtype=np.int32)
+    mesh.loops.foreach_get("vertex_index", loop_verts)
+
+    count = len(mesh.polygons)
+    starts = np.empty(count, dtype=np.int32)
+    totals = np.empty(count, dtype=np.int32)
+    material_index = np.empty(count, dtype=np.int32)
+    smooth = np.empty(count, dtype=bool)
+    mesh.polygons.foreach_get("loop_start", starts)
+    mesh.polygons.foreach_get("loop_total", totals)
+    mesh.polygons.foreach_get("material_index", material_index)
+    mesh.polygons.foreach_get("use_smooth", smooth)
+
+    uv = np.zeros(len(mesh.loops) * 2, dtype=np.float32)
+    if mesh.uv_layers.active:
+        mesh.uv_layers.active.data.foreach_get("uv", uv)
+
+    return {"co": co.reshape(-1, 3), "loop_verts": loop_verts, "starts": starts, "totals": totals,
+            "material_index": material_index, "smooth": smooth, "uv": uv.reshape(-1, 2)}
+
+
+def read_triangles(mesh):
+    """Треугольники меша для кэша без Blender: вершины разделены по швам UV (как в glTF).
+    Возвращает позиции (n, 3), UV (n, 2), индексы (m, 3) и слоты материалов (m,)"""
+    mesh.calc_loop_triangles()
+    count = len(mesh.loop_triangles)
+    loops = np.empty(count * 3, dtype=np.int32)
+    mesh.loop_triangles.foreach_get("loops", loops)
+    material_index = np.empty(count, dtype=np.int32)
+    mesh.loop_triangles.foreach_get("material_index", material_index)
+
+    arrays = read_mesh(mesh)
+    corners = np.column_stack((arrays["loop_verts"][loops], arrays["uv"][loops]))
+    unique, inverse = np.unique(corners, axis=0, return_inverse=True)
+    positions = arrays["co"][unique[:, 0].astype(np.int64)]
+    return (positions.astype(np.float32), unique[:, 1:].astype(np.float32),
+            inverse.reshape(-1, 3).astype(np.uint32), material_index.astype(np.uint16))
+
+
+def polygon_loops(starts, totals):
+    """Индексы петель выбранных полигонов подряд, в порядке полигонов"""
+    within = np.arange(totals.sum()) - np.repeat(np.cumsum(totals) - totals, totals)
+    return np.repeat(starts, totals) + within
+
+
+def split_by_material(arrays, slot_count) -> dict[int, dict]:
+    """Части меша по слотам материалов: только используемые вершины, индексы петель локальные"""
+    slots = np.clip(arrays["material_index"], 0, max(slot_count - 1, 0))
+    parts = {}
+    for slot in np.unique(slots):
+        selected = np.nonzero(slots == slot)[0]
+        totals = arrays["totals"][selected]
+        loop_ids = polygon_loops(arrays["starts"][selected], totals)
+        used, local_verts = np.unique(arrays["loop_verts"][loop_ids], return_inverse=True)
+        parts[int(slot)] = {
+            "co": arrays["co"][used],
+            "loop_verts": local_verts.astype(np.int32),
+            "totals": totals,
+            "smooth": arrays["smooth"][selected],
+            "uv": arrays["uv"][loop_ids],
+        }
+    return parts
+
+
+def flip_winding(loop_verts, uv, totals):
+    """Обратный порядок петель в каждом полигоне (для зеркальных трансформаций)"""
+    starts = np.concatenate(([0], np.cumsum(totals)[:-1]))
+    loop_poly = np.repeat(np.arange(len(totals)), totals)
+    position = np.arange(len(loop_verts)) - starts[loop_poly]
+    reverse = starts[loop_poly] + totals[loop_poly] - 1 - position
+    return loop_verts[reverse], uv[reverse]
+
+
+def build_mesh(name, chunks, material) -> bpy.types.Mesh:
+    """Меш из списка частей (вершины в мировых координатах)"""
+    co = np.concatenate([chunk["co"] for chunk in chunks])
+    vertex_offsets = np.cumsum([0] + [len(chunk["co"]) for chunk in chunks[:-1]])
+    loop_verts = np.concatenate([chunk["loop_verts"] + offset for chunk, offset in zip(chunks, vertex_offsets)])
+    totals = np.concatenate([chunk["totals"] for chunk in chunks])
+    smooth = np.concatenate([chunk["smooth"] for chunk in chunks])
+    uv = np.concatenate([chunk["uv"] for chunk in chunks])
+    starts = np.concatenate(([0], np.cumsum(totals)[:-1])).astype(np.int32)
+
+    mesh = bpy.data.meshes.new(name)
+    mesh.vertices.add(len(co))
+    mesh.vertices.foreach_set("co", co.astype(np.float32).ravel())
+    mesh.loops.add(len(loop_verts))
+    mesh.loops.foreach_set("vertex_index", loop_verts.astype(np.int32))
+    mesh.polygons.add(len(totals))
+    mesh.polygons.foreach_set("loop_start", starts)
+    try:
+        mesh.polygons.foreach_set("loop_total", totals.astype(np.int32))
+    except (AttributeError, TypeError):
+        pass  # 4.x: размер полигона выводится из loop_start
+    mesh.polygons.foreach_set("use_smooth", smooth)
+    mesh.uv_layers.new(name="UVMap").data.foreach_set("uv", uv.astype(np.float32).ravel())
+    mesh.update(calc_edges=True)
+    if material is not None:
+        mesh.materials.append(material)
+    return mesh
+
+
+def weld(mesh, distance):
+    """Сваривает совпадающие вершины на стыках деталей"""
+    bm = bmesh.new()
+    bm.from_mesh(mesh)
+    bmesh.ops.remove_doubles(bm, verts=bm.verts, dist=distance)
+    bm.to_mesh(mesh)
+    bm.free()
+
+
+def merge_objects(objects, name, collection, weld_distance=0.0) -> list:
+    """Сливает меши объектов в один объект на материал; исходные объекты не трогает.
+    Возвращает новые объекты"""
+    bpy.context.view_layer.update()
+    parts_cache = {}
+    chunks = {}
+    materials = {}
+
+    for obj in objects:
+        if obj.type != 'MESH' or obj.get(MERGED_PROP):
+            continue
+        slot_materials = [slot.material for slot in obj.material_slots] or [None]
+        # Детали здания делят меши прототипов: разбиение считается один раз на меш и набор материалов
+        key = (obj.data.as_pointer(), tuple(m.as_pointer() if m else 0 for m in slot_materials))
+        parts = parts_cache.get(key)
+        if parts is None:
+            parts = parts_cache[key] = split_by_material(read_mesh(obj.data), len(slot_materials))
+
+        matrix = np.array(obj.matrix_world, dtype=np.float64)
+        mirrored = np.linalg.det(matrix[:3, :3]) < 0
+        for slot, part in parts.items():
+            material = slot_materials[min(slot, len(slot_materials) - 1)]
+            material_key = material.as_pointer() if material else 0
+            materials[material_key] = material
+            co = part["co"] @ matrix[:3, :3].T + matrix[:3, 3]
+            loop_verts, uv = part["loop_verts"], part["uv"]
+            if mirrored:
+                loop_verts, uv = flip_winding(loop_verts, uv, part["totals"])
+            chunks.setdefault(material_key, []).append(
+                {"co": co, "loop_verts": loop_verts, "totals": part["totals"], "smooth": part["smooth"], "uv": uv})
+
+    merged = []
+    for material_key, material_chunks in chunks.items():
+        material = materials[material_key]
+        part_name = f"{name}_{material.name if material else 'nomaterial'}"
+        mesh = build_mesh(part_name, material_chunks, material)
+        if weld_distance > 0:
+            weld(mesh, weld_distance)
+        obj = bpy.data.objects.new(part_name, mesh)
+        obj[MERGED_PROP] = True
+        collection.objects.link(obj)
+        merged.append(obj)
+    return merged
@@ -1,78 +1,121 @@
 import bpy
-import math
-from mathutils import Vector
+import numpy as np
+
+from . import profiling
+from .wall_packing import WALL_LENGTHS, find_best_combination, find_wall_combination
 
 TOLERANCE_ANGLE = 0.01  # Допускаемая погрешность при проверке 180°
-WALL_LENGTHS = [2.0, 2.4, 3.0]
 
 
-def get_top_edges(obj):
-    """Получает верхние (горизонтальные) грани фундамета"""
-    top_edges = []
+def read_mesh_arrays(obj):
+    """Вершины (в мировых координатах) и рёбра меша одним foreach_get, без цикла по вершинам"""
     mesh = obj.data
-    obj_matrix = obj.matrix_world
+    co = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", co)
+    edges = np.empty(len(mesh.edges) * 2, dtype=np.int32)
+    mesh.edges.foreach_get("vertices", edges)
+
+    matrix = np.array(obj.matrix_world, dtype=np.float64)
+    world = co.reshape(-1, 3) @ matrix[:3, :3].T + matrix[:3, 3]
+    return world, edges.reshape(-1, 2)
 
-    max_z = -float('inf')
-    for vertex in mesh.vertices:
-        world_co = obj_matrix @ vertex.co
-        if world_co.z > max_z:
-            max_z = world_co.z
 
-    for edge in mesh.edges:
-        v1 = obj_matrix @ mesh.vertices[edge.vertices[0]].co
-        v2 = obj_matrix @ mesh.vertices[edge.vertices[1]].co
+def top_edges_mask(world, edges, max_z, tolerance=0.001):
+    """Маска рёбер, обе вершины которых лежат на верхнем уровне; max_z - число или массив на каждое ребро"""
+    z = world[:, 2][edges]
+    max_z = np.asarray(max_z).reshape(-1, 1)
+    return (np.abs(z - max_z) < tolerance).all(axis=1) & (np.abs(z[:, 0] - z[:, 1]) < tolerance)
 
-        # Если обе вершины находятся почти на одной высоте — считаем ребро горизонтальным
-        if (abs(v1.z - max_z) < 0.001 and abs(v2.z - max_z) < 0.001 and abs(v1.z - v2.z) < 0.001):
-            top_edges.append((v1.xy, v2.xy))
 
-    return top_edges
+def get_top_edges(obj, tolerance=0.001):
+    """Получает верхние (горизонтальные) грани фундамета: массив (n, 2, 2) пар точек XY"""
+    world, edges = read_mesh_arrays(obj)
+    if not len(world) or not len(edges):
+        return np.empty((0, 2, 2))
 
+    mask = top_edges_mask(world, edges, world[:, 2].max(), tolerance)
+    return world[edges[mask]][:, :, :2]
 
 
-def find_best_combination(A, length):
-    """Находит лучшее число из массива длин A и множитель (количество стен) n, чтобы n * A[i] было близко к length (заполняемому ребру)."""
-    best_number = None
-    best_multiplier = 0
-    min_difference = float('inf')
+def get_top_edges_batch(objects, tolerance=0.001):
+    """get_top_edges для пачки фундаментов за один проход маски"""
+    arrays = [read_mesh_arrays(obj) for obj in objects]
+    if not arrays:
+        return []
 
-    for number in A:
-        # Определяем наилучший множитель n
-        multiplier = round(length / number)  # Округляем до ближайшего целого
+    vertex_counts = np.array([len(world) for world, _ in arrays])
+    edge_counts = np.array([len(edges) for _, edges in arrays])
+    offsets = np.concatenate(([0], np.cumsum(vertex_counts)[:-1]))
 
-        # Вычисляем разницу (абсолютное значение)
-        difference = abs(length - multiplier * number)
+    world = np.concatenate([w for w, _ in arrays]) if vertex_counts.sum() else np.empty((0, 3))
+    edges = np.concatenate([e + offset for (_, e), offset in zip(arrays, offsets)]) if edge_counts.sum() else np.empty((0, 2), dtype=np.int32)
 
-        # Обновляем, если нашли лучшее
-        if difference < min_difference:
-            min_difference = difference
-            best_number = number
-            best_multiplier = multiplier
+    # Максимум Z по каждому объекту, затем размножаем на его рёбра
+    max_z = np.full(len(arrays), -np.inf)
+    non_empty = vertex_counts > 0
+    max_z[non_empty] = np.maximum.reduceat(world[:, 2], offsets[non_empty])
+    edge_owner = np.repeat(np.arange(len(arrays)), edge_counts)
 
-    # Создаем комбинацию, повторяя best_number best_multiplier раз
-    best_combination = [best_number] * best_multiplier
+    mask = top_edges_mask(world, edges, max_z[edge_owner], tolerance)
+    top = world[edges][:, :, :2]
+    return [top[(edge_owner == i) & mask] for i in range(len(arrays))]
 
-    return best_combination, min_difference
 
+_footprint_cache = {}
 
-def find_wall_combination(segment_length, wall_lengths=WALL_LENGTHS, tolerance=0.25):
-    """Находит масштабируемую комбинацию из одного типа стены, максимально приближенную к нужной длине."""
-    if not wall_lengths:
-        return None
 
-    combination, error = find_best_combination(wall_lengths, segment_length)
-    
-    if not combination:
-        return None
+def footprint_key(obj):
+    matrix = tuple(tuple(row) for row in obj.matrix_world)
+    return (obj.data.name_full, len(obj.data.vertices), matrix)
 
-    total_length = sum(combination)
-    scale_factor = segment_length / total_length
-    scale_error = abs(scale_factor - 1.0)
 
-    if scale_error <= tolerance:
-        return combination, scale_factor
+@profiling.timed("footprint")
+def get_foundation_footprint(obj):
+    """Контур фундамента для планировщика: рёбра как кортежи и начало координат объекта в XY.
+    Считается один раз на меш и матрицу; этажи получают свои сегменты преобразованием этого контура."""
+    key = footprint_key(obj)
+    cached = _footprint_cache.get(key)
+    if cached is not None:
+        profiling.count("footprint_cache_hits")
     else:
-        return None
+        segments = [(tuple(v1), tuple(v2)) for v1, v2 in get_top_edges(obj).tolist()]
+        origin = tuple(obj.matrix_world.translation.xy)
+        cached = _footprint_cache[key] = (segments, origin)
+    return cached
+
+
+@profiling.timed("footprint")
+def get_foundation_footprints(objects) -> list:
+    """get_foundation_footprint для пачки фундаментов: промахи кэша считаются одним get_top_edges_batch"""
+    keys = [footprint_key(obj) for obj in objects]
+    missing = {}
+    for obj, key in zip(objects, keys):
+        if key in _footprint_cache:
+            profiling.count("footprint_cache_hits")
+        else:
+            missing.setdefault(key, obj)
+    if missing:
+        for (key, obj), edges in zip(missing.items(), get_top_edges_batch(list(missing.values()))):
+            segments = [(tuple(v1), tuple(v2)) for v1, v2 in edges.tolist()]
+            _footprint_cache[key] = (segments, tuple(obj.matrix_world.translation.xy))
+    return [_footprint_cache[key] for key in keys]
+
+
+def footprint_slab(name, ring, origin, thickness=0.2):
+    """Плита фундамента по контуру (кольцо против часовой стрелки в мировых XY): объект вне сцены
+    с началом координат в origin - замена фундамента-ассета для зданий по контуру из файла"""
+    ox, oy = origin
+    count = len(ring)
+    vertices = [(x - ox, y - oy, 0.0) for x, y in ring] + [(x - ox, y - oy, thickness) for x, y in ring]
+    faces = [tuple(range(count, 2 * count)), tuple(reversed(range(count)))]
+    faces += [(i, (i + 1) % count, count + (i + 1) % count, count + i) for i in range(count)]
+
+    mesh = bpy.data.meshes.new(name)
+    mesh.from_pydata(vertices, [], faces)
+    mesh.update()
+    obj = bpy.data.objects.new(name, mesh)
+    obj.location = (ox, oy, 0.0)
+    return obj
 
 
 
@@ -80,4 +123,4 @@ def register():
     pass
 
 def unregister():
-    pass
\ No newline at end of file
+    _footprint_cache.clear()
\ No newline at end of file
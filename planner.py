@@ -0,0 +1,260 @@
+import math
+
+from . import profiling
+from . import style_rules
+from .build_plan import BuildPlan
+from .wall_packing import find_wall_combination
+
+# Планировщики стилей: принимают контур фундамента и заполняют BuildPlan по скомпилированным
+# таблицам стиля (style_rules.StyleTables) - ассеты уже подобраны по ключам, здесь только выбор.
+# Модуль не импортирует bpy - планы можно строить вне Blender и параллельно.
+# rng - поток здания (rng_streams.RngStream): этажи, сегменты и стены берут собственные
+# дочерние потоки ("floor", f) -> ("segment", i) -> ("wall", j), крыша - ("roof"),
+# поэтому лишний выбор в одной стене не меняет решения в остальных.
+log = profiling.get_logger(__name__)
+
+
+def segment_direction(start, end):
+    """Единичное направление и длина ребра"""
+    dx, dy = end[0] - start[0], end[1] - start[1]
+    length = math.hypot(dx, dy)
+    if length == 0:
+        return (0.0, 0.0), 0.0
+    return (dx / length, dy / length), length
+
+
+def scale_segments(segments, origin, scale):
+    """Сегменты этажа из контура фундамента: масштаб в плоскости XY относительно начала координат фундамента
+    (вместо копии меша и transform_apply на каждом этаже)"""
+    if scale == 1.0:
+        return segments
+    ox, oy = origin
+    return [((ox + (sx - ox) * scale, oy + (sy - oy) * scale), (ox + (ex - ox) * scale, oy + (ey - oy) * scale))
+            for (sx, sy), (ex, ey) in segments]
+
+
+def pick_foundation(style, details, rng):
+    tables = style_rules.get_tables(style, details)
+    if tables is None or not tables.foundations:
+        log.warning(f"Фундаменты не найдены для {style}, {details}")
+        return None
+    return rng.choice(tables.foundations)
+
+
+def plan_roof(plan, tables, z, rng):
+    """Выбирает крышу под фундамент; у зданий по контуру из файла (без фундамента-ассета) крыши нет"""
+    if not plan.foundation:
+        return
+    roof = tables.roofs.get(style_rules.get_base_id(plan.foundation))
+    if not roof:
+        log.warning(f"Крыши не найдены для {tables.roof_library or plan.style}, {plan.details}")
+        return
+
+    keyword, names = roof
+    plan.add("roof", rng.choice(names), (None, None, z), floor=plan.floors, keyword=keyword,
+             library=tables.roof_library)
+
+
+def plan_japanese_building(plan, tables, footprint, origin, rng):
+    floors = plan.floors
+    floor_height = tables.floor_height
+    scale_factor = 1.0
+
+    for floor in range(floors):
+        floor_rng = rng.child("floor", floor)
+        rule, _ = tables.floor_rule(floor, floors)
+        plan.add("base", plan.foundation, (None, None, floor * floor_height),
+                 scale=(scale_factor, scale_factor, scale_factor), floor=floor)
+
+        # получить сегменты
+        segments = scale_segments(footprint, origin, scale_factor)
+
+        for i, (start, end) in enumerate(segments):
+            direction, length = segment_direction(start, end)
+            combination = find_wall_combination(length, tables.wall_lengths)
+            if not combination:
+                continue
+            walls, scale_factor = combination
+            plan_wall_segment(plan, tables, rule, start, direction, walls, z=floor*floor_height+0.2, floor=floor,
+                              segment=i, scale_factor=scale_factor, rng=floor_rng.child("segment", i))
+
+        scale_factor *= tables.setback
+
+    # добавить крышу
+    plan_roof(plan, tables, floors * floor_height + 0.2, rng.child("roof"))
+
+
+def plan_facade_building(plan, tables, footprint, origin, rng):
+    """Фасад по правилам этажей: типы стен первого этажа тянутся заново, следующие этажи выводятся из этажа
+    ниже (from_below) или повторяют узор этажа с repeat вместе с его потоком - такие этажи можно ставить
+    экземплярами коллекции"""
+    floors = plan.floors
+    floor_height = tables.floor_height
+    patterns = {}  # этаж -> {сегмент: типы стен}
+
+    for floor in range(floors):
+        rule, source = tables.floor_rule(floor, floors)
+        floor_rng = rng.child("floor", source)
+        plan.add("base", plan.foundation, (None, None, floor * floor_height), floor=floor)
+        below = patterns.get(floor - 1, {})
+        patterns[floor] = {}
+
+        for i, (start, end) in enumerate(footprint):
+            segment_rng = floor_rng.child("segment", i)
+            direction, length = segment_direction(start, end)
+            combination = find_wall_combination(length, tables.wall_lengths)
+            if not combination:
+                continue
+            walls, scale_factor = combination
+
+            if source != floor:
+                wall_types = patterns[source].get(i, [])
+            elif rule.openings:
+                wall_types = [style_rules.choose(rule.openings, segment_rng.child("type", idx).random())
+                              for idx in range(len(walls))]
+            else:
+                wall_types = []
+                for idx, wall_type in enumerate(below.get(i, [])):
+                    table = rule.from_below.get(wall_type)
+                    if table:
+                        wall_type = style_rules.choose(table, segment_rng.child("pattern", idx).random())
+                    wall_types.append(wall_type)
+            patterns[floor][i] = wall_types
+
+            plan_facade_segment(plan, tables, start, direction, walls, z=floor*floor_height+0.2, floor=floor,
+                                segment=i, scale_factor=scale_factor if tables.stretch_walls else 1,
+                                wall_types=wall_types, rng=segment_rng)
+
+    # Добавить крышу
+    plan_roof(plan, tables, floors * floor_height + 0.2, rng.child("roof"))
+
+
+# Раскладки из style_rules.LAYOUTS; сами стили - данные в styles/*.json
+layouts = {
+    "facade": plan_facade_building,
+    "japanese": plan_japanese_building,
+}
+
+
+def has_planner(style):
+    definition = style_rules.get_definition(style)
+    return definition is not None and definition["layout"] in layouts
+
+
+def canonical_style(style):
+    return style_rules.canonical_style(style)
+
+
+def get_style_libraries(style):
+    return style_rules.get_libraries(style)
+
+
+def plan_building(style, details, floors, seed, foundation, footprint, origin, rng):
+    """Строит план здания по контуру фундамента (список рёбер ((x1, y1), (x2, y2)) в мировых координатах)"""
+    tables = style_rules.get_tables(style, details)
+    planner_func = layouts.get(tables.layout) if tables else None
+    if not planner_func:
+        log.error(f"Нет генератора для стиля: {style}")
+        return None
+
+    plan = BuildPlan(tables.style, details, floors, seed, foundation)
+    planner_func(plan, tables, footprint, origin, rng)
+    return plan
+
+
+def plan_facade_segment(plan, tables, start, direction, walls, z=0.2, floor=0, segment=-1, scale_factor=1,
+                        wall_types=None, rng=None):
+    cursor_x, cursor_y = start
+    angle = math.atan2(direction[1], direction[0])
+
+    for idx, wall_len in enumerate(walls):
+        scaled_len = wall_len * scale_factor
+        wall_type = wall_types[idx] if (wall_types and idx < len(wall_types)) else "plain"
+        wall_rng = rng.child("wall", idx)
+
+        # Цепочка ключей от специфичного типа к фолбэку по длине разрешена при компиляции стиля
+        entry = tables.walls.get((wall_len, wall_type))
+        if not entry:
+            log.error(f"Не найдена стена с длиной {wall_len}")
+            continue
+        found, names = entry
+        scale = (scale_factor, 1.0, 1.0)
+        plan.add("wall", wall_rng.choice(names), (cursor_x, cursor_y, z), rotation_z=angle, scale=scale,
+                 floor=floor, segment=segment, index=idx, keyword=found)
+
+        # Межэтажный элемент
+        inter = tables.interfloor.get(wall_len) if plan.floors >= 2 else None
+        if inter:
+            plan.add("interfloor", wall_rng.child("interfloor").choice(inter[1]), (cursor_x, cursor_y, z),
+                     rotation_z=angle, scale=scale, floor=floor, segment=segment, index=idx, keyword=inter[0])
+
+        cursor_x += direction[0] * scaled_len
+        cursor_y += direction[1] * scaled_len
+
+
+def plan_wall_segment(plan, tables, rule, start, direction, walls, z=0.2, floor=0, segment=-1, scale_factor=1,
+                      rng=None):
+    """Размещает серию стен вдоль заданного направления; rng - поток сегмента"""
+    floors = plan.floors
+    cursor_x, cursor_y = start
+    angle = math.atan2(direction[1], direction[0])
+    flag_engawa = False
+
+    for idx, wall_len in enumerate(walls):
+        wall_rng = rng.child("wall", idx)
+        scaled_len = wall_len * scale_factor
+        engawa = tables.engawa.get(wall_len)
+        engawa_name = None
+
+        # Логика генерации дверей, окон, стен в целом
+        # TODO: настенные декорации
+        wall_type = style_rules.choose(rule.openings, wall_rng.random())
+        entry = tables.walls.get((wall_len, wall_type))
+        if floor == 0 and wall_type == "door":
+            engawa_name = wall_rng.choice(engawa[1]) if engawa else None
+            flag_engawa = True
+        obj_name = wall_rng.choice(entry[1]) if entry else None
+        if floor == 0 and wall_type != "door":
+            engawa_name, flag_engawa = plan_engawa(tables.engawa_rule, engawa, flag_engawa, wall_rng)
+        elif floor != 0:
+            flag_engawa = False
+
+        if not obj_name:
+            log.error(f"Не найдена стена с длиной {wall_len}")
+            continue
+
+        # Межэтажный элемент
+        inter = tables.interfloor.get(wall_len) if floors >= 2 else None
+        inter_name = wall_rng.child("interfloor").choice(inter[1]) if inter else None
+
+        # Позиция и поворот
+        scale = (scale_factor, 1.0, 1.0)
+        plan.add("wall", obj_name, (cursor_x, cursor_y, z), rotation_z=angle, scale=scale,
+                 floor=floor, segment=segment, index=idx, keyword=entry[0])
+
+        if inter_name:
+            plan.add("interfloor", inter_name, (cursor_x, cursor_y, z), rotation_z=angle, scale=scale,
+                     floor=floor, segment=segment, index=idx, keyword=inter[0])
+
+        if engawa_name:
+            plan.add("engawa", engawa_name, (cursor_x, cursor_y, z-0.2), rotation_z=angle, scale=scale,
+                     floor=floor, segment=segment, index=idx, keyword=engawa[0])
+
+        cursor_x += direction[0] * scaled_len
+        cursor_y += direction[1] * scaled_len
+
+
+def plan_engawa(engawa_rule, engawa, flag_engawa, rng):
+    """Решает, ставить ли энгаву под стеной; возвращает имя объекта (или None) и новый флаг"""
+    eng_rand = rng.random()
+    if flag_engawa == True:
+        if eng_rand < engawa_rule.get("continue", 0.0):
+            engawa_name = rng.choice(engawa[1]) if engawa else None
+            if eng_rand < engawa_rule.get("stop", 0.0):
+                flag_engawa = False
+            return engawa_name, flag_engawa
+    elif not flag_engawa and eng_rand < engawa_rule.get("start", 0.0):
+        flag_engawa = True
+        engawa_name = rng.choice(engawa[1]) if engawa else None
+        return engawa_name, flag_engawa
+    return None, flag_engawa
@@ -0,0 +1,148 @@
+import json
+import logging
+import sys
+import threading
+import time
+from contextlib import nullcontext
+from functools import wraps
+
+# Профилирование сборки: таймеры этапов и счётчики событий.
+# Выключенное профилирование стоит одну проверку флага на вызов; модуль без bpy.
+ROOT_LOGGER = __package__ or "house_generator"
+
+enabled = False
+_timers = {}      # этап -> [секунды, вызовы]
+_counters = {}
+# Пишут и основной поток, и фоновый прогрев каталогов (asset_catalog.get_catalog)
+_lock = threading.Lock()
+_last_report = None
+_null_timer = nullcontext()
+
+# Префиксы сообщений, как в прежних print
+_PREFIXES = {logging.DEBUG: "", logging.INFO: "---> ", logging.WARNING: "--- ", logging.ERROR: "-XXX ", logging.CRITICAL: "-XXX "}
+
+
+class PrefixFormatter(logging.Formatter):
+    """Сообщение с префиксом уровня и полями extra={"fields": {...}} в виде key=value"""
+
+    def format(self, record):
+        message = _PREFIXES.get(record.levelno, "") + record.getMessage()
+        fields = getattr(record, "fields", None)
+        if fields:
+            message += " | " + " ".join(f"{key}={value}" for key, value in fields.items())
+        if record.exc_info:
+            message += "\n" + self.formatException(record.exc_info)
+        return message
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Логгер модуля аддона; вывод настраивается один раз на корневом логгере пакета"""
+    root = logging.getLogger(ROOT_LOGGER)
+    if not root.handlers:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(PrefixFormatter())
+        root.addHandler(handler)
+        root.setLevel(logging.INFO)
+        root.propagate = False
+    return logging.getLogger(name)
+
+
+class _Timer:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        add_time(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def enable(flag: bool = True):
+    global enabled
+    enabled = flag
+
+
+def reset():
+    with _lock:
+        _timers.clear()
+        _counters.clear()
+
+
+def timer(name: str):
+    """with timer("plan"): ... - время этапа; при выключенном профилировании пустой контекст"""
+    return _Timer(name) if enabled else _null_timer
+
+
+def timed(name: str):
+    """Декоратор: время всех вызовов функции в этапе name"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                add_time(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def add_time(name: str, seconds: float):
+    with _lock:
+        entry = _timers.get(name)
+        if entry is None:
+            _timers[name] = [seconds, 1]
+        else:
+            entry[0] += seconds
+            entry[1] += 1
+
+
+def count(name: str, value: int = 1):
+    if enabled:
+        with _lock:
+            _counters[name] = _counters.get(name, 0) + value
+
+
+def snapshot() -> dict:
+    with _lock:
+        timers = [(name, seconds, calls) for name, (seconds, calls) in _timers.items()]
+        counters = dict(_counters)
+    return {
+        "timers": {name: {"seconds": seconds, "calls": calls}
+                   for name, seconds, calls in sorted(timers, key=lambda item: -item[1])},
+        "counters": dict(sorted(counters.items())),
+    }
+
+
+def finish(label: str, **info) -> dict | None:
+    """Фиксирует отчёт сборки (доступен через last_report) и пишет сводку в лог"""
+    global _last_report
+    if not enabled:
+        return None
+    _last_report = dict(snapshot(), label=label, time=time.strftime("%Y-%m-%d %H:%M:%S"), **info)
+    log = get_logger(__name__)
+    for name, entry in _last_report["timers"].items():
+        log.info(f"{name}: {entry['seconds'] * 1000:.1f} мс", extra={"fields": {"calls": entry["calls"]}})
+    if _last_report["counters"]:
+        log.info("счётчики", extra={"fields": _last_report["counters"]})
+    return _last_report
+
+
+def last_report() -> dict | None:
+    return _last_report
+
+
+def export_json(path, report=None):
+    """Сохраняет отчёт (по умолчанию последний) в JSON"""
+    report = report or _last_report
+    if report is None:
+        raise LookupError("Нет отчёта профилирования")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=1)
@@ -0,0 +1,287 @@
+import bpy
+
+from . import asset_loader
+from . import manifest
+from . import mesh_merge
+from . import profiling
+from . import spatial_index
+from .build_plan import BuildPlan
+
+# Реализация BuildPlan: пакетная загрузка прототипов и создание объектов Blender
+log = profiling.get_logger(__name__)
+
+
+def load_plan_prototypes(plan) -> dict:
+    """Загружает все ассеты плана (одно открытие на .blend): (style, имя) -> прототип"""
+    return load_plans_prototypes([plan])
+
+
+def load_plans_prototypes(plans) -> dict:
+    """Общая загрузка для пакета планов: каждый .blend открывается один раз на весь пакет"""
+    libraries = {}
+    for plan in plans:
+        for key, names in plan.assets_by_library().items():
+            libraries.setdefault(key, {}).update(dict.fromkeys(names))
+
+    prototypes = {}
+    for (style, details), names in libraries.items():
+        try:
+            loaded = asset_loader.preload_prototypes(style, details, names)
+        except Exception as e:
+            log.error(f"Ошибка пакетной загрузки из {style}/{details}: {e}")
+            continue
+        for obj_name, proto in loaded.items():
+            prototypes[(style, obj_name)] = proto
+    return prototypes
+
+
+def prototype_shapes(prototypes) -> dict:
+    """Трансформации и XY-габариты прототипов для проверки конфликтов размещений (spatial_index)"""
+    shapes = {}
+    for key, proto in prototypes.items():
+        corners = [tuple(corner) for corner in proto.bound_box]
+        xs, ys = [x for x, _, _ in corners], [y for _, y, _ in corners]
+        shapes[key] = spatial_index.Shape(tuple(proto.location), tuple(proto.rotation_euler), tuple(proto.scale),
+                                          (min(xs), min(ys), max(xs), max(ys)))
+    return shapes
+
+
+def realize_placement(placement, proto, collection, offset=None):
+    """Создаёт объект размещения из прототипа; offset - положение здания в квартале"""
+    # Этажные плиты, как и стены, разделяют меш прототипа: этаж отличается только матрицей
+    obj = asset_loader.instance_prototype(proto, collection)
+    with profiling.timer("transforms"):
+        for axis, value in enumerate(placement.location):
+            if value is not None:
+                obj.location[axis] = value
+        if placement.rotation_z is not None:
+            obj.rotation_euler[2] = placement.rotation_z
+        for axis, value in enumerate(placement.scale):
+            obj.scale[axis] *= value
+        if offset:
+            for axis, value in enumerate(offset):
+                obj.location[axis] += value
+    return obj
+
+
+def realize_plan(plan, collection=None, offset=None, prototypes=None) -> list:
+    """Превращает план в объекты сцены; prototypes - уже загруженные для пакета"""
+    collection = collection or bpy.context.collection
+    if prototypes is None:
+        prototypes = load_plan_prototypes(plan)
+
+    objects = []
+    for placement in plan.placements:
+        proto = prototypes.get((placement.library or plan.style, placement.asset))
+        if proto is None:
+            log.error(f"Не удалось импортировать {placement.asset}")
+            continue
+        objects.append(realize_placement(placement, proto, collection, offset))
+
+    return objects
+
+
+def run_steps(steps):
+    """Выполняет пошаговую сборку целиком и возвращает её результат"""
+    while True:
+        try:
+            next(steps)
+        except StopIteration as stop:
+            return stop.value
+
+
+def scale_progress(steps, start, end):
+    """Пересчитывает (готово, всего) вложенной сборки в долю между start и end; возвращает её результат.
+    Закрытие внешней сборки закрывает и вложенную"""
+    try:
+        while True:
+            try:
+                done, total = next(steps)
+            except StopIteration as stop:
+                return stop.value
+            yield start + (end - start) * done / max(total, 1)
+    finally:
+        steps.close()
+
+
+def iter_realize_delta(plan, previous=None, collection=None, offset=None, prototypes=None):
+    """Пошаговый realize_delta: новые объекты создаются по этажам, после каждого этажа отдаётся
+    (готово, всего); устаревшие объекты удаляются в конце. Прерванная сборка удаляет созданное"""
+    collection = collection or bpy.context.collection
+    old_plan = previous.plan if previous else None
+    delta = manifest.diff_plans(old_plan, plan)
+    names = [None] * len(plan.placements)
+
+    for index, old_index in list(delta.keep):
+        obj = collection.objects.get(previous.objects[old_index] or "")
+        if obj is None:
+            # Объект удалили вручную - создаём заново
+            delta.keep.remove((index, old_index))
+            delta.add.append(index)
+        else:
+            names[index] = obj.name
+    delta.add.sort()
+
+    if delta.add and prototypes is None:
+        # Загружаются только ассеты новых размещений
+        part = BuildPlan(plan.style, plan.details, plan.floors, plan.seed, plan.foundation,
+                         [plan.placements[i] for i in delta.add])
+        prototypes = load_plan_prototypes(part)
+
+    floors = {}
+    for index in delta.add:
+        floors.setdefault(plan.placements[index].floor, []).append(index)
+
+    created = []
+    done = 0
+    try:
+        for floor in sorted(floors):
+            for index in floors[floor]:
+                placement = plan.placements[index]
+                proto = prototypes.get((placement.library or plan.style, placement.asset))
+                if proto is None:
+                    log.error(f"Не удалось импортировать {placement.asset}")
+                    continue
+                obj = realize_placement(placement, proto, collection, offset)
+                created.append(obj)
+                names[index] = obj.name
+            done += len(floors[floor])
+            yield done, len(delta.add)
+    except BaseException:
+        if created:
+            bpy.data.batch_remove(created)
+        raise
+
+    # Старые объекты удаляются только после создания новых: до этого момента сборку можно отменить
+    if previous:
+        stale = [collection.objects.get(previous.objects[i] or "") for i in delta.remove]
+        stale = [obj for obj in stale if obj is not None]
+        if stale:
+            bpy.data.batch_remove(stale)
+
+    return names, delta
+
+
+def realize_delta(plan, previous=None, collection=None, offset=None, prototypes=None):
+    """Приводит коллекцию здания к плану: объекты неизменившихся размещений остаются, остальные
+    удаляются или создаются заново. previous - манифест прошлой сборки.
+    Возвращает (имена объектов по размещениям плана, PlanDelta)"""
+    return run_steps(iter_realize_delta(plan, previous, collection, offset, prototypes))
+
+
+def instance_floors(collection, build_manifest) -> int:
+    """Заменяет повторяющиеся этажи экземплярами коллекций: каждый уникальный этаж собирается один раз
+    в свою коллекцию (вне сцены), а все этажи группы становятся пустышками-экземплярами.
+    Обновляет манифест; возвращает число удалённых объектов"""
+    plan = build_manifest.plan
+    names = build_manifest.objects
+    offset = build_manifest.offset
+    removed = []
+
+    for floors in plan.repeated_floors():
+        source = floors[0]
+        source_z = plan.floor_base_z(source)
+        floor_collection = bpy.data.collections.new(f"{collection.name}_floor{source}")
+
+        # Объекты первого этажа группы переезжают в коллекцию этажа, в координаты относительно его плиты
+        source_names = []
+        for index, placement in enumerate(plan.placements):
+            if placement.floor != source:
+                continue
+            obj = collection.objects.get(names[index] or "")
+            if obj is None:
+                source_names.append(None)
+                continue
+            floor_collection.objects.link(obj)
+            collection.objects.unlink(obj)
+            obj.location[0] -= offset[0]
+            obj.location[1] -= offset[1]
+            obj.location[2] -= offset[2] + source_z
+            source_names.append(obj.name)
+
+        for floor in floors:
+            empty = bpy.data.objects.new(f"{collection.name}_floor{floor}", None)
+            empty.instance_type = 'COLLECTION'
+            empty.instance_collection = floor_collection
+            empty.location = (offset[0], offset[1], offset[2] + plan.floor_base_z(floor))
+            collection.objects.link(empty)
+            build_manifest.instances.append([floor, empty.name, floor_collection.name, source_names])
+
+            for index, placement in enumerate(plan.placements):
+                if placement.floor != floor:
+                    continue
+                if floor != source:
+                    obj = collection.objects.get(names[index] or "")
+                    if obj is not None:
+                        removed.append(obj)
+                names[index] = None
+
+    if removed:
+        bpy.data.batch_remove(removed)
+    return len(removed)
+
+
+def make_real(collection, build_manifest) -> int:
+    """Превращает экземпляры этажей обратно в обычные объекты (меши остаются общими).
+    Обновляет манифест; возвращает число созданных объектов"""
+    plan = build_manifest.plan
+    names = build_manifest.objects
+    offset = build_manifest.offset
+    created = 0
+    floor_collections = {}
+
+    for floor, empty_name, collection_name, source_names in build_manifest.instances:
+        floor_collection = bpy.data.collections.get(collection_name)
+        if floor_collection is None:
+            continue
+        floor_collections[collection_name] = floor_collection
+        floor_z = plan.floor_base_z(floor)
+
+        # Порядок объектов коллекции этажа совпадает с порядком размещений любого этажа группы
+        sources = iter(source_names)
+        for index, placement in enumerate(plan.placements):
+            if placement.floor != floor:
+                continue
+            source = floor_collection.objects.get(next(sources, None) or "")
+            if source is None:
+                continue
+            obj = source.copy()
+            collection.objects.link(obj)
+            obj.location[0] += offset[0]
+            obj.location[1] += offset[1]
+            obj.location[2] += offset[2] + floor_z
+            names[index] = obj.name
+            created += 1
+
+        empty = collection.objects.get(empty_name)
+        if empty is not None:
+            bpy.data.objects.remove(empty)
+
+    for floor_collection in floor_collections.values():
+        objects = list(floor_collection.objects)
+        bpy.data.collections.remove(floor_collection)
+        if objects:
+            bpy.data.batch_remove(objects)
+
+    build_manifest.instances = []
+    return created
+
+
+def clear_building(collection, build_manifest=None, objects=None) -> int:
+    """Удаляет все объекты здания (или только objects) вместе с коллекциями экземпляров этажей
+    из build_manifest и слитыми мешами"""
+    objects = set(collection.objects if objects is None else objects)
+    merged_meshes = {obj.data for obj in objects if obj.get(mesh_merge.MERGED_PROP)}
+    if build_manifest:
+        for _, _, collection_name, _ in build_manifest.instances:
+            floor_collection = bpy.data.collections.get(collection_name)
+            if floor_collection is not None:
+                objects.update(floor_collection.objects)
+                bpy.data.collections.remove(floor_collection)
+        build_manifest.instances = []
+    if objects:
+        bpy.data.batch_remove(list(objects))
+    orphans = [mesh for mesh in merged_meshes if mesh.users == 0]
+    if orphans:
+        bpy.data.batch_remove(orphans)
+    return len(objects)
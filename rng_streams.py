@@ -0,0 +1,35 @@
+import hashlib
+import random
+
+# Иерархические детерминированные потоки случайных чисел.
+# Поток здания делится на потоки этажей/сегментов/стен по пути ("floor", 2, "segment", 1, ...):
+# сид дочернего потока зависит только от сида родителя и пути, а не от того,
+# сколько чисел уже вытянули другие части здания.
+
+
+def derive_seed(seed: int, *path) -> int:
+    """64-битный сид дочернего потока"""
+    data = repr((seed,) + path).encode()
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little")
+
+
+class RngStream(random.Random):
+    """random.Random с поддержкой дочерних потоков"""
+
+    def __init__(self, seed: int = 0):
+        self.stream_seed = seed
+        super().__init__(seed)
+
+    def child(self, *path) -> "RngStream":
+        return RngStream(derive_seed(self.stream_seed, *path))
+
+    def __reduce__(self):
+        return RngStream, (self.stream_seed,), self.getstate()
+
+    def __setstate__(self, state):
+        self.setstate(state)
+
+
+def building_stream(seed: int) -> RngStream:
+    """Корневой поток здания"""
+    return RngStream(derive_seed(seed, "building"))
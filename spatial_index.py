@@ -0,0 +1,282 @@
+import math
+from dataclasses import dataclass
+
+from . import profiling
+
+# Конфликты размещений: детали на углах контура, энгавы и соседние здания квартала не должны пересекаться.
+# Габарит детали - повёрнутый прямоугольник (XY-габарит меша прототипа с трансформацией размещения),
+# поиск соседей - равномерная сетка: вставка и запрос касаются только ячеек габарита, поэтому
+# проверка линейна по числу деталей. Слой - (вид, этаж): стены сравниваются со стенами того же этажа.
+# Детали соседних сегментов одного здания на углу контура заходят друг на друга на толщину стены -
+# это штатный стык, а не конфликт: такие пары пропускаются (is_joint).
+# Модуль без bpy; габариты прототипов дают realizer.prototype_shapes (Blender) и mesh_cache (без Blender).
+log = profiling.get_logger(__name__)
+
+CELL_SIZE = 4.0               # порядка длины стены: деталь занимает 1-4 ячейки
+TOLERANCE = 0.02              # пересечение мельче - стык деталей, а не конфликт
+JOINT_DISTANCE = 0.05         # концы деталей соседних сегментов ближе - общая вершина контура (угол)
+CHECKED_KINDS = ("base", "wall", "interfloor", "engawa")
+RESOLVABLE_KINDS = ("wall", "interfloor", "engawa")  # фундаменты и крыши только попадают в отчёт
+MIN_TRIM_RATIO = 0.25         # короче после обрезки - деталь убирается
+TRIM_ATTEMPTS = 4
+POLICIES = ("off", "report", "skip", "trim")
+
+# off - без проверки; report - только отчёт; skip - конфликтующая деталь убирается из плана;
+# trim - деталь укорачивается вдоль своей оси X до стыка (если не выходит - убирается)
+policy = "report"
+_last_report = None
+
+
+def set_policy(value: str = "report"):
+    global policy
+    value = value.lower()
+    if value not in POLICIES:
+        raise ValueError(f"Неизвестная политика конфликтов: {value}")
+    policy = value
+
+
+def last_report() -> dict | None:
+    return _last_report
+
+
+@dataclass
+class Shape:
+    """Прототип для проверки: трансформация объекта и XY-габарит меша (min_x, min_y, max_x, max_y)"""
+    location: tuple
+    rotation: tuple
+    scale: tuple
+    bounds: tuple
+
+
+class Box:
+    """Повёрнутый прямоугольник детали: начало координат, ось X объекта и габарит вдоль осей объекта"""
+    __slots__ = ("origin", "axis", "x_range", "y_range", "center", "half", "aabb")
+
+    def __init__(self, origin, angle, x_range, y_range):
+        self.origin = origin
+        self.axis = (math.cos(angle), math.sin(angle))
+        self.x_range = x_range
+        self.y_range = y_range
+        ux, uy = self.axis
+        cx, cy = (x_range[0] + x_range[1]) / 2, (y_range[0] + y_range[1]) / 2
+        self.center = (origin[0] + ux * cx - uy * cy, origin[1] + uy * cx + ux * cy)
+        self.half = ((x_range[1] - x_range[0]) / 2, (y_range[1] - y_range[0]) / 2)
+        corners = self.corners()
+        xs, ys = [x for x, _ in corners], [y for _, y in corners]
+        self.aabb = (min(xs), min(ys), max(xs), max(ys))
+
+    def corners(self):
+        ux, uy = self.axis
+        ox, oy = self.origin
+        return [(ox + ux * x - uy * y, oy + uy * x + ux * y) for x in self.x_range for y in self.y_range]
+
+    def project(self, other) -> tuple[float, float]:
+        """Отрезок, который занимает other на оси X этого прямоугольника (от его начала координат)"""
+        ux, uy = self.axis
+        ox, oy = self.origin
+        values = [(x - ox) * ux + (y - oy) * uy for x, y in other.corners()]
+        return min(values), max(values)
+
+
+def overlap_depth(a: Box, b: Box) -> float:
+    """Глубина взаимного проникновения по теореме о разделяющей оси (<= 0 - не пересекаются)"""
+    dx, dy = b.center[0] - a.center[0], b.center[1] - a.center[1]
+    depth = math.inf
+    for ux, uy in (a.axis, b.axis):
+        for axis in ((ux, uy), (-uy, ux)):
+            radius = 0.0
+            for box in (a, b):
+                bx, by = box.axis
+                radius += box.half[0] * abs(bx * axis[0] + by * axis[1]) + box.half[1] * abs(-by * axis[0] + bx * axis[1])
+            depth = min(depth, radius - abs(dx * axis[0] + dy * axis[1]))
+            if depth <= 0:
+                return depth
+    return depth
+
+
+def placement_box(placement, shape: Shape, offset=None) -> Box | None:
+    """Прямоугольник размещения в мировых XY; повороты прототипа вокруг X и Y не учитываются"""
+    location, rotation, scale = placement.transform(shape.location, shape.rotation, shape.scale, offset)
+    x0, y0, x1, y1 = shape.bounds
+    xs, ys = sorted((x0 * scale[0], x1 * scale[0])), sorted((y0 * scale[1], y1 * scale[1]))
+    if xs[1] - xs[0] <= 0 or ys[1] - ys[0] <= 0:
+        return None
+    return Box((location[0], location[1]), rotation[2], tuple(xs), tuple(ys))
+
+
+def box_ends(box: Box) -> tuple:
+    """Начало координат детали и концы её габарита вдоль оси X"""
+    ux, uy = box.axis
+    ox, oy = box.origin
+    return (box.origin,) + tuple((ox + ux * x, oy + uy * x) for x in box.x_range)
+
+
+def is_joint(building, placement, box: Box, other_building, other, other_box: Box) -> bool:
+    """Стык на углу контура: детали одного здания из разных сегментов сходятся концами в общей вершине"""
+    if building != other_building or placement.segment < 0 or other.segment < 0 or placement.segment == other.segment:
+        return False
+    return any(math.dist(a, b) <= JOINT_DISTANCE for a in box_ends(box) for b in box_ends(other_box))
+
+
+class SpatialHash:
+    """Равномерная сетка: (слой, ix, iy) -> номера деталей, чьи габариты задевают ячейку"""
+
+    def __init__(self, cell_size: float = CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.boxes = []
+        self.owners = []
+
+    def cell_range(self, aabb):
+        size = self.cell_size
+        return (range(math.floor(aabb[0] / size), math.floor(aabb[2] / size) + 1),
+                range(math.floor(aabb[1] / size), math.floor(aabb[3] / size) + 1))
+
+    def insert(self, layer, box: Box, owner) -> int:
+        item = len(self.boxes)
+        self.boxes.append(box)
+        self.owners.append(owner)
+        columns, rows = self.cell_range(box.aabb)
+        for ix in columns:
+            for iy in rows:
+                self.cells.setdefault((layer, ix, iy), []).append(item)
+        return item
+
+    def query(self, layer, box: Box, tolerance: float = TOLERANCE) -> list[tuple[int, float]]:
+        """Детали слоя, пересекающие box глубже tolerance: (номер, глубина)"""
+        found = {}
+        columns, rows = self.cell_range(box.aabb)
+        for ix in columns:
+            for iy in rows:
+                for item in self.cells.get((layer, ix, iy), ()):
+                    if item in found:
+                        continue
+                    other = self.boxes[item]
+                    # Быстрый отсев по осевым габаритам до точной проверки
+                    if other.aabb[0] > box.aabb[2] or other.aabb[2] < box.aabb[0] or \
+                            other.aabb[1] > box.aabb[3] or other.aabb[3] < box.aabb[1]:
+                        found[item] = None
+                        continue
+                    depth = overlap_depth(box, other)
+                    found[item] = depth if depth > tolerance else None
+        return [(item, depth) for item, depth in found.items() if depth is not None]
+
+    def __len__(self):
+        return len(self.boxes)
+
+
+def trimmed_range(box: Box, others, tolerance: float = TOLERANCE) -> tuple[float, float] | None:
+    """Отрезок оси X детали без пересечений с others (они должны задевать её с начала или с конца)"""
+    start, end = box.x_range
+    for other in others:
+        low, high = box.project(other)
+        if low <= start + tolerance:
+            start = max(start, high)
+        elif high >= end - tolerance:
+            end = min(end, low)
+        else:
+            return None  # чужая деталь посередине - обрезкой не развести
+    if end - start < (box.x_range[1] - box.x_range[0]) * MIN_TRIM_RATIO:
+        return None
+    return start, end
+
+
+def trim_placement(placement, box: Box, new_range):
+    """Укорачивает размещение до new_range по его оси X: масштаб по X и сдвиг начала вдоль оси"""
+    start, end = box.x_range
+    factor = (new_range[1] - new_range[0]) / (end - start)
+    shift = new_range[0] - start * factor
+    x, y, z = placement.location
+    placement.location = (x + box.axis[0] * shift, y + box.axis[1] * shift, z)
+    placement.scale = (placement.scale[0] * factor, placement.scale[1], placement.scale[2])
+
+
+def query_conflicts(index, layer, building, placement, box: Box) -> tuple[list, int]:
+    """Пересечения детали без стыков на углах контура: ([(номер, глубина)], число пропущенных стыков)"""
+    hits = index.query(layer, box)
+    conflicts = [(item, depth) for item, depth in hits
+                 if not is_joint(building, placement, box, index.owners[item][0], index.owners[item][2],
+                                 index.boxes[item])]
+    return conflicts, len(hits) - len(conflicts)
+
+
+def trim_conflict(index, layer, building, placement, shape, offset, box, hits) -> tuple[Box, str]:
+    """Укорачивает деталь, пока она не перестанет задевать соседей: (новый прямоугольник, "trimmed" / "skipped")"""
+    for _ in range(TRIM_ATTEMPTS):
+        new_range = trimmed_range(box, [index.boxes[item] for item, _ in hits])
+        if new_range is None:
+            break
+        trim_placement(placement, box, new_range)
+        box = placement_box(placement, shape, offset)
+        hits, _ = query_conflicts(index, layer, building, placement, box)
+        if not hits:
+            return box, "trimmed"
+    return box, "skipped"
+
+
+def resolve_plans(entries, shapes, conflict_policy=None, cell_size=CELL_SIZE) -> dict | None:
+    """Проверяет планы (список (план, смещение)) в порядке списка и по политике убирает или укорачивает
+    конфликтующие детали: уступает деталь, поставленная позже. shapes - (библиотека, ассет) -> Shape.
+    Планы меняются на месте: из plan.placements убираются детали, укороченным меняется масштаб.
+    Номера деталей в отчёте (placement, other_placement) - индексы в уже исправленном plan.placements;
+    у убранной детали placement - None. Возвращает отчёт проверки (None при политике off)"""
+    global _last_report
+    conflict_policy = (conflict_policy or policy).lower()
+    if conflict_policy == "off":
+        _last_report = None
+        return None
+
+    index = SpatialHash(cell_size)
+    conflicts = []
+    skipped = trimmed = missing = joints = 0
+    with profiling.timer("conflicts"):
+        for building, (plan, offset) in enumerate(entries):
+            if plan is None:
+                continue
+            kept = []
+            for placement in plan.placements:
+                if placement.kind not in CHECKED_KINDS or not placement.asset:
+                    kept.append(placement)
+                    continue
+                shape = shapes.get((placement.library or plan.style, placement.asset))
+                box = placement_box(placement, shape, offset) if shape else None
+                if box is None:
+                    missing += 1
+                    kept.append(placement)
+                    continue
+
+                layer = (placement.kind, placement.floor)
+                hits, joined = query_conflicts(index, layer, building, placement, box)
+                joints += joined
+                action = "reported"
+                resolvable = placement.kind in RESOLVABLE_KINDS and None not in placement.location[:2]
+                if hits and resolvable and conflict_policy == "trim":
+                    box, action = trim_conflict(index, layer, building, placement, shape, offset, box, hits)
+                elif hits and resolvable and conflict_policy == "skip":
+                    action = "skipped"
+
+                # Номер детали в исправленном плане; детали в индексе из плана уже не уходят
+                number = None if hits and action == "skipped" else len(kept)
+                for item, depth in hits:
+                    other_building, other_number, other = index.owners[item]
+                    conflicts.append({"building": building, "placement": number, "kind": placement.kind,
+                                      "asset": placement.asset, "floor": placement.floor,
+                                      "other_building": other_building, "other_placement": other_number,
+                                      "other_kind": other.kind, "other_asset": other.asset,
+                                      "depth": round(depth, 4), "action": action})
+                if hits and action == "skipped":
+                    skipped += 1
+                    continue
+                trimmed += bool(hits) and action == "trimmed"
+                index.insert(layer, box, (building, number, placement))
+                kept.append(placement)
+            plan.placements = kept
+
+    report = {"policy": conflict_policy, "buildings": len(entries), "pieces": len(index), "conflicts": conflicts,
+              "skipped": skipped, "trimmed": trimmed, "unchecked": missing, "joints": joints}
+    profiling.count("conflicts", len(conflicts))
+    if conflicts:
+        log.warning(f"Конфликтов размещений: {len(conflicts)} (убрано {skipped}, укорочено {trimmed})",
+                    extra={"fields": {"policy": conflict_policy, "pieces": len(index)}})
+    _last_report = report
+    return report
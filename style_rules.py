@@ -0,0 +1,352 @@
+import json
+import math
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from . import asset_catalog
+from . import profiling
+from .wall_packing import WALL_LENGTHS
+
+# Стили как данные: styles/<имя>.json описывает высоту этажа, длины стен, вероятности проёмов по этажам,
+# цепочки ключей-фолбэков и правила крыши. Определение компилируется под (стиль, details) в таблицы,
+# уже разрешённые по каталогу ассетов: планировщик берёт готовый кортеж имён и делает только rng.choice,
+# без форматирования ключей и перебора фолбэков. Модуль без bpy.
+#
+# Ключи определения:
+#   name, aliases        - имя стиля (оно же библиотека assets/<name>/) и другие имена
+#   extends              - стиль-основа: берутся все ключи, кроме name, aliases и max_floors
+#   layout               - "facade" (узор фасада повторяется по этажам) или "japanese" (отступы этажей, энгава)
+#   floor_height         - число или {details: высота}
+#   max_floors, wall_lengths, stretch_walls (стены растягиваются под ребро), setback (масштаб этажа, japanese)
+#   floors               - правила этажей: {"floor": n или -1 (верхний), "openings" | "from_below", "repeat"}
+#                          openings - [[тип, вероятность], ...], последний тип забирает остаток;
+#                          from_below - {тип этажа ниже: [[тип, вероятность], ...]}, тип без записи сохраняется;
+#                          repeat - следующие этажи без своего правила повторяют узор (и ассеты) этого этажа
+#   walls                - {тип: [ключ, ...]}: цепочка фолбэков, подстановки {n} (длина * 5), {style}, {details}
+#   foundation, interfloor, engawa.keywords - цепочки ключей; engawa - вероятности continue / stop / start
+#   roof                 - {"library": библиотека крыши, "keywords": [...]} с подстановками {library}, {base_id}
+log = profiling.get_logger(__name__)
+
+STYLES_DIR = Path(__file__).parent / "styles"
+LAYOUTS = ("facade", "japanese")
+TOP_FLOOR = -1
+TEMPLATE_FIELDS = {"n": 10, "style": "style", "details": "low", "library": "style", "base_id": "1"}
+
+_definitions = {}
+_aliases = {}
+_tables = {}
+# Таблицы компилирует и фоновый поток прогрева (asset_loader.warm_up), и основной по требованию
+_lock = threading.RLock()
+
+
+def load_styles(directory=None) -> dict:
+    """Читает определения стилей (повторный вызов перечитывает папку)"""
+    directory = Path(directory) if directory else STYLES_DIR
+    raw = {}
+    for path in sorted(directory.glob("*.json")):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            log.error(f"Не удалось прочитать стиль {path}: {e}")
+            continue
+        raw[data.get("name", path.stem).lower()] = data
+
+    # Стиль с ошибкой в данных пропускается, остальные остаются доступны
+    loaded, aliases = {}, {}
+    for name in raw:
+        try:
+            loaded[name] = resolve_definition(name, raw)
+        except ValueError as e:
+            log.error(str(e))
+            continue
+        for alias in loaded[name]["aliases"]:
+            aliases[alias] = name
+
+    with _lock:
+        _definitions.clear()
+        _definitions.update(loaded)
+        _aliases.clear()
+        _aliases.update(aliases)
+        _tables.clear()
+    return loaded
+
+
+def resolve_definition(name: str, raw: dict, seen=()) -> dict:
+    """Определение с подставленной основой (extends) и значениями по умолчанию; ValueError - ошибка в данных"""
+    if name in seen:
+        raise ValueError(f"Стиль {name}: циклическое extends")
+    data = raw[name]
+    definition = {}
+    if data.get("extends"):
+        parent = data["extends"].lower()
+        if parent not in raw:
+            raise ValueError(f"Стиль {name}: нет стиля-основы {parent}")
+        definition = {key: value for key, value in resolve_definition(parent, raw, seen + (name,)).items()
+                      if key not in ("name", "aliases", "max_floors")}
+    definition.update({key: value for key, value in data.items() if key != "extends"})
+    definition["name"] = name
+    definition["aliases"] = [alias.lower() for alias in data.get("aliases", ())]
+
+    definition.setdefault("layout", "facade")
+    definition.setdefault("floor_height", 2.7)
+    definition.setdefault("max_floors", 5)
+    definition.setdefault("wall_lengths", list(WALL_LENGTHS))
+    definition.setdefault("stretch_walls", True)
+    definition.setdefault("setback", 1.0)
+    definition.setdefault("foundation", ["base"])
+    definition.setdefault("roof", {})
+    validate(definition)
+    return definition
+
+
+def validate(definition: dict):
+    name = definition["name"]
+    if definition["layout"] not in LAYOUTS:
+        raise ValueError(f"Стиль {name}: неизвестная раскладка {definition['layout']}")
+    floors = {rule.get("floor", 0): rule for rule in definition.get("floors", ())}
+    if not floors.get(0, {}).get("openings"):
+        raise ValueError(f"Стиль {name}: у первого этажа должно быть правило openings")
+
+    used = set()
+    for rule in floors.values():
+        if rule.get("floor", 0) < TOP_FLOOR:
+            raise ValueError(f"Стиль {name}: этаж {rule['floor']} (с конца можно указать только -1)")
+        tables = [rule["openings"]] if rule.get("openings") else list(rule.get("from_below", {}).values())
+        for table in tables:
+            if sum(probability for _, probability in table) > 1.0 + 1e-9:
+                raise ValueError(f"Стиль {name}: сумма вероятностей этажа {rule.get('floor', 0)} больше 1")
+            used.update(wall_type for wall_type, _ in table)
+    missing = used - set(definition.get("walls", {}))
+    if missing:
+        raise ValueError(f"Стиль {name}: нет цепочки ключей для {', '.join(sorted(missing))}")
+
+    chains = list(definition.get("walls", {}).values()) + [definition["foundation"], definition["roof"].get("keywords", [])]
+    chains += [definition.get("interfloor") or [], definition.get("engawa", {}).get("keywords", [])]
+    for chain in chains:
+        for keyword in chain:
+            try:
+                keyword.format(**TEMPLATE_FIELDS)
+            except (KeyError, IndexError, ValueError):
+                raise ValueError(f"Стиль {name}: неизвестная подстановка в ключе {keyword}")
+
+
+def definitions() -> dict:
+    if not _definitions:
+        load_styles()
+    return _definitions
+
+
+def get_definition(style: str) -> dict | None:
+    style = style.lower()
+    known = definitions()
+    return known.get(_aliases.get(style, style))
+
+
+def canonical_style(style: str) -> str:
+    """Имя стиля по псевдониму - оно же папка библиотеки assets/<name>/; неизвестный стиль остаётся как есть"""
+    definition = get_definition(style)
+    return definition["name"] if definition else style.lower()
+
+
+def get_max_floors(style: str, default: int) -> int:
+    definition = get_definition(style)
+    return definition["max_floors"] if definition else default
+
+
+def get_floor_height(style: str, details: str) -> float:
+    definition = get_definition(style)
+    if definition is None:
+        return 2.7
+    height = definition["floor_height"]
+    return height.get(details, 2.7) if isinstance(height, dict) else height
+
+
+def get_libraries(style: str) -> tuple:
+    """Библиотеки ассетов стиля: своя и библиотека крыши, если она другая"""
+    definition = get_definition(style)
+    if definition is None:
+        return (style.lower(),)
+    roof_library = definition["roof"].get("library", definition["name"])
+    if roof_library == definition["name"]:
+        return (definition["name"],)
+    return (definition["name"], roof_library)
+
+
+def get_base_id(foundation_name):
+    """Идентификатор фундамента (последняя часть имени base_<style>_<id>), по нему подбирается крыша"""
+    base_name_parts = foundation_name.split('_')
+    if len(base_name_parts) >= 3:
+        return base_name_parts[-1]
+    return None
+
+
+def choice_table(entries) -> tuple:
+    """[[тип, вероятность], ...] -> ((тип, верхняя граница), ...): тип выбирается, если r < границы"""
+    table = []
+    total = 0.0
+    for wall_type, probability in entries:
+        total += probability
+        table.append((wall_type, round(total, 9)))
+    if table:
+        table[-1] = (table[-1][0], math.inf)
+    return tuple(table)
+
+
+def choose(table, value: float) -> str:
+    for wall_type, limit in table:
+        if value < limit:
+            return wall_type
+    return table[-1][0]
+
+
+@dataclass(frozen=True)
+class FloorRule:
+    floor: int
+    openings: tuple = ()
+    from_below: dict = field(default_factory=dict)
+    repeat: bool = False
+
+
+@dataclass
+class StyleTables:
+    """Скомпилированный стиль для одного details: все ключи уже разрешены по каталогу"""
+    style: str
+    details: str
+    layout: str
+    floor_height: float
+    wall_lengths: tuple
+    stretch_walls: bool
+    setback: float
+    rules: dict                   # этаж -> FloorRule (TOP_FLOOR - верхний этаж)
+    walls: dict                   # (длина, тип) -> (ключ, имена)
+    interfloor: dict              # длина -> (ключ, имена)
+    engawa: dict                  # длина -> (ключ, имена)
+    engawa_rule: dict
+    foundations: tuple
+    roofs: dict                   # id фундамента -> (ключ, имена)
+    roof_library: str | None      # None - крыша в библиотеке стиля
+    catalogs: tuple               # ((библиотека, каталог), ...) на момент компиляции
+
+    def floor_rule(self, floor: int, floors: int) -> tuple[FloorRule, int]:
+        """Правило этажа и этаж, чей узор он повторяет (сам этаж, если узор свой)"""
+        rule = self.rules.get(floor)
+        if rule is None and floor == floors - 1:
+            rule = self.rules.get(TOP_FLOOR)
+        if rule is not None:
+            return rule, floor
+        below = max(number for number in self.rules if number <= floor)
+        rule = self.rules[below]
+        return rule, below if rule.repeat else floor
+
+    def is_current(self) -> bool:
+        """Каталоги не сменились (пересобраны после правки .blend или закреплены кэшем мешей)"""
+        return all(get_catalog(library, self.details) is catalog for library, catalog in self.catalogs)
+
+
+def get_catalog(library: str, details: str, lister=None):
+    try:
+        return asset_catalog.get_catalog(library, details, lister)
+    except Exception as e:
+        log.warning(f"Каталог {library}/{details} недоступен: {e}")
+        return None
+
+
+def resolve_chain(catalog, chain, fields: dict):
+    """Первый ключ цепочки, для которого в каталоге есть объекты: (ключ, имена) или None"""
+    if catalog is None or not chain:
+        return None
+    keyword = catalog.first_available([keyword.format(**fields) for keyword in chain])
+    return (keyword, catalog.find(keyword)) if keyword else None
+
+
+def compile_style(definition: dict, details: str, lister=None) -> StyleTables:
+    """Разрешает цепочки ключей стиля по каталогам его библиотек"""
+    style = definition["name"]
+    roof = definition["roof"]
+    roof_library = roof.get("library", style)
+    catalog = get_catalog(style, details, lister)
+    roof_catalog = catalog if roof_library == style else get_catalog(roof_library, details, lister)
+    fields = {"style": style, "details": details, "library": roof_library}
+
+    walls, interfloor, engawa = {}, {}, {}
+    missing = []
+    for length in definition["wall_lengths"]:
+        fields["n"] = int(round(length * 5))
+        for wall_type, chain in definition.get("walls", {}).items():
+            walls[(length, wall_type)] = resolve_chain(catalog, chain, fields)
+            if walls[(length, wall_type)] is None:
+                missing.append(f"{wall_type} {length}")
+        interfloor[length] = resolve_chain(catalog, definition.get("interfloor"), fields)
+        engawa[length] = resolve_chain(catalog, definition.get("engawa", {}).get("keywords"), fields)
+
+    found = resolve_chain(catalog, definition["foundation"], fields)
+    foundations = found[1] if found else ()
+    roofs = {}
+    for name in foundations:
+        base_id = get_base_id(name)
+        if base_id is not None and base_id not in roofs:
+            roofs[base_id] = resolve_chain(roof_catalog, roof.get("keywords"), dict(fields, base_id=base_id))
+
+    if catalog is not None and missing:
+        log.warning(f"Стиль {style}/{details}: нет стен для {', '.join(missing)}")
+    if definition.get("interfloor") and catalog is not None and not all(interfloor.values()):
+        log.warning(f"Стиль {style}/{details}: не для всех длин стен есть interfloor")
+
+    rules = {}
+    for rule in definition.get("floors", ()):
+        rules[rule.get("floor", 0)] = FloorRule(
+            rule.get("floor", 0), choice_table(rule.get("openings", ())),
+            {wall_type: choice_table(entries) for wall_type, entries in rule.get("from_below", {}).items()},
+            rule.get("repeat", False))
+
+    libraries = ((style, catalog),) if roof_catalog is catalog else ((style, catalog), (roof_library, roof_catalog))
+    return StyleTables(
+        style=style, details=details, layout=definition["layout"],
+        floor_height=get_floor_height(style, details),
+        wall_lengths=tuple(definition["wall_lengths"]), stretch_walls=definition["stretch_walls"],
+        setback=definition["setback"], rules=rules, walls=walls, interfloor=interfloor, engawa=engawa,
+        engawa_rule=definition.get("engawa", {}), foundations=foundations, roofs=roofs,
+        roof_library=roof_library if roof_library != style else None, catalogs=libraries)
+
+
+def get_tables(style: str, details: str) -> StyleTables | None:
+    """Таблицы стиля; компилируются при первом обращении и заново, если каталог библиотеки сменился"""
+    definition = get_definition(style)
+    if definition is None:
+        return None
+    key = (definition["name"], details)
+    with _lock:
+        tables = _tables.get(key)
+        if tables is None or not tables.is_current():
+            with profiling.timer("style_compile"):
+                tables = _tables[key] = compile_style(definition, details)
+    return tables
+
+
+def compile_all(lister=None) -> int:
+    """Компилирует все стили под найденные библиотеки (при регистрации, после прогрева каталогов)"""
+    compiled = 0
+    available = set(asset_catalog.discover_libraries())
+    with _lock:
+        known = list(definitions().items())
+    for name, definition in known:
+        for library, details in sorted(available):
+            if library != name:
+                continue
+            # Блокировка на каждый стиль: основной поток не ждёт весь прогрев
+            with _lock:
+                if _definitions.get(name) is not definition:
+                    continue  # стили перечитаны во время прогрева
+                try:
+                    _tables[(name, details)] = compile_style(definition, details, lister)
+                    compiled += 1
+                except Exception as e:
+                    log.warning(f"Стиль {name}/{details} не скомпилирован: {e}")
+    return compiled
+
+
+def clear():
+    with _lock:
+        _tables.clear()
@@ -0,0 +1,111 @@
+"""Контур фундамента в кэше мешей совпадает с тем, что планировщик получает в Blender.
+
+Запуск: python -m pytest tests - без Blender проверяется только запись и чтение кэша;
+полностью: blender -b --factory-startup --python-expr "import pytest, sys; sys.exit(pytest.main(['tests']))"
+"""
+import importlib.util
+import sys
+from pathlib import Path
+
+import pytest
+
+PACKAGE_DIR = Path(__file__).resolve().parent.parent
+
+try:
+    import bpy
+except ImportError:
+    bpy = None
+
+
+def import_package():
+    if "house_generator" not in sys.modules:
+        spec = importlib.util.spec_from_file_location("house_generator", PACKAGE_DIR / "__init__.py",
+                                                      submodule_search_locations=[str(PACKAGE_DIR)])
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[spec.name] = module
+        spec.loader.exec_module(module)
+    return sys.modules["house_generator"]
+
+
+@pytest.fixture
+def package(tmp_path, monkeypatch):
+    import_package()
+    from house_generator import asset_catalog, mesh_cache
+    monkeypatch.setattr(asset_catalog, "ASSETS_DIR", tmp_path / "assets")
+    monkeypatch.setattr(asset_catalog, "CACHE_DIR", tmp_path / "catalog")
+    monkeypatch.setattr(mesh_cache, "CACHE_DIR", tmp_path / "meshes")
+    yield sys.modules["house_generator"]
+    mesh_cache.clear()
+    asset_catalog.clear()
+
+
+def test_footprint_round_trip_keeps_order_and_direction(package):
+    mesh_cache = package.mesh_cache
+    # По часовой стрелке и не с минимальной вершины: сортировка рёбер это бы сломала
+    loop = [(12.0, 8.0), (12.0, 0.0), (0.0, 0.0), (0.0, 8.0)]
+    segments = [(loop[i], loop[(i + 1) % len(loop)]) for i in range(len(loop))]
+    writer = mesh_cache.MeshCacheWriter("test", "low", [1, 2])
+    writer.add("base_test_1", [(0, 0, 0), (1, 0, 0), (0, 1, 0)], [(0, 0)] * 3, [(0, 1, 2)], [0], [""],
+               (1.0, 2.0, 0.0), (0.0, 0.0, 0.0), (1.0, 1.0, 1.0), (segments, (1.0, 2.0)))
+    writer.add("wall10_test_1", [(0, 0, 0), (1, 0, 0), (0, 1, 0)], [(0, 0)] * 3, [(0, 1, 2)], [0], [""],
+               (0.0, 0.0, 0.0), (0.0, 0.0, 0.0), (1.0, 1.0, 1.0))
+    writer.write()
+
+    cache = mesh_cache.MeshCache.open("test", "low")
+    assert cache.get("base_test_1").footprint() == (segments, (1.0, 2.0))
+    assert cache.get("wall10_test_1").footprint() == ([], (0.0, 0.0))
+
+
+@pytest.mark.skipif(bpy is None, reason="нужен Blender")
+def test_cached_footprint_matches_blender(package, tmp_path):
+    asset_loader, object_helpers, mesh_cache = package.asset_loader, package.object_helpers, package.mesh_cache
+    # Фундамент 12 x 8 с поворотом и смещением: контур в мировых координатах, как у прототипа в сборке
+    vertices = [(x, y, z) for z in (0.0, 0.2) for x, y in ((0, 0), (12, 0), (12, 8), (0, 8))]
+    faces = [(0, 3, 2, 1), (4, 5, 6, 7), (0, 1, 5, 4), (1, 2, 6, 5), (2, 3, 7, 6), (3, 0, 4, 7)]
+    mesh = bpy.data.meshes.new("base_test_1")
+    mesh.from_pydata(vertices, [], faces)
+    mesh.update()
+    obj = bpy.data.objects.new("base_test_1", mesh)
+    obj.location = (3.0, -2.0, 0.0)
+    obj.rotation_euler = (0.0, 0.0, 0.5)
+    bpy.context.scene.collection.objects.link(obj)
+    bpy.context.view_layer.update()
+    expected_segments, expected_origin = object_helpers.get_foundation_footprint(obj)
+
+    blend_path = package.asset_catalog.get_asset_path("test", "low")
+    blend_path.parent.mkdir(parents=True)
+    bpy.data.libraries.write(str(blend_path), {obj})
+    bpy.data.objects.remove(obj)
+    bpy.data.meshes.remove(mesh)
+
+    asset_loader.export_mesh_cache("test", "low")
+    segments, origin = mesh_cache.MeshCache.open("test", "low").get("base_test_1").footprint()
+    assert len(segments) == len(expected_segments)
+    for (start, end), (expected_start, expected_end) in zip(segments, expected_segments):
+        assert start == pytest.approx(expected_start, abs=1e-6)
+        assert end == pytest.approx(expected_end, abs=1e-6)
+    assert origin == pytest.approx(expected_origin, abs=1e-6)
+
+
+def write_box_cache(mesh_cache, library, details, names, footprint):
+    """Кэш из одинаковых треугольников; у фундаментов - заданный контур"""
+    writer = mesh_cache.MeshCacheWriter(library, details, [1, 2])
+    for name in names:
+        writer.add(name, [(0, 0, 0), (1, 0, 0), (0, 1, 0)], [(0, 0)] * 3, [(0, 1, 2)], [0], [""],
+                   (0.0, 0.0, 0.0), (0.0, 0.0, 0.0), (1.0, 1.0, 1.0), footprint if name.startswith("base") else None)
+    writer.write()
+
+
+def test_plan_building_resolves_style_alias(package):
+    mesh_cache = package.mesh_cache
+    loop = [(0.0, 0.0), (12.0, 0.0), (12.0, 9.0), (0.0, 9.0)]
+    segments = [(loop[i], loop[(i + 1) % len(loop)]) for i in range(len(loop))]
+    names = ["base_stalinist_1", "roof_stalinist_low_1"]
+    names += [f"{kind}{n}" for kind in ("wall", "interfloor") for n in (10, 12, 15)]
+    write_box_cache(mesh_cache, "stalinist", "low", names, (segments, (0.0, 0.0)))
+
+    plan = mesh_cache.plan_building("stal", "low", 2, 7)
+    assert plan is not None
+    assert plan.style == "stalinist"
+    assert plan.foundation == "base_stalinist_1"
+    assert plan.placements
@@ -0,0 +1,57 @@
+"""Проверка конфликтов размещений: стыки на углах контура не считаются конфликтами.
+
+Запуск: python -m pytest tests (модуль без bpy)
+"""
+import math
+
+import pytest
+
+from test_mesh_cache import import_package
+
+WALL = ("bench", "wall15")
+
+
+@pytest.fixture
+def spatial_index():
+    import_package()
+    from house_generator import spatial_index
+    return spatial_index
+
+
+def corner_walls(build_plan):
+    """Две стены 3 м толщиной 0.2 м из соседних сегментов, сходящиеся в вершине (3, 0)"""
+    placements = [build_plan.Placement("wall", "wall15", (0.0, 0.0, 0.0), 0.0, segment=0),
+                  build_plan.Placement("wall", "wall15", (3.0, 0.0, 0.0), math.pi / 2, segment=1)]
+    return build_plan.BuildPlan("bench", "low", 1, 0, "", placements)
+
+
+def test_corner_joint_is_not_a_conflict(spatial_index):
+    from house_generator import build_plan
+    shapes = {WALL: spatial_index.Shape((0.0, 0.0, 0.0), (0.0, 0.0, 0.0), (1.0, 1.0, 1.0), (0.0, 0.0, 3.0, 0.2))}
+    plan = corner_walls(build_plan)
+    report = spatial_index.resolve_plans([(plan, None)], shapes, "trim")
+    assert report["conflicts"] == []
+    assert report["joints"] == 1
+    assert [p.scale for p in plan.placements] == [(1.0, 1.0, 1.0)] * 2
+
+
+def test_overlap_between_buildings_is_a_conflict(spatial_index):
+    from house_generator import build_plan
+    shapes = {WALL: spatial_index.Shape((0.0, 0.0, 0.0), (0.0, 0.0, 0.0), (1.0, 1.0, 1.0), (0.0, 0.0, 3.0, 0.2))}
+    first, second = corner_walls(build_plan), corner_walls(build_plan)
+    second.placements = second.placements[1:]
+    report = spatial_index.resolve_plans([(first, None), (second, None)], shapes, "report")
+    assert len(report["conflicts"]) == 2
+    assert report["joints"] == 1
+
+
+def test_report_numbers_index_resolved_plan(spatial_index):
+    from house_generator import build_plan
+    shapes = {WALL: spatial_index.Shape((0.0, 0.0, 0.0), (0.0, 0.0, 0.0), (1.0, 1.0, 1.0), (0.0, 0.0, 3.0, 0.2))}
+    # Вторая и четвёртая стены - копии первой и третьей, политика skip их убирает
+    placements = [build_plan.Placement("wall", "wall15", (x, 0.0, 0.0), 0.0, segment=0) for x in (0.0, 0.0, 10.0, 10.0)]
+    plan = build_plan.BuildPlan("bench", "low", 1, 0, "", placements)
+    report = spatial_index.resolve_plans([(plan, None)], shapes, "skip")
+    assert len(plan.placements) == 2
+    assert [(c["placement"], c["other_placement"]) for c in report["conflicts"]] == [(None, 0), (None, 1)]
+    assert plan.placements[1].location == (10.0, 0.0, 0.0)
@@ -1,5 +1,9 @@
 import bpy
 
+from . import generator
+from . import profiling
+from . import spatial_index
+
 class VIEW3D_PT_HouseBuilder(bpy.types.Panel):
     bl_label = "House Builder"
     bl_idname = "VIEW3D_PT_house_builder"
@@ -15,8 +19,61 @@ class VIEW3D_PT_HouseBuilder(bpy.types.Panel):
         layout.prop(scene, "house_style", text="Style")
         layout.prop(scene, "house_details", text="Details")
         layout.prop(scene, "house_seed", text="Seed")
+        layout.prop(scene, "house_output")
+        row = layout.row()
+        row.enabled = scene.house_output == 'OBJECTS'
+        row.prop(scene, "house_instance_floors")
+        row = layout.row()
+        row.enabled = scene.house_output == 'OBJECTS'
+        row.prop(scene, "house_merge")
+        sub = row.row()
+        sub.enabled = scene.house_merge
+        sub.prop(scene, "house_weld_distance", text="Weld")
+
+        layout.prop(scene, "house_link_assets")
+        layout.prop(scene, "house_conflicts")
+        layout.prop(scene, "house_time_budget")
+        layout.prop(scene, "house_profile")
+
+        progress = generator.build_progress
+        if progress["fraction"] is not None:
+            # Идёт модальная сборка
+            text = f"{progress['label']}: {int(progress['fraction'] * 100)}%  (Esc - cancel)"
+            if hasattr(layout, "progress"):
+                layout.progress(factor=progress["fraction"], type='BAR', text=text)
+            else:
+                layout.label(text=text, icon='TIME')
+        elif generator.find_building_collection(context):
+            layout.operator("object.build_house_modal", text="Rebuild House", icon='FILE_REFRESH')
+            layout.operator("object.build_house_modal", text="New House", icon='MOD_BUILD').new_building = True
+            layout.operator("object.house_make_real", icon='OUTLINER_OB_GROUP_INSTANCE')
+            layout.operator("object.house_merge", icon='AUTOMERGE_ON')
+            layout.operator("object.house_localize", icon='LIBRARY_DATA_DIRECT')
+        else:
+            layout.operator("object.build_house_modal", text="Build House", icon='MOD_BUILD')
+        layout.operator("object.build_house_block", text="Build Block", icon='MESH_GRID')
+        layout.operator("object.house_clean_unused", text="Clean Unused Data", icon='TRASH')
+
+        conflicts = spatial_index.last_report()
+        if scene.house_conflicts != 'OFF' and conflicts and conflicts["conflicts"]:
+            box = layout.box()
+            box.label(text=f"Conflicts: {len(conflicts['conflicts'])}", icon='ERROR')
+            box.label(text=f"Skipped {conflicts['skipped']}, trimmed {conflicts['trimmed']} of {conflicts['pieces']} pieces")
 
-        layout.operator("object.build_house", text="Build House", icon='MOD_BUILD')
+        report = profiling.last_report()
+        if scene.house_profile and report:
+            box = layout.box()
+            box.label(text=f"Profile: {report['label']}", icon='TIME')
+            column = box.column(align=True)
+            for name, entry in report["timers"].items():
+                row = column.row()
+                row.label(text=name)
+                row.label(text=f"{entry['seconds'] * 1000:.1f} ms  x{entry['calls']}")
+            for name, value in report["counters"].items():
+                row = column.row()
+                row.label(text=name)
+                row.label(text=str(value))
+            box.operator("object.house_export_profile", icon='EXPORT')
 
 def register():
     bpy.utils.register_class(VIEW3D_PT_HouseBuilder)
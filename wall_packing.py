@@ -0,0 +1,140 @@
+import math
+from functools import lru_cache
+
+# Подбор комбинаций стен под длину ребра (без bpy: используется и планировщиком)
+WALL_LENGTHS = [2.0, 2.4, 3.0]
+
+
+def find_best_combination(A, length):
+    """Находит лучшее число из массива длин A и множитель (количество стен) n, чтобы n * A[i] было близко к length (заполняемому ребру)."""
+    best_number = None
+    best_multiplier = 0
+    min_difference = float('inf')
+
+    for number in A:
+        # Определяем наилучший множитель n
+        multiplier = round(length / number)  # Округляем до ближайшего целого
+
+        # Вычисляем разницу (абсолютное значение)
+        difference = abs(length - multiplier * number)
+
+        # Обновляем, если нашли лучшее
+        if difference < min_difference:
+            min_difference = difference
+            best_number = number
+            best_multiplier = multiplier
+
+    # Создаем комбинацию, повторяя best_number best_multiplier раз
+    best_combination = [best_number] * best_multiplier
+
+    return best_combination, min_difference
+
+
+LENGTH_QUANTUM = 0.01     # шаг дискретизации длин стен для ДП
+SEGMENT_QUANTUM = 0.001   # шаг квантования длины ребра для ключа кэша
+SOLVER_CACHE_SIZE = 4096
+
+
+def quantize(value, quantum):
+    return int(round(value / quantum))
+
+
+def find_uniform_combination(segment_length, wall_lengths=WALL_LENGTHS, tolerance=0.25):
+    """Прежний подбор: одна длина стены, повторённая n раз"""
+    if not wall_lengths:
+        return None
+
+    combination, error = find_best_combination(wall_lengths, segment_length)
+
+    if not combination:
+        return None
+
+    total_length = sum(combination)
+    scale_factor = segment_length / total_length
+    scale_error = abs(scale_factor - 1.0)
+
+    if scale_error <= tolerance:
+        return combination, scale_factor
+    else:
+        return None
+
+
+@lru_cache(maxsize=SOLVER_CACHE_SIZE)
+def solve_wall_packing(quantized_length, wall_lengths, tolerance):
+    """ДП по достижимым суммам: комбинация стен (смешанных длин) с минимальной ошибкой масштаба.
+    Длины в единицах LENGTH_QUANTUM; при равной ошибке выигрывает однородная раскладка (одна длина),
+    среди смешанных - меньше стен."""
+    length = quantized_length * SEGMENT_QUANTUM / LENGTH_QUANTUM
+    lengths_by_unit = {quantize(l, LENGTH_QUANTUM): l for l in wall_lengths if l > 0}
+    units = sorted(lengths_by_unit, reverse=True)
+    if not units or length <= 0:
+        return None
+
+    # Все длины кратны НОД - считаем в его шагах, массив становится короче
+    step = units[0]
+    for unit in units[1:]:
+        step = math.gcd(step, unit)
+    steps = [unit // step for unit in units]
+
+    max_sum = int(length / (1.0 - tolerance) / step) if tolerance < 1.0 else int(2 * length / step) + max(steps)
+    min_sum = length / (1.0 + tolerance) / step
+    if max_sum <= 0:
+        return None
+
+    # pieces[s] - минимум стен с суммой s, last[s] - последняя добавленная длина
+    pieces = [0] + [-1] * max_sum
+    last = [0] * (max_sum + 1)
+    for total in range(1, max_sum + 1):
+        best = -1
+        for i, size in enumerate(steps):
+            if size <= total and pieces[total - size] >= 0 and (best < 0 or pieces[total - size] + 1 < best):
+                best = pieces[total - size] + 1
+                last[total] = i
+        pieces[total] = best
+
+    def scale_error(total):
+        return abs(length / (total * step) - 1.0)
+
+    best_mixed = None
+    for total in range(max(1, math.ceil(min_sum)), max_sum + 1):
+        if pieces[total] < 0:
+            continue
+        key = (round(scale_error(total), 9), pieces[total])
+        if best_mixed is None or key < best_mixed[0]:
+            best_mixed = (key, total)
+
+    # Однородная раскладка (прежнее поведение) предпочтительнее при той же ошибке
+    best_uniform = None
+    for i, size in enumerate(steps):
+        count = max(1, round(length / (size * step)))
+        key = (round(scale_error(count * size), 9), count)
+        if best_uniform is None or key < best_uniform[0]:
+            best_uniform = (key, i, count)
+
+    if best_uniform[0][0] <= tolerance and (best_mixed is None or best_uniform[0][0] <= best_mixed[0][0]):
+        _, i, count = best_uniform
+        return (lengths_by_unit[units[i]],) * count
+
+    if best_mixed is None or best_mixed[0][0] > tolerance:
+        return None
+
+    combination = []
+    total = best_mixed[1]
+    while total > 0:
+        i = last[total]
+        combination.append(lengths_by_unit[units[i]])
+        total -= steps[i]
+    return tuple(sorted(combination, reverse=True))
+
+
+def find_wall_combination(segment_length, wall_lengths=WALL_LENGTHS, tolerance=0.25):
+    """Находит масштабируемую комбинацию стен (можно разной длины), максимально приближенную к нужной длине."""
+    if not wall_lengths or segment_length <= 0:
+        return None
+
+    combination = solve_wall_packing(quantize(segment_length, SEGMENT_QUANTUM), tuple(sorted(wall_lengths)), tolerance)
+    if not combination:
+        return None
+
+    scale_factor = segment_length / sum(combination)
+    return list(combination), scale_factor